@@ -7,25 +7,38 @@
 import time
 import re
 import pandas as pd
-from bs4 import BeautifulSoup
 from selenium import webdriver
 from selenium.webdriver.chrome.service import Service as ChromeService
 from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait, Select
 from selenium.webdriver.support import expected_conditions as EC
-from selenium.common.exceptions import TimeoutException
+from selenium.common.exceptions import TimeoutException, WebDriverException
 import gspread
 import math
 from concurrent.futures import ThreadPoolExecutor, as_completed
 import threading
-import random
 import os
+import sys
 import psutil
 
+from modules.lineas_ah import parse_ah, format_ah
+from modules.indice_equipos import IndiceEquipos, _parse_date_ddmmyyyy
+from modules.historial_local import guardar_indice
+from modules import limitador, espejos, pestanas, cola_trabajo, perfilado, trazas, reintentos, carga_js, regiones_html, extraccion_js
+
 # --- 2. CONFIGURACIÓN GLOBAL ---
 print("--- [Paso 1/7] Configurando el script... ---")
 
+# -- Modo de ejecución --
+#   python Scraper.py            -> todo en este proceso (como siempre)
+#   python Scraper.py coordinar  -> reparte EXTRACTION_RANGES en trozos en la cola, recoge los resultados y sube a Sheets
+#   python Scraper.py trabajar   -> reclama trozos de la cola y los extrae (no necesita credenciales de Google)
+# La cola es un directorio (MASIVO_COLA_DIR); en varias máquinas basta con que lo compartan.
+MODO = sys.argv[1] if len(sys.argv) > 1 else "local"
+if MODO not in ("local", "coordinar", "trabajar"):
+    print(f"❌ Modo desconocido '{MODO}'. Usa: local | coordinar | trabajar"); exit()
+
 # -- Credenciales y Google Sheets --
 NOMBRE_SHEET = "Datos" # Nombre de tu Google Sheet
 NOMBRE_HOJA_NEG_CERO = "Visitantes" # Hoja para partidos con AH del visitante o 0
@@ -42,7 +55,9 @@ MAX_WORKERS = 4
 SELENIUM_TIMEOUT = 15
 BATCH_SIZE = 150
 API_PAUSE = 0.3
-WORKER_START_DELAY = random.uniform(0.3, 0.8)
+TAMANO_TROZO = 50              # IDs por trozo de la cola en modo coordinar/trabajar
+PAUSA_COLA = 5                 # segundos entre comprobaciones de la cola
+TASA_PERFIL = float(os.environ.get("MASIVO_TASA_PERFIL", "0"))   # fracción de partidos perfilados (modules/perfilado.py)
 
 # -- Columnas Finales --
 COLS = ["AH_H2H_V", "AH_Act", "Res_H2H_V", "AH_L_H", "Res_L_H",
@@ -54,25 +69,27 @@ COLS = ["AH_H2H_V", "AH_Act", "Res_H2H_V", "AH_L_H", "Res_L_H",
 print("✅ Configuración cargada.\n")
 
 # --- 3. MANEJO DE CREDENCIALES ---
-print("--- [Paso 2/7] Gestionando credenciales de Google... ---")
-# El script buscará el archivo en la misma carpeta donde lo ejecutes.
+# Los trabajadores no suben nada a Sheets: solo el modo local y el coordinador necesitan credenciales
 CREDENTIALS_FILENAME = "google_credentials.json"
-if not os.path.exists(CREDENTIALS_FILENAME):
-    print(f"❌ Error: Archivo de credenciales '{CREDENTIALS_FILENAME}' no encontrado.")
-    print("   Asegúrate de que el archivo .json esté en la misma carpeta que este script.")
-    exit() # Detiene la ejecución si no encuentra el archivo
-else:
-    print(f"✅ Archivo de credenciales encontrado.\n")
-
-
-# --- 4. CONEXIÓN A GOOGLE SHEETS ---
-print(f"--- [Paso 3/7] Conectando a Google Sheet '{NOMBRE_SHEET}'... ---")
-try:
-    gc = gspread.service_account(filename=CREDENTIALS_FILENAME)
-    sh = gc.open(NOMBRE_SHEET)
-    print(f"✅ Conexión exitosa.\n")
-except Exception as e:
-    print(f"❌ Error crítico conectando a Google Sheets: {e}"); exit()
+sh = None
+if MODO != "trabajar":
+    print("--- [Paso 2/7] Gestionando credenciales de Google... ---")
+    # El script buscará el archivo en la misma carpeta donde lo ejecutes.
+    if not os.path.exists(CREDENTIALS_FILENAME):
+        print(f"❌ Error: Archivo de credenciales '{CREDENTIALS_FILENAME}' no encontrado.")
+        print("   Asegúrate de que el archivo .json esté en la misma carpeta que este script.")
+        exit() # Detiene la ejecución si no encuentra el archivo
+    else:
+        print(f"✅ Archivo de credenciales encontrado.\n")
+
+    # --- 4. CONEXIÓN A GOOGLE SHEETS ---
+    print(f"--- [Paso 3/7] Conectando a Google Sheet '{NOMBRE_SHEET}'... ---")
+    try:
+        gc = gspread.service_account(filename=CREDENTIALS_FILENAME)
+        sh = gc.open(NOMBRE_SHEET)
+        print(f"✅ Conexión exitosa.\n")
+    except Exception as e:
+        print(f"❌ Error crítico conectando a Google Sheets: {e}"); exit()
 
 
 # --- 5. FUNCIONES HELPER Y DE LÓGICA AVANZADA ---
@@ -89,23 +106,9 @@ def get_chrome_options():
     return chrome_opts
 
 # (El resto de funciones helper no necesitan cambios)
-def parse_ah_to_number(ah_line_str: str):
-    if not isinstance(ah_line_str, str): return None
-    s = ah_line_str.strip().replace(' ', '')
-    if not s or s in ['-', '?']: return None
-    try:
-        if '/' in s:
-            parts = s.split('/')
-            return (float(parts[0]) + float(parts[1])) / 2.0
-        return float(s)
-    except (ValueError, IndexError): return None
-
-def format_ah_as_decimal_string(ah_line_str: str):
-    numeric_value = parse_ah_to_number(ah_line_str)
-    if numeric_value is None: return ah_line_str.strip() if isinstance(ah_line_str, str) else '-'
-    if numeric_value == 0.0: return "0"
-    if abs(numeric_value % 0.5) == 0.25: return f"{numeric_value:.2f}"
-    return f"{numeric_value:.1f}"
+# Codec compartido (modules/lineas_ah.py): incluye la corrección de líneas de cuarto negativas
+parse_ah_to_number = parse_ah
+format_ah_as_decimal_string = format_ah
 
 def get_match_details_from_row(row_element, score_class_selector='score'):
     try:
@@ -125,16 +128,25 @@ def get_match_details_from_row(row_element, score_class_selector='score'):
                 'league_id_hist': row_element.get('name')}
     except Exception: return None
 
-def extract_team_stats_from_summary(soup_obj, table_selector, is_home_team):
+def get_match_details_from_record(registro, table_id=None):
+    """Mismo formato que get_match_details_from_row a partir de un registro de modules/carga_js."""
+    return {'home': registro['home'], 'away': registro['away'], 'score': registro['score_raw'].replace('-', '*'), 'score_raw': registro['score_raw'],
+            'ahLine': format_ah_as_decimal_string(registro['ah_raw']), 'ahLine_raw': registro['ah_raw'],
+            'date': registro['fecha'], 'matchIndex': registro['match_id'], 'league_id_hist': registro['league_id']}
+
+def formatear_resumen_equipo(filas, is_home_team):
+    """filas: textos de las celdas td de cada fila de la tabla de resumen del equipo (None si no está)."""
+    loc_aw_char = "L" if is_home_team else "V"
     try:
-        table = soup_obj.select_one(table_selector)
-        rows = table.find_all('tr')
-        loc_aw_char = "L" if is_home_team else "V"
-        total_cells, loc_aw_cells = rows[2].find_all('td'), rows[4].find_all('td')
-        return (f"🏆Rk:{total_cells[8].text.strip()} {'🏠Home' if is_home_team else '✈️Away'}\n"
-                f"🌍T:{total_cells[1].text.strip()}|{total_cells[2].text.strip()}/{total_cells[3].text.strip()}/{total_cells[4].text.strip()}|{total_cells[5].text.strip()}-{total_cells[6].text.strip()}\n"
-                f"🏡{loc_aw_char}:{loc_aw_cells[1].text.strip()}|{loc_aw_cells[2].text.strip()}/{loc_aw_cells[3].text.strip()}/{loc_aw_cells[4].text.strip()}|{loc_aw_cells[5].text.strip()}-{loc_aw_cells[6].text.strip()}")
-    except (IndexError, AttributeError): return f"Stats {loc_aw_char}: N/A"
+        total_cells, loc_aw_cells = filas[2], filas[4]
+        return (f"🏆Rk:{total_cells[8]} {'🏠Home' if is_home_team else '✈️Away'}\n"
+                f"🌍T:{total_cells[1]}|{total_cells[2]}/{total_cells[3]}/{total_cells[4]}|{total_cells[5]}-{total_cells[6]}\n"
+                f"🏡{loc_aw_char}:{loc_aw_cells[1]}|{loc_aw_cells[2]}/{loc_aw_cells[3]}/{loc_aw_cells[4]}|{loc_aw_cells[5]}-{loc_aw_cells[6]}")
+    except (IndexError, TypeError): return f"Stats {loc_aw_char}: N/A"
+
+def extract_team_stats_from_summary(soup_obj, table_selector, is_home_team):
+    table = soup_obj.select_one(table_selector)
+    return formatear_resumen_equipo([[td.text.strip() for td in tr.find_all('td')] for tr in table.find_all('tr')] if table else None, is_home_team)
 
 def get_team_league_info_from_script(soup):
     script_tag = soup.find("script", string=re.compile(r"var _matchInfo ="))
@@ -147,89 +159,79 @@ def get_team_league_info_from_script(soup):
             find_val(r"sclassId:\s*parseInt\('(\d+)'\)"), find_val(r"hName:\s*'([^']*)'"),
             find_val(r"gName:\s*'([^']*)'"), find_val(r"lName:\s*'([^']*)'"))
 
-def _parse_date_ddmmyyyy(d: str):
-    m = re.search(r'(\d{2})-(\d{2})-(\d{4})', d or '')
-    return (int(m.group(3)), int(m.group(2)), int(m.group(1))) if m else (1900, 1, 1)
-
-def extract_last_match_in_league(soup, table_id, team_name, league_id, is_home_game):
-    if not (table := soup.find("table", id=table_id)): return None
-    matches = []
-    score_selector = 'fscore_1' if is_home_game else 'fscore_2'
-    for row in table.find_all("tr", id=re.compile(rf"tr{table_id[-1]}_\d+")):
-        if (details := get_match_details_from_row(row, score_selector)) and details.get('league_id_hist') == league_id:
-            team_key = 'home' if is_home_game else 'away'
-            if team_name.lower() in details.get(team_key, '').lower():
-                matches.append(details)
-    if not matches: return None
-    matches.sort(key=lambda x: _parse_date_ddmmyyyy(x.get('date')), reverse=True)
-    return matches[0]
-
-def extract_comparative_match(soup, table_id, main_team, opponent, league_id):
-    if not opponent or not (table := soup.find("table", id=table_id)): return "-"
-    selector = 'fscore_1' if table_id == "table_v1" else 'fscore_2'
-    for row in table.find_all("tr"):
-        if (details := get_match_details_from_row(row, selector)) and details.get('league_id_hist') == league_id:
-            h, a = details.get('home','').lower(), details.get('away','').lower()
-            if {main_team.lower(), opponent.lower()} == {h, a}:
-                localia = 'H' if main_team.lower() == h else 'A'
-                return f"{details.get('score', '?*?')}/{details.get('ahLine', '-')} {localia}"
-    return "-"
-
-def get_key_and_rival_ids(soup, table_id: str):
-    if not soup or not (table := soup.find("table", id=table_id)):
-        return None, None, None
-    for row in table.find_all("tr", id=re.compile(rf"tr{table_id[-1]}_\d+")):
-        if row.get("vs") == "1" and (key_id := row.get("index")):
-            link_index = 1 if table_id == "table_v1" else 0
-            onclicks = row.find_all("a", onclick=True)
-            if len(onclicks) > link_index and (rival_tag := onclicks[link_index]):
-                if rival_id_match := re.search(r"team\((\d+)\)", rival_tag.get("onclick", "")):
-                    return key_id, rival_id_match.group(1), rival_tag.text.strip()
-    return None, None, None
-
-def get_col3_h2h_details_from_new_page(driver, base_url, key_match_id, rival_a_id, rival_b_id):
-    if not all([key_match_id, rival_a_id, rival_b_id]):
-        return {"status": "error", "reason": "Datos de entrada incompletos"}
-
-    url = f"{base_url}/match/h2h-{key_match_id}"
-    try:
-        driver.get(url)
-        WebDriverWait(driver, SELENIUM_TIMEOUT).until(EC.presence_of_element_located((By.ID, "table_v2")))
-        try: 
-            select = Select(WebDriverWait(driver, 5).until(EC.presence_of_element_located((By.ID, "hSelect_2"))))
-            select.select_by_value("8")
-            time.sleep(0.5)
-        except TimeoutException:
-            pass
+def extract_last_match_in_league(indice, team_id, league_id, is_home_game):
+    return indice.ultimo(team_id, 'home' if is_home_game else 'away', league_id)
+
+def extract_comparative_match(indice, main_team_id, opponent_id, league_id):
+    if not (details := indice.comparativa(main_team_id, opponent_id, league_id)): return "-"
+    return f"{details.get('score', '?*?')}/{details.get('ahLine', '-')} {details['localia']}"
+
+def get_key_and_rival_ids(indice, table_id: str):
+    # El rival es el visitante en table_v1 y el local en table_v2
+    if not (fila := indice.primera_fila_vs(table_id)) or not fila.get('matchIndex'): return None, None, None
+    lado = 'away' if table_id == "table_v1" else 'home'
+    if not (rival_id := fila.get(f'{lado}_id')): return None, None, None
+    return fila['matchIndex'], rival_id, fila.get(lado)
+
+def parse_col3_h2h_details(html, rival_a_id, rival_b_id):
+    soup = regiones_html.soup_h2h(html, ("table_v2",))
+    table = soup.find("table", id="table_v2")
+    if not table:
+        return {"status": "error", "reason": "No se encontró table_v2 en la página H2H."}
+
+    for row in table.find_all("tr", id=re.compile(r"tr2_\d+")):
+        links = row.find_all("a", onclick=True)
+        if len(links) < 2: continue
         
-        soup = BeautifulSoup(driver.page_source, "lxml")
-        table = soup.find("table", id="table_v2")
-        if not table:
-            return {"status": "error", "reason": "No se encontró table_v2 en la página H2H."}
-
-        for row in table.find_all("tr", id=re.compile(r"tr2_\d+")):
-            links = row.find_all("a", onclick=True)
-            if len(links) < 2: continue
+        h_id_m = re.search(r"team\((\d+)\)", links[0].get("onclick", ""))
+        a_id_m = re.search(r"team\((\d+)\)", links[1].get("onclick", ""))
+        if not (h_id_m and a_id_m): continue
+        
+        if {h_id_m.group(1), a_id_m.group(1)} == {str(rival_a_id), str(rival_b_id)}:
+            if not (score_span := row.find("span", class_="fscore_2")) or "-" not in score_span.text:
+                continue
             
-            h_id_m = re.search(r"team\((\d+)\)", links[0].get("onclick", ""))
-            a_id_m = re.search(r"team\((\d+)\)", links[1].get("onclick", ""))
-            if not (h_id_m and a_id_m): continue
+            score = score_span.text.strip().split("(")[0].strip()
+            tds = row.find_all("td")
+            handicap_raw = "-"
+            if len(tds) > 11:
+                cell = tds[11]
+                handicap_raw = (cell.get("data-o") or cell.text).strip() or "-"
             
-            if {h_id_m.group(1), a_id_m.group(1)} == {str(rival_a_id), str(rival_b_id)}:
-                if not (score_span := row.find("span", class_="fscore_2")) or "-" not in score_span.text:
-                    continue
-                
-                score = score_span.text.strip().split("(")[0].strip()
-                tds = row.find_all("td")
-                handicap_raw = "-"
-                if len(tds) > 11:
-                    cell = tds[11]
-                    handicap_raw = (cell.get("data-o") or cell.text).strip() or "-"
-                
-                return { "status": "found", "score": score.replace('-', '*'), "handicap": handicap_raw, "home_team": links[0].text.strip() }
-        return {"status": "not_found"}
+            return { "status": "found", "score": score.replace('-', '*'), "handicap": handicap_raw, "home_team": links[0].text.strip() }
+    return {"status": "not_found"}
+
+def _seleccionar_ultimos_8_v2(driver):
+    try: 
+        select = Select(WebDriverWait(driver, 5).until(EC.presence_of_element_located((By.ID, "hSelect_2"))))
+        select.select_by_value("8")
+        time.sleep(0.5)
+    except TimeoutException:
+        pass
+
+def open_col3_h2h_tab(driver, key_match_id, rival_a_id, rival_b_id):
+    # La página del H2H de rivales carga en otra pestaña mientras se procesa la principal
+    if not all([key_match_id, rival_a_id, rival_b_id]): return None
+    try: return pestanas.abrir(driver, f"/match/h2h-{key_match_id}")
+    except WebDriverException: return None
+
+def parse_col3_h2h_details_js(datos, rival_a_id, rival_b_id):
+    """Igual que parse_col3_h2h_details con el JSON de extraccion_js."""
+    if not (fila := extraccion_js.fila_rivales(datos, rival_a_id, rival_b_id)): return {"status": "not_found"}
+    score = fila["marcador"].split("(")[0].strip()
+    return {"status": "found", "score": score.replace('-', '*'), "handicap": (fila["ah"] if fila["celdas"] > 11 else "") or "-", "home_team": fila["nombres"][0]}
+
+def get_col3_h2h_details_from_tab(driver, pestana, rival_a_id, rival_b_id):
+    if not pestana:
+        return {"status": "error", "reason": "Datos de entrada incompletos"}
+    # En modo js se extrae el JSON dentro de la pestaña; si no se puede, se lee su HTML allí mismo
+    leer = (lambda d: extraccion_js.extraer(d) or d.page_source) if extraccion_js.ACTIVA else None
+    try:
+        pagina = pestanas.recoger(driver, pestana, "table_v2", SELENIUM_TIMEOUT, preparar=_seleccionar_ultimos_8_v2, leer=leer)
     except Exception as e:
         return {"status": "error", "reason": str(e)}
+    if isinstance(pagina, dict): return parse_col3_h2h_details_js(pagina, rival_a_id, rival_b_id)
+    return parse_col3_h2h_details(pagina, rival_a_id, rival_b_id)
 
 def format_col3_h2h_rivals(h2h_details, rival_local_name):
     if not h2h_details or h2h_details.get("status") != "found": return "-"
@@ -240,38 +242,85 @@ def format_col3_h2h_rivals(h2h_details, rival_local_name):
     localia_str = "(RL-RV)" if rival_local_name and rival_local_name.lower() in h2h_home_team.lower() else "(RV-RL)"
     return f"{score}/{ah} {localia_str}"
 
-# --- 6. WORKER PRINCIPAL DE EXTRACCIÓN ---
-def extract_match_worker(mid):
-    # ¡CAMBIO IMPORTANTE! Esta sección ahora busca chromedriver.exe en la misma carpeta.
-    service = ChromeService(executable_path="chromedriver.exe")
-    driver = webdriver.Chrome(service=service, options=get_chrome_options())
-    
-    BASE_URL = "https://live18.nowgoal25.com"
-    original_url = f"{BASE_URL}/match/h2h-{mid}"
-    try:
-        driver.get(original_url)
-        WebDriverWait(driver, SELENIUM_TIMEOUT).until(EC.presence_of_element_located((By.ID, "table_v1")))
-        for select_id in ["hSelect_1", "hSelect_2", "hSelect_3"]:
-            try: Select(WebDriverWait(driver, 3).until(EC.element_to_be_clickable((By.ID, select_id)))).select_by_value("8")
-            except TimeoutException: continue
-        time.sleep(0.5)
-        soup_main = BeautifulSoup(driver.page_source, 'lxml')
-        if "match not found" in driver.page_source.lower(): return mid, 'not_found', None
-
-        home_id, away_id, league_id, home_name, away_name, _ = get_team_league_info_from_script(soup_main)
-        if not all([home_id, away_id, league_id, home_name, away_name]): return mid, 'parse_error', (original_url, "Missing base IDs or names")
-
+def leer_pagina_h2h(driver, span):
+    """
+    Lo que el worker lee de la página h2h cargada: IDs, índice del historial, cuotas iniciales, marcador,
+    H2H (sin filtrar por liga) y resumen de cada equipo. Con extraccion_js es un JSON de pocos KB sacado
+    dentro del navegador; si no se puede, page_source parseado por regiones ("html" solo en ese caso).
+    """
+    if extraccion_js.ACTIVA and (datos := extraccion_js.extraer(driver)) and (info := extraccion_js.info_partido(datos)):
+        span.bytes = datos["bytes"]; span.anotar(fuente="navegador")
+        historial = extraccion_js.historial(datos)
+        return {"no_encontrado": False, "html": None, "info": info, "indice": IndiceEquipos.desde_registros(historial, get_match_details_from_record),
+                "cuotas": extraccion_js.cuotas_iniciales(datos) or ('?', '?'), "marcador": extraccion_js.marcador_final(datos, "*"),
+                "h2h": [d for r in historial.get("table_v3", []) if (d := get_match_details_from_record(r))],
+                "resumen": (formatear_resumen_equipo(extraccion_js.filas_resumen(datos, 'home'), True), formatear_resumen_equipo(extraccion_js.filas_resumen(datos, 'guest'), False))}
+    html = driver.page_source
+    span.bytes = len(html)
+    if "match not found" in html.lower(): return {"no_encontrado": True}
+    # Solo las regiones que se leen (tablas de historial, clasificación, earlyOdds, marcador, _matchInfo)
+    soup_main = regiones_html.soup_h2h(html)
+    # Historial, IDs y cuotas de los scripts de la página; si no encajan, del DOM como siempre
+    historial_js = carga_js.historial(html)
+    span.anotar(fuente="js" if historial_js else "dom")
+    if not (cuotas := carga_js.cuotas_iniciales(html)):
         odds_row = soup_main.select_one('#tr_o_1_8[name="earlyOdds"], #tr_o_1_31[name="earlyOdds"]')
         ah_raw = (odds_row.select_one('td:nth-of-type(4)').get("data-o") or odds_row.select_one('td:nth-of-type(4)').text).strip() if odds_row else '?'
         goals_raw = (odds_row.select_one('td:nth-of-type(10)').get("data-o") or odds_row.select_one('td:nth-of-type(10)').text).strip() if odds_row else '?'
+        cuotas = (ah_raw, goals_raw)
+    scores = soup_main.select('#mScore .end .score')
+    if historial_js: h2h = [d for r in historial_js["table_v3"] if (d := get_match_details_from_record(r))]
+    else: h2h = [d for r in soup_main.select('#table_v3 tr[id^="tr3_"]') if (d := get_match_details_from_row(r, 'fscore_3'))]
+    pagina = {"no_encontrado": False, "html": html, "info": carga_js.info_partido(html) or get_team_league_info_from_script(soup_main),
+              "indice": IndiceEquipos.desde_registros(historial_js, get_match_details_from_record) if historial_js else IndiceEquipos.desde_soup(soup_main, get_match_details_from_row),
+              "cuotas": cuotas, "marcador": f"{scores[0].text.strip()}*{scores[1].text.strip()}" if len(scores) == 2 else "?*?", "h2h": h2h,
+              "resumen": (extract_team_stats_from_summary(soup_main, 'table.team-table-home', True), extract_team_stats_from_summary(soup_main, 'table.team-table-guest', False))}
+    # Ya no se lee nada más de la página: el árbol se libera antes de seguir con el partido
+    regiones_html.liberar(soup_main)
+    return pagina
+
+# --- 6. WORKER PRINCIPAL DE EXTRACCIÓN ---
+def _fallo(mid, original_url, mensaje, driver=None, html=None):
+    """(mid, estado, (url, mensaje, clase)): la clase (timeout, navegador, limitado...) decide si se reintenta."""
+    if html is None and driver is not None:
+        try: html = driver.page_source
+        except WebDriverException: html = None
+    clase = reintentos.clasificar(mensaje, html)
+    return mid, reintentos.estado_de(clase), (original_url, mensaje, clase)
+
+def extract_match_worker(mid):
+    ruta = f"/match/h2h-{mid}"
+    original_url = f"{espejos.mejor()}{ruta}"
+    driver = None
+    try:
+        # ¡CAMBIO IMPORTANTE! Esta sección ahora busca chromedriver.exe en la misma carpeta.
+        # Cada llamada (también cada reintento) arranca un Chrome nuevo
+        service = ChromeService(executable_path="chromedriver.exe")
+        driver = webdriver.Chrome(service=service, options=get_chrome_options())
+        with trazas.span("navegar", ruta=ruta):
+            original_url = espejos.navegar(driver, ruta, "table_v1", SELENIUM_TIMEOUT) + ruta
+        with trazas.span("filtrar"):
+            for select_id in ["hSelect_1", "hSelect_2", "hSelect_3"]:
+                try: Select(WebDriverWait(driver, 3).until(EC.element_to_be_clickable((By.ID, select_id)))).select_by_value("8")
+                except TimeoutException: continue
+            time.sleep(0.5)
+        with trazas.span("parsear") as s:
+            pagina = leer_pagina_h2h(driver, s)
+            if pagina["no_encontrado"]: return mid, 'not_found', (original_url, "Match not found", "no_encontrado")
+            home_id, away_id, league_id, home_name, away_name, _ = pagina["info"]
+            if not all([home_id, away_id, league_id, home_name, away_name]): return _fallo(mid, original_url, "Missing base IDs or names", driver, html=pagina["html"])
+            indice = pagina["indice"]
+        key_id_a, rival_a_id, rival_a_name = get_key_and_rival_ids(indice, "table_v1")
+        _, rival_b_id, _ = get_key_and_rival_ids(indice, "table_v2")
+        pestana_col3 = open_col3_h2h_tab(driver, key_id_a, rival_a_id, rival_b_id)
+        guardar_indice(indice)
+
+        ah_raw, goals_raw = pagina["cuotas"]
         ah_curr_str, goals_curr_str = format_ah_as_decimal_string(ah_raw), format_ah_as_decimal_string(goals_raw)
         ah_curr_num = parse_ah_to_number(ah_raw)
+        finalScoreFmt = pagina["marcador"]
         
-        scores = soup_main.select('#mScore .end .score')
-        finalScoreFmt = f"{scores[0].text.strip()}*{scores[1].text.strip()}" if len(scores) == 2 else "?*?"
-        
-        h2h_rows = soup_main.select('#table_v3 tr[id^="tr3_"]')
-        h2h_matches = [d for r in h2h_rows if (d := get_match_details_from_row(r, 'fscore_3')) and d.get('league_id_hist') == league_id]
+        h2h_matches = [d for d in pagina["h2h"] if d.get('league_id_hist') == league_id]
         h2h_matches.sort(key=lambda x: _parse_date_ddmmyyyy(x.get('date')), reverse=True)
         ah1, res1, ah6, res6 = '-', '?*?', '-', '?*?'
         if h2h_matches:
@@ -280,28 +329,25 @@ def extract_match_worker(mid):
                 if m['home'].lower() == home_name.lower():
                     ah1, res1 = m['ahLine'], m['score']; break
         
-        last_home_match = extract_last_match_in_league(soup_main, "table_v1", home_name, league_id, True)
-        last_away_match = extract_last_match_in_league(soup_main, "table_v2", away_name, league_id, False)
+        last_home_match = extract_last_match_in_league(indice, home_id, league_id, True)
+        last_away_match = extract_last_match_in_league(indice, away_id, league_id, False)
         ah4, res4 = (last_home_match['ahLine'], last_home_match['score']) if last_home_match else ('-', '?*?')
         ah5, res5 = (last_away_match['ahLine'], last_away_match['score']) if last_away_match else ('-', '?*?')
         
-        rival_of_last_home = (last_home_match or {}).get('away')
-        rival_of_last_away = (last_away_match or {}).get('home')
-        comp7 = extract_comparative_match(soup_main, "table_v1", home_name, rival_of_last_away, league_id)
-        comp8 = extract_comparative_match(soup_main, "table_v2", away_name, rival_of_last_home, league_id)
+        rival_of_last_home = (last_home_match or {}).get('away_id')
+        rival_of_last_away = (last_away_match or {}).get('home_id')
+        comp7 = extract_comparative_match(indice, home_id, rival_of_last_away, league_id)
+        comp8 = extract_comparative_match(indice, away_id, rival_of_last_home, league_id)
         
-        key_id_a, rival_a_id, rival_a_name = get_key_and_rival_ids(soup_main, "table_v1")
-        _, rival_b_id, _ = get_key_and_rival_ids(soup_main, "table_v2")
+        localStatsStr, visitorStatsStr = pagina["resumen"]
+        del pagina
 
-        details_h2h_col3 = get_col3_h2h_details_from_new_page(driver, BASE_URL, key_id_a, rival_a_id, rival_b_id)
+        # La página principal ya está leída: no hace falta volver a ella tras el H2H de rivales
+        with trazas.span("col3") as s:
+            details_h2h_col3 = get_col3_h2h_details_from_tab(driver, pestana_col3, rival_a_id, rival_b_id)
+            s.resultado = details_h2h_col3.get("status", "ok")
         regla3 = format_col3_h2h_rivals(details_h2h_col3, rival_a_name)
         
-        driver.get(original_url)
-        WebDriverWait(driver, SELENIUM_TIMEOUT).until(EC.presence_of_element_located((By.ID, "table_v1")))
-        
-        localStatsStr = extract_team_stats_from_summary(soup_main, 'table.team-table-home', True)
-        visitorStatsStr = extract_team_stats_from_summary(soup_main, 'table.team-table-guest', False)
-        
         final_row_data = [ah1, ah_curr_str, res1, ah4, res4, ah5, res5, ah6, res6, comp7, comp8, regla3, localStatsStr, visitorStatsStr, finalScoreFmt, goals_curr_str, str(mid)]
         
         formatted_row = []
@@ -316,17 +362,27 @@ def extract_match_worker(mid):
         return mid, 'ok', (formatted_row, ah_curr_num)
 
     except Exception as e:
-        return mid, 'parse_error', (original_url, f"{type(e).__name__}: {str(e)}")
+        return _fallo(mid, original_url, f"{type(e).__name__}: {str(e)}", driver)
     finally:
         if driver: driver.quit()
 
 
 # --- 7. BUCLE PRINCIPAL Y RESUMEN ---
+# El ritmo de navegación lo marca el limitador por host compartido (modules/limitador.py)
 def worker_task(mid):
-    time.sleep(WORKER_START_DELAY)
-    return extract_match_worker(mid)
+    with perfilado.perfilar(f"masivo-{mid}", activo=perfilado.muestrear(TASA_PERFIL)), trazas.span("partido", match_id=mid, origen="masivo") as raiz:
+        mid_res, status, result = extract_match_worker(mid)
+        raiz.resultado = status
+        # Los fallos llevan el ID de traza para buscar sus spans en trazas.jsonl: (url, mensaje, clase, traza)
+        if status != 'ok': result = (*result, raiz.traza)
+        return mid_res, status, result
 
 def upload_data_to_sheet(worksheet_name, data_rows, columns_list, sheet_handle):
+    with trazas.span("subida", hoja=worksheet_name, filas=len(data_rows)) as s:
+        s.resultado = "ok" if _upload_data_to_sheet(worksheet_name, data_rows, columns_list, sheet_handle) else "error"
+        return s.resultado == "ok"
+
+def _upload_data_to_sheet(worksheet_name, data_rows, columns_list, sheet_handle):
     if not data_rows:
         print(f"  ✅ No hay datos nuevos para subir a '{worksheet_name}'.")
         return True
@@ -367,48 +423,128 @@ def upload_data_to_sheet(worksheet_name, data_rows, columns_list, sheet_handle):
     print(f"  ✅ Subida a '{worksheet_name}' completada.")
     return True
 
-print("--- [Paso 4/7] Iniciando proceso de extracción... ---")
-global_start_time = time.time()
-main_process = psutil.Process(os.getpid())
-print(f"    (RAM inicial: {main_process.memory_info().rss / 1024**2:.2f} MB)")
-
-counts = {'ok': 0, 'skipped': 0, 'not_found': 0, 'load_error': 0, 'parse_error': 0}
-failed_mids = {'not_found': [], 'load': [], 'parse': []}
-
-for range_info in EXTRACTION_RANGES:
-    range_start_time = time.time()
-    start_id, end_id, label = range_info['start_id'], range_info['end_id'], range_info['label']
-    print(f"\n{'='*60}\n--- Procesando Rango: '{label}' (IDs: {start_id} a {end_id}) ---\n{'='*60}")
-    
-    ids_to_process = list(range(start_id, end_id - 1, -1))
+def extraer_ids(ids_to_process, label, counts, failed_mids):
+    """
+    Extrae una lista de IDs con MAX_WORKERS navegadores; devuelve (filas AH<=0, filas AH>0).
+    Los fallos transitorios (timeout, Chrome caído, bloqueo, página vacía) no cuentan todavía:
+    se reintentan en un barrido final con espera exponencial, cada vez con un Chrome nuevo.
+    """
     rows_neg_zero, rows_pos = [], []
     processed_count = 0
+    cola = reintentos.ColaReintentos()
 
-    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
-        futures = {executor.submit(worker_task, mid): mid for mid in ids_to_process}
+    def recoger(futures):
+        nonlocal processed_count
         for future in as_completed(futures):
-            processed_count += 1
             mid_completed = futures[future]
-            try:
-                mid_res, status, result = future.result()
-                counts[status] += 1
-                if status == 'ok':
-                    row_data, ah_num = result
-                    if ah_num is not None and ah_num <= 0: rows_neg_zero.append(row_data)
-                    else: rows_pos.append(row_data)
-                elif status in failed_mids:
-                    failed_mids[status].append(result if status != 'not_found' else mid_completed)
-                print(f"\r  Progreso '{label}': {processed_count}/{len(ids_to_process)} | OK: {counts['ok']} | Fallos: {counts['load_error'] + counts['parse_error']} | RAM: {main_process.memory_info().rss / 1024**2:.1f}MB", end="")
+            try: mid_res, status, result = future.result()
             except Exception as exc:
-                counts['load_error'] += 1; failed_mids['load'].append((mid_completed, str(exc)))
                 print(f"\n  [ERROR FATAL] MID {mid_completed}: {exc}")
-    
-    print(f"\n\n--- Fin Extracción Rango '{label}' ({(time.time() - range_start_time):.2f}s) ---")
-    print(f"  Resultados: {len(rows_pos)} para '{NOMBRE_HOJA_POSITIVOS}', {len(rows_neg_zero)} para '{NOMBRE_HOJA_NEG_CERO}'.")
+                mensaje = f"{type(exc).__name__}: {exc}"
+                clase = reintentos.clasificar(mensaje)
+                # El worker murió sin devolver la URL que usó
+                mid_res, status, result = mid_completed, reintentos.estado_de(clase), (None, mensaje, clase, None)
+            if status != 'ok' and cola.anotar(mid_completed, result[2]):
+                counts['reintentos'] += 1
+                continue
+            processed_count += 1
+            counts[status] += 1
+            if status == 'ok':
+                if cola.intentos(mid_completed): counts['recuperados'] += 1
+                row_data, ah_num = result
+                if ah_num is not None and ah_num <= 0: rows_neg_zero.append(row_data)
+                else: rows_pos.append(row_data)
+            elif (clave := {'parse_error': 'parse', 'load_error': 'load'}.get(status, status)) in failed_mids:
+                failed_mids[clave].append(result)
+                if status != 'not_found':
+                    url, mensaje, clase, traza = result
+                    reintentos.guardar_permanente(mid_completed, clase, mensaje, cola.intentos(mid_completed), url=url, traza=traza, rango=label)
+            print(f"\r  Progreso '{label}': {processed_count}/{len(ids_to_process)} | OK: {counts['ok']} | Fallos: {counts['load_error'] + counts['parse_error']} | Reintentos: {len(cola)} | RAM: {main_process.memory_info().rss / 1024**2:.1f}MB | {limitador.resumen(espejos.mejor())}", end="")
+
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+        recoger({executor.submit(worker_task, mid): mid for mid in ids_to_process})
+        # Barrido final del rango: se espera al primer reintento que toque y se lanzan todos los que ya pueden ir
+        while len(cola):
+            time.sleep(max(0.0, cola.proximo() - time.time()))
+            listos = cola.listos()
+            print(f"\n  Reintentando {len(listos)} partidos de '{label}'...")
+            recoger({executor.submit(worker_task, mid): mid for mid in listos})
+    return rows_neg_zero, rows_pos
+
+def trozos_de_rangos(ranges):
+    """Divide cada rango (de start_id hacia abajo hasta end_id) en trozos de TAMANO_TROZO IDs."""
+    for range_info in ranges:
+        ids = list(range(range_info['start_id'], range_info['end_id'] - 1, -1))
+        for i in range(0, len(ids), TAMANO_TROZO):
+            parte = ids[i:i + TAMANO_TROZO]
+            yield {"id": f"{parte[0]}-{parte[-1]}", "label": range_info['label'], "start_id": parte[0], "end_id": parte[-1]}
+
+def nuevos_contadores():
+    return {'ok': 0, 'skipped': 0, 'not_found': 0, 'load_error': 0, 'parse_error': 0, 'reintentos': 0, 'recuperados': 0}, {'not_found': [], 'load': [], 'parse': []}
+
+print("--- [Paso 4/7] Iniciando proceso de extracción... ---")
+global_start_time = time.time()
+main_process = psutil.Process(os.getpid())
+print(f"    (RAM inicial: {main_process.memory_info().rss / 1024**2:.2f} MB)")
+
+counts, failed_mids = nuevos_contadores()
+
+if MODO == "local":
+    for range_info in EXTRACTION_RANGES:
+        range_start_time = time.time()
+        start_id, end_id, label = range_info['start_id'], range_info['end_id'], range_info['label']
+        print(f"\n{'='*60}\n--- Procesando Rango: '{label}' (IDs: {start_id} a {end_id}) ---\n{'='*60}")
+
+        rows_neg_zero, rows_pos = extraer_ids(list(range(start_id, end_id - 1, -1)), label, counts, failed_mids)
+
+        print(f"\n\n--- Fin Extracción Rango '{label}' ({(time.time() - range_start_time):.2f}s) ---")
+        print(f"  Resultados: {len(rows_pos)} para '{NOMBRE_HOJA_POSITIVOS}', {len(rows_neg_zero)} para '{NOMBRE_HOJA_NEG_CERO}'.")
+
+        upload_data_to_sheet(NOMBRE_HOJA_NEG_CERO, rows_neg_zero, COLS, sh)
+        upload_data_to_sheet(NOMBRE_HOJA_POSITIVOS, rows_pos, COLS, sh)
+
+elif MODO == "trabajar":
+    # Cada trabajador usa sus propios MAX_WORKERS navegadores; se escala añadiendo procesos o máquinas
+    trabajador = cola_trabajo.identificador_trabajador()
+    print(f"  Trabajador {trabajador} | cola: {cola_trabajo.DIRECTORIO_COLA}")
+    cola_trabajo.preparar()
+    while True:
+        cola_trabajo.reasignar_caducados()
+        if not (trozo := cola_trabajo.reclamar(trabajador)):
+            if cola_trabajo.terminado(): break
+            time.sleep(PAUSA_COLA); continue
+        print(f"\n--- Trozo {trozo['id']} ('{trozo['label']}', intento {trozo['intentos']}) ---")
+        counts_trozo, failed_trozo = nuevos_contadores()
+        with cola_trabajo.Latido(trozo['id'], trabajador):
+            rows_neg_zero, rows_pos = extraer_ids(list(range(trozo['start_id'], trozo['end_id'] - 1, -1)), trozo['label'], counts_trozo, failed_trozo)
+        cola_trabajo.completar(trozo['id'], {"trabajador": trabajador, "label": trozo['label'], "rows_neg_zero": rows_neg_zero, "rows_pos": rows_pos,
+                                             "counts": counts_trozo, "failed_mids": failed_trozo})
+        for k, v in counts_trozo.items(): counts[k] += v
+    print(f"\n  No quedan trozos pendientes en la cola.")
+
+else:  # coordinar
+    nuevos = cola_trabajo.encolar(trozos_de_rangos(EXTRACTION_RANGES))
+    print(f"  {nuevos} trozos nuevos en {cola_trabajo.DIRECTORIO_COLA}. Arranca trabajadores con: python Scraper.py trabajar")
+    while True:
+        cola_trabajo.reasignar_caducados()
+        # Se mira antes de recoger: completar() escribe el resultado antes de mover el trozo a hechos,
+        # así que si ya estaba todo terminado, lo que se recoge ahora incluye el último resultado
+        terminado = cola_trabajo.terminado()
+        rows_neg_zero, rows_pos = [], []
+        for id_trozo, resultado in cola_trabajo.recoger_resultados():
+            rows_neg_zero += resultado["rows_neg_zero"]; rows_pos += resultado["rows_pos"]
+            for k, v in resultado["counts"].items(): counts[k] += v
+            for k, v in resultado["failed_mids"].items(): failed_mids[k] += v
+        # Se sube a medida que llegan trozos, no al final: un corte del coordinador no pierde lo ya recogido
+        if rows_neg_zero or rows_pos:
+            upload_data_to_sheet(NOMBRE_HOJA_NEG_CERO, rows_neg_zero, COLS, sh)
+            upload_data_to_sheet(NOMBRE_HOJA_POSITIVOS, rows_pos, COLS, sh)
+        estado_cola = cola_trabajo.estado()
+        print(f"\r  Cola: {estado_cola['pendientes']} pendientes | {estado_cola['en_curso']} en curso | {estado_cola['hechos']} hechos | {estado_cola['fallidos']} fallidos | OK: {counts['ok']}", end="")
+        if terminado: break
+        time.sleep(PAUSA_COLA)
+    if (fallidos := cola_trabajo.estado()['fallidos']): print(f"\n  ⚠️ {fallidos} trozos agotaron sus {cola_trabajo.MAX_INTENTOS} intentos (ver {cola_trabajo.DIRECTORIO_COLA}/fallidos).")
 
-    upload_data_to_sheet(NOMBRE_HOJA_NEG_CERO, rows_neg_zero, COLS, sh)
-    upload_data_to_sheet(NOMBRE_HOJA_POSITIVOS, rows_pos, COLS, sh)
-    
 print("\n" + "="*60)
 print("--- [Paso 5/7] Proceso de extracción y subida completado. ---")
 print("="*60 + "\n")
@@ -421,5 +557,10 @@ print(f"🟡 Partidos Saltados (Sin AH inicial): {counts['skipped']}")
 print(f"🔴 Partidos No Encontrados (404): {counts['not_found']}")
 print(f"❌ Errores de Carga (Timeout/Driver): {counts['load_error']}")
 print(f"❌ Errores de Parseo (HTML inesperado): {counts['parse_error']}")
+print(f"🔁 Reintentos: {counts['reintentos']} (partidos recuperados: {counts['recuperados']})")
+if counts['load_error'] or counts['parse_error']: print(f"📝 Fallos definitivos guardados en {reintentos.RUTA_FALLOS}")
 print(f"🧠 RAM Final: {main_process.memory_info().rss / 1024**2:.2f} MB")
+for m in espejos.metricas():
+    print(f"🌐 {m['espejo']}: {m['latencia_ms'] if m['latencia_ms'] is not None else '?'} ms | {m['peticiones']} peticiones | {m['errores']} errores | {'sano' if m['sano'] else 'caído'}")
+print(f"🔎 Trazas por partido en {trazas.RUTA_TRAZAS} (resumen: python -m modules.trazas)")
 print("\n🎉 ¡Proceso finalizado! Revisa tus hojas de Google Sheets para ver los datos.")
\ No newline at end of file
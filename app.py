@@ -1,14 +1,18 @@
 # app_streamlit.py
 import streamlit as st
 import asyncio
-from playwright.async_api import async_playwright
-from bs4 import BeautifulSoup
-import datetime
+import time
 import pandas as pd
 import os # Importante para la modificación de Selenium
 
 # Importa la lógica principal del scraper
-from modules.estudio_scraper import obtener_datos_completos_partido, format_ah_as_decimal_string_of
+from modules.estudio_scraper import obtener_datos_completos_partido, format_ah_as_decimal_string_of, parse_ah_to_number_of
+from modules.partidos_proximos import CACHE_PARTIDOS, get_main_page_matches_async, inicio_partido
+from modules.indice_partidos import IndicePartidos
+from modules import cache_estudios
+from modules.evaluador_lineas import (evaluar_handicap, evaluar_goles, clasificar_movimiento, resumen_por_linea,
+                                      LINEAS_AH_CANDIDATAS, LINEAS_GOLES_CANDIDATAS, ETIQUETAS_AH, ETIQUETAS_GOLES,
+                                      ETIQUETAS_MOVIMIENTO, CUBIERTO, PUSH, NO_CUBIERTO)
 
 # --- CONFIGURACIÓN DE LA PÁGINA ---
 st.set_page_config(
@@ -21,57 +25,27 @@ st.set_page_config(
 def mostrar_pagina_principal():
     st.title("📈 Próximos Partidos Encontrados")
 
-    URL_NOWGOAL = "https://live20.nowgoal25.com/"
-
-    def parse_main_page_matches(html_content):
-        soup = BeautifulSoup(html_content, 'html.parser')
-        match_rows = soup.find_all('tr', id=lambda x: x and x.startswith('tr1_'))
-        upcoming_matches = []
-        now_utc = datetime.datetime.utcnow()
-        for row in match_rows:
-            match_id = row.get('id', '').replace('tr1_', '')
-            if not match_id: continue
-            time_cell = row.find('td', {'name': 'timeData'})
-            if not time_cell or not time_cell.has_attr('data-t'): continue
-            try:
-                match_time = datetime.datetime.strptime(time_cell['data-t'], '%Y-%m-%d %H:%M:%S')
-            except (ValueError, IndexError):
-                continue
-            if match_time < now_utc: continue
-            home_team_tag = row.find('a', {'id': f'team1_{match_id}'})
-            away_team_tag = row.find('a', {'id': f'team2_{match_id}'})
-            odds_data = row.get('odds', '').split(',')
-            upcoming_matches.append({
-                "id": match_id,
-                "time": match_time.strftime('%Y-%m-%d %H:%M'),
-                "home_team": home_team_tag.text.strip() if home_team_tag else "N/A",
-                "away_team": away_team_tag.text.strip() if away_team_tag else "N/A",
-                "handicap": format_ah_as_decimal_string_of(odds_data[2]) if len(odds_data) > 2 else "N/A",
-                "goal_line": format_ah_as_decimal_string_of(odds_data[10]) if len(odds_data) > 10 else "N/A"
-            })
-        upcoming_matches.sort(key=lambda x: x['time'])
-        return upcoming_matches
-
     @st.cache_data(ttl=600)
-    async def get_main_page_matches_async():
-        async with async_playwright() as p:
-            # En la nube, no es necesario especificar el ejecutable si está instalado globalmente
-            browser = await p.chromium.launch(headless=True)
-            page = await browser.new_page()
-            try:
-                await page.goto(URL_NOWGOAL, wait_until="networkidle", timeout=20000)
-                await page.wait_for_selector('tr[id^="tr1_"]', timeout=10000)
-                html_content = await page.content()
-                return parse_main_page_matches(html_content)
-            finally:
-                await browser.close()
+    def get_main_page_matches():
+        matches = asyncio.run(get_main_page_matches_async())
+        # La hora de comienzo de cada partido marca la caducidad de su estudio (modules/cache_estudios)
+        CACHE_PARTIDOS.guardar("portada", {"guardado": time.time(), "partidos": matches}, ttl=600)
+        return matches
+    # El índice se construye una vez por carga de la portada; cada rerun solo filtra sobre él
+    @st.cache_resource(ttl=600)
+    def get_indice_partidos():
+        return IndicePartidos(get_main_page_matches())
     try:
         with st.spinner("Buscando partidos en Nowgoal... ⚽"):
-            all_matches = asyncio.run(get_main_page_matches_async())
+            indice = get_indice_partidos()
         st.sidebar.header("Filtros")
         filter_handicap = st.sidebar.checkbox("Mostrar solo con Hándicap", True)
-        filtered_matches = [m for m in all_matches if m.get('handicap') and m.get('handicap') not in ['N/A', '-']] if filter_handicap else all_matches
-        st.info(f"Mostrando {len(filtered_matches)} de {len(all_matches)} partidos encontrados.")
+        ah_min, ah_max = st.sidebar.slider("Rango de AH", -3.0, 3.0, (-3.0, 3.0), step=0.25)
+        horas = st.sidebar.number_input("Empiezan en las próximas horas (0 = todas)", min_value=0.0, value=0.0, step=0.5)
+        rango_ah = {"ah_min": ah_min, "ah_max": ah_max} if (ah_min, ah_max) != (-3.0, 3.0) else {}
+        rango_horas = {"desde": time.time(), "hasta": time.time() + horas * 3600} if horas else {}
+        filtered_matches = [indice.partidos[i] for i in indice.filtrar(con_handicap=filter_handicap, **rango_ah, **rango_horas)]
+        st.info(f"Mostrando {len(filtered_matches)} de {len(indice)} partidos encontrados.")
         if filtered_matches:
             df = pd.DataFrame(filtered_matches)
             df['Análisis'] = df['id'].apply(lambda id: f"?match_id={id}")
@@ -86,9 +60,10 @@ def mostrar_pagina_estudio(match_id):
         st.query_params.clear()
         st.rerun()
 
-    @st.cache_data(ttl=3600)
+    # Caché compartida con web.py y entre procesos; caduca según falte más o menos para el partido
     def obtener_datos_cacheados(m_id):
-        return obtener_datos_completos_partido(m_id)
+        cache_estudios.precargar()
+        return cache_estudios.obtener_o_calcular(m_id, obtener_datos_completos_partido, inicio_partido(m_id))[0]
 
     with st.spinner(f"Realizando análisis completo para el partido ID: {match_id}..."):
         data = obtener_datos_cacheados(match_id)
@@ -104,6 +79,41 @@ def mostrar_pagina_estudio(match_id):
     st.subheader("📊 Clasificación en Liga y Estadísticas O/U")
     # ... etc.
 
+    mostrar_simulador_lineas(data)
+
+# --- SIMULADOR "¿Y SI LA LÍNEA FUERA...?" (sin volver a scrapear) ---
+def mostrar_simulador_lineas(data):
+    precedentes = data.get('precedentes')
+    if not precedentes or not precedentes['claves']:
+        return
+    st.subheader("🔮 ¿Y si la línea fuera otra?")
+    ah_inicial = parse_ah_to_number_of(data.get('main_match_odds', {}).get('ah_linea_raw'))
+    goles_inicial = parse_ah_to_number_of(data.get('main_match_odds', {}).get('goals_linea_raw'))
+    opciones_ah, opciones_goles = [float(l) for l in LINEAS_AH_CANDIDATAS], [float(l) for l in LINEAS_GOLES_CANDIDATAS]
+    c1, c2 = st.columns(2)
+    linea_ah = c1.select_slider("Línea AH", options=opciones_ah, value=ah_inicial if ah_inicial in opciones_ah else 0.0)
+    linea_goles = c2.select_slider("Línea de goles", options=opciones_goles, value=goles_inicial if goles_inicial in opciones_goles else 2.5)
+
+    gh, ga, orientacion = precedentes['goles_h'], precedentes['goles_a'], precedentes['orientacion']
+    res_ah = evaluar_handicap(gh, ga, orientacion, [linea_ah])[:, 0]
+    res_goles = evaluar_goles(gh, ga, [linea_goles])[:, 0]
+    movimiento = clasificar_movimiento(precedentes['ah_historico'], orientacion, [linea_ah])[:, 0]
+    st.dataframe(pd.DataFrame({
+        "Precedente": precedentes['claves'],
+        "Resultado": [f"{h:.0f}:{a:.0f}" if h == h else "?:?" for h, a in zip(gh, ga)],
+        "AH histórico": [format_ah_as_decimal_string_of(str(v)) if v == v else "-" for v in precedentes['ah_historico']],
+        "Movimiento": [ETIQUETAS_MOVIMIENTO[int(m)] for m in movimiento],
+        f"AH {linea_ah:g}": [ETIQUETAS_AH[int(r)] for r in res_ah],
+        f"Goles {linea_goles:g}": [ETIQUETAS_GOLES[int(r)] for r in res_goles],
+    }), hide_index=True, use_container_width=True)
+
+    # Todas las líneas candidatas de una sola pasada
+    matriz = evaluar_handicap(gh, ga, orientacion, LINEAS_AH_CANDIDATAS)
+    resumen = resumen_por_linea(matriz, LINEAS_AH_CANDIDATAS)
+    with st.expander("Resumen de cobertura para todas las líneas AH"):
+        st.dataframe(pd.DataFrame([{"Línea": format_ah_as_decimal_string_of(str(l)), "Cubierto": c[CUBIERTO], "Push": c[PUSH], "No cubierto": c[NO_CUBIERTO]}
+                                   for l, c in resumen.items()]), hide_index=True, use_container_width=True)
+
 # --- CONTROLADOR PRINCIPAL ---
 if 'match_id' in st.query_params:
     mostrar_pagina_estudio(st.query_params['match_id'])
@@ -1,14 +1,11 @@
 # modules/estudio.py
 import streamlit as st
 import time
-import requests
 import re
 import math
+import os
 from bs4 import BeautifulSoup
-from requests.adapters import HTTPAdapter
-from urllib3.util.retry import Retry
 import pandas as pd
-from concurrent.futures import ThreadPoolExecutor
 # Importaciones de Selenium
 from selenium import webdriver
 from selenium.webdriver.chrome.options import Options as ChromeOptions
@@ -17,65 +14,18 @@ from selenium.webdriver.support.ui import WebDriverWait, Select
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.common.exceptions import TimeoutException, WebDriverException, ElementClickInterceptedException, NoSuchElementException
 
+from modules.lineas_ah import parse_ah, format_ah
+from modules.estadisticas_progresion import obtener_estadisticas_progresion
+from modules import espejos, pestanas, perfilado
+
 # --- CONFIGURACIÓN GLOBAL ---
-BASE_URL_OF = "https://live18.nowgoal25.com"
 SELENIUM_TIMEOUT_SECONDS_OF = 10
 SELENIUM_POLL_FREQUENCY_OF = 0.2
 PLACEHOLDER_NODATA = "*(No disponible)*"
 
-# --- FUNCIONES HELPER PARA PARSEO Y FORMATEO ---
-def parse_ah_to_number_of(ah_line_str: str):
-    if not isinstance(ah_line_str, str): return None
-    s = ah_line_str.strip().replace(' ', '')
-    if not s or s in ['-', '?']: return None
-    original_starts_with_minus = ah_line_str.strip().startswith('-')
-    try:
-        if '/' in s:
-            parts = s.split('/')
-            if len(parts) != 2: return None
-            p1_str, p2_str = parts[0], parts[1]
-            val1 = float(p1_str)
-            val2 = float(p2_str)
-            if val1 < 0 and not p2_str.startswith('-') and val2 > 0:
-                 val2 = -abs(val2)
-            elif original_starts_with_minus and val1 == 0.0 and \
-                 (p1_str == "0" or p1_str == "-0") and \
-                 not p2_str.startswith('-') and val2 > 0:
-                val2 = -abs(val2)
-            return (val1 + val2) / 2.0
-        else:
-            return float(s)
-    except (ValueError, IndexError):
-        return None
-
-def format_ah_as_decimal_string_of(ah_line_str: str, for_sheets=False):
-    if not isinstance(ah_line_str, str) or not ah_line_str.strip() or ah_line_str.strip() in ['-', '?']:
-        return ah_line_str.strip() if isinstance(ah_line_str, str) and ah_line_str.strip() in ['-','?'] else '-'
-    numeric_value = parse_ah_to_number_of(ah_line_str)
-    if numeric_value is None:
-        return ah_line_str.strip() if ah_line_str.strip() in ['-','?'] else '-'
-    if numeric_value == 0.0: return "0"
-    sign = -1 if numeric_value < 0 else 1
-    abs_num = abs(numeric_value)
-    mod_val = abs_num % 1
-    if mod_val == 0.0: abs_rounded = abs_num
-    elif mod_val == 0.25: abs_rounded = math.floor(abs_num) + 0.25
-    elif mod_val == 0.5: abs_rounded = abs_num
-    elif mod_val == 0.75: abs_rounded = math.floor(abs_num) + 0.75
-    else:
-        if mod_val < 0.25: abs_rounded = math.floor(abs_num)
-        elif mod_val < 0.75: abs_rounded = math.floor(abs_num) + 0.5
-        else: abs_rounded = math.ceil(abs_num)
-    final_value_signed = sign * abs_rounded
-    if final_value_signed == 0.0: output_str = "0"
-    elif abs(final_value_signed - round(final_value_signed, 0)) < 1e-9 : output_str = str(int(round(final_value_signed, 0)))
-    elif abs(final_value_signed - (math.floor(final_value_signed) + 0.5)) < 1e-9: output_str = f"{final_value_signed:.1f}"
-    elif abs(final_value_signed - (math.floor(final_value_signed) + 0.25)) < 1e-9 or \
-         abs(final_value_signed - (math.floor(final_value_signed) + 0.75)) < 1e-9: output_str = f"{final_value_signed:.2f}".replace(".25", ".25").replace(".75", ".75")
-    else: output_str = f"{final_value_signed:.2f}"
-    if for_sheets:
-        return "'" + output_str.replace('.', ',') if output_str not in ['-','?'] else output_str
-    return output_str
+# --- FUNCIONES HELPER PARA PARSEO Y FORMATEO (CODEC COMPARTIDO EN modules/lineas_ah.py) ---
+parse_ah_to_number_of = parse_ah
+format_ah_as_decimal_string_of = format_ah
 
 # --- SISTEMA EXCEPCIONAL DE ANÁLISIS DE MERCADO ---
 
@@ -340,39 +290,10 @@ def get_match_details_from_row_of(row_element, score_class_selector='score', sou
         return None
 
 # --- SESIÓN Y FETCHING ---
-@st.cache_resource
-def get_requests_session_of():
-    session = requests.Session()
-    retries = Retry(total=3, backoff_factor=0.5, status_forcelist=[500, 502, 503, 504])
-    adapter = HTTPAdapter(max_retries=retries)
-    session.mount("https://", adapter)
-    session.mount("http://", adapter)
-    session.headers.update({"User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 Chrome/116.0.0.0 Safari/537.36"})
-    return session
-
-@st.cache_data(ttl=7200)
+# Caché persistente compartida con modules/estudio_scraper (los precedentes ya están terminados)
 def get_match_progression_stats_data(match_id: str) -> pd.DataFrame | None:
     if not match_id or not match_id.isdigit(): return None
-    url = f"https://live18.nowgoal25.com/match/live-{match_id}"
-    try:
-        session = get_requests_session_of()
-        response = session.get(url, timeout=10)
-        response.raise_for_status()
-        soup = BeautifulSoup(response.text, 'lxml')
-        stat_titles = {"Shots": "-", "Shots on Goal": "-", "Attacks": "-", "Dangerous Attacks": "-"}
-        team_tech_div = soup.find('div', id='teamTechDiv_detail')
-        if team_tech_div and (stat_list := team_tech_div.find('ul', class_='stat')):
-            for li in stat_list.find_all('li'):
-                if (title_span := li.find('span', class_='stat-title')) and (stat_title := title_span.get_text(strip=True)) in stat_titles:
-                    values = [v.get_text(strip=True) for v in li.find_all('span', class_='stat-c')]
-                    if len(values) == 2:
-                        stat_titles[stat_title] = {"Home": values[0], "Away": values[1]}
-        table_rows = [{"Estadistica_EN": name, "Casa": vals.get('Home', '-'), "Fuera": vals.get('Away', '-')}
-                      for name, vals in stat_titles.items() if isinstance(vals, dict)]
-        df = pd.DataFrame(table_rows)
-        return df.set_index("Estadistica_EN") if not df.empty else df
-    except requests.RequestException:
-        return None
+    return obtener_estadisticas_progresion(match_id)
 
 def display_match_progression_stats_view(match_id: str, home_team_name: str, away_team_name: str):
     stats_df = get_match_progression_stats_data(match_id)
@@ -445,19 +366,24 @@ def get_selenium_driver_of():
         st.error(f"Error inicializando Selenium driver (OF): {e}")
         return None
 
-def get_h2h_details_for_original_logic_of(driver, key_match_id, rival_a_id, rival_b_id, rival_a_name="Rival A", rival_b_name="Rival B"):
-    if not all([driver, key_match_id, rival_a_id, rival_b_id]):
+def abrir_h2h_rivales_of(driver, key_match_id, rival_a_id, rival_b_id):
+    # El H2H de rivales carga en otra pestaña mientras se procesa la página principal
+    if not all([driver, key_match_id, rival_a_id, rival_b_id]): return None
+    try: return pestanas.abrir(driver, f"/match/h2h-{key_match_id}")
+    except WebDriverException: return None
+
+def _seleccionar_ultimos_8_v2_of(driver):
+    try:
+        select = Select(WebDriverWait(driver, 5).until(EC.presence_of_element_located((By.ID, "hSelect_2"))))
+        select.select_by_value("8")
+        time.sleep(0.5)
+    except TimeoutException: pass
+
+def recoger_h2h_rivales_of(driver, pestana, rival_a_id, rival_b_id, rival_a_name="Rival A", rival_b_name="Rival B"):
+    if not pestana:
         return {"status": "error", "resultado": "N/A (Datos incompletos para H2H)"}
-    url = f"{BASE_URL_OF}/match/h2h-{key_match_id}"
     try:
-        driver.get(url)
-        WebDriverWait(driver, SELENIUM_TIMEOUT_SECONDS_OF).until(EC.presence_of_element_located((By.ID, "table_v2")))
-        try:
-            select = Select(WebDriverWait(driver, 5).until(EC.presence_of_element_located((By.ID, "hSelect_2"))))
-            select.select_by_value("8")
-            time.sleep(0.5)
-        except TimeoutException: pass
-        soup = BeautifulSoup(driver.page_source, "lxml")
+        soup = BeautifulSoup(pestanas.recoger(driver, pestana, "table_v2", SELENIUM_TIMEOUT_SECONDS_OF, preparar=_seleccionar_ultimos_8_v2_of), "lxml")
     except Exception as e:
         return {"status": "error", "resultado": f"N/A (Error Selenium en H2H Col3: {type(e).__name__})"}
     if not (table := soup.find("table", id="table_v2")):
@@ -484,6 +410,10 @@ def get_h2h_details_for_original_logic_of(driver, key_match_id, rival_a_id, riva
             }
     return {"status": "not_found", "resultado": f"H2H directo no encontrado para {rival_a_name} vs {rival_b_name}."}
 
+def get_h2h_details_for_original_logic_of(driver, key_match_id, rival_a_id, rival_b_id, rival_a_name="Rival A", rival_b_name="Rival B"):
+    pestana = abrir_h2h_rivales_of(driver, key_match_id, rival_a_id, rival_b_id)
+    return recoger_h2h_rivales_of(driver, pestana, rival_a_id, rival_b_id, rival_a_name, rival_b_name)
+
 def get_team_league_info_from_script_of(soup):
     script_tag = soup.find("script", string=re.compile(r"var _matchInfo ="))
     if not (script_tag and script_tag.string): return (None,) * 3 + ("N/A",) * 3
@@ -764,16 +694,15 @@ def display_other_feature_ui2():
         if not main_match_id:
             results_container.warning("⚠️ Por favor, ingresa un ID de partido válido."); st.stop()
 
+        if perfil := st.session_state.get('perfil_estudio'): perfil.etiqueta = f"estudio-{main_match_id}"
         start_time = time.time()
         with results_container, st.spinner("🔄 Optimizando carga y extrayendo datos..."):
             driver = st.session_state.get('driver_other_feature') or get_selenium_driver_of()
             st.session_state.driver_other_feature = driver
             if not driver:
                 st.error("❌ No se pudo inicializar el WebDriver. El análisis no puede continuar."); st.stop()
-            main_page_url = f"{BASE_URL_OF}/match/h2h-{main_match_id}"
             try:
-                driver.get(main_page_url)
-                WebDriverWait(driver, 10).until(EC.presence_of_element_located((By.ID, "table_v1")))
+                espejos.navegar(driver, f"/match/h2h-{main_match_id}", "table_v1", 10)
                 for select_id in ["hSelect_1", "hSelect_2", "hSelect_3"]:
                     try:
                         Select(WebDriverWait(driver, 2).until(EC.presence_of_element_located((By.ID, select_id)))).select_by_value("8")
@@ -787,12 +716,13 @@ def display_other_feature_ui2():
 
         with st.spinner("🧠 Procesando datos y realizando análisis en paralelo..."):
             home_id, away_id, league_id, home_name, away_name, _ = get_team_league_info_from_script_of(soup_completo)
+            key_match_id_rival_a, rival_a_id, rival_a_name = get_rival_a_for_original_h2h_of(soup_completo, league_id)
+            _, rival_b_id, rival_b_name = get_rival_b_for_original_h2h_of(soup_completo, league_id)
+            pestana_col3 = abrir_h2h_rivales_of(driver, key_match_id_rival_a, rival_a_id, rival_b_id)
             home_standings = extract_standings_data_from_h2h_page_of(soup_completo, home_name)
             away_standings = extract_standings_data_from_h2h_page_of(soup_completo, away_name)
             home_ou_stats = extract_over_under_stats_from_div_of(soup_completo, 'home')
             away_ou_stats = extract_over_under_stats_from_div_of(soup_completo, 'away')
-            key_match_id_rival_a, rival_a_id, rival_a_name = get_rival_a_for_original_h2h_of(soup_completo, league_id)
-            _, rival_b_id, rival_b_name = get_rival_b_for_original_h2h_of(soup_completo, league_id)
             last_home_match = extract_last_match_in_league_of(soup_completo, "table_v1", home_name, league_id, True)
             last_away_match = extract_last_match_in_league_of(soup_completo, "table_v2", away_name, league_id, False)
             h2h_data = extract_h2h_data_of(soup_completo, home_name, away_name, None)
@@ -800,9 +730,8 @@ def display_other_feature_ui2():
             comp_V_vs_UL_H = extract_comparative_match_of(soup_completo, "table_v2", away_name, (last_home_match or {}).get('away_team'), league_id, False)
             main_match_odds_data = extract_bet365_initial_odds_of(soup_completo)
 
-            with ThreadPoolExecutor(max_workers=8) as executor:
-                future_h2h_col3 = executor.submit(get_h2h_details_for_original_logic_of, driver, key_match_id_rival_a, rival_a_id, rival_b_id, rival_a_name, rival_b_name)
-                details_h2h_col3 = future_h2h_col3.result()
+            # Se recoge en este mismo hilo: el driver de la sesión no admite órdenes concurrentes
+            details_h2h_col3 = recoger_h2h_rivales_of(driver, pestana_col3, rival_a_id, rival_b_id, rival_a_name, rival_b_name)
 
             # ---
             # RENDERIZACIÓN DE LA UI ---
@@ -943,4 +872,7 @@ def display_other_feature_ui2():
 
 if __name__ == '__main__':
     st.set_page_config(layout="wide", page_title="Análisis Avanzado de Partidos (OF)", initial_sidebar_state="expanded")
-    display_other_feature_ui2()
+    # MASIVO_PERFILAR_ESTUDIO=1: perfil de cada análisis (la etiqueta con el ID se pone al pulsar el botón)
+    with perfilado.perfilar(activo=os.environ.get("MASIVO_PERFILAR_ESTUDIO") == "1") as perfil:
+        st.session_state['perfil_estudio'] = perfil
+        display_other_feature_ui2()
@@ -0,0 +1,71 @@
+# modules/api_json.py
+"""
+Serialización JSON estable de los estudios y de la lista de próximos partidos para la API
+versionada de web.py, con ETag por hash del contenido y Cache-Control según el estado del partido.
+El cuerpo se genera con las claves ordenadas, así que el mismo contenido da siempre el mismo ETag.
+"""
+import datetime
+import hashlib
+import json
+import math
+import time
+
+import numpy as np
+import pandas as pd
+
+VERSION_API = 1
+
+# Segundos que un cliente puede reutilizar la respuesta sin volver a preguntar
+MAX_AGE_TERMINADO = 86400      # el resultado y los precedentes ya no cambian
+MAX_AGE_PREVIO = 300           # antes del partido solo se mueven las cuotas
+MAX_AGE_EN_JUEGO = 0           # no-cache: el cliente revalida cada vez con el ETag (304 si no ha cambiado)
+MAX_AGE_PARTIDOS = 600         # igual que la caché de la portada
+MAX_AGE_MINIMO = 30
+
+def _a_json(valor):
+    """default= de json.dumps para los tipos de pandas/numpy que aparecen en all_data."""
+    if isinstance(valor, pd.DataFrame):
+        return {"columnas": [str(c) for c in valor.columns], "filas": {str(i): {str(c): v for c, v in fila.items()} for i, fila in valor.to_dict(orient="index").items()}}
+    if isinstance(valor, np.ndarray):
+        return [None if isinstance(x, float) and math.isnan(x) else x for x in valor.tolist()]
+    if isinstance(valor, np.generic):
+        valor = valor.item()
+        return None if isinstance(valor, float) and math.isnan(valor) else valor
+    raise TypeError(f"Tipo no serializable: {type(valor).__name__}")
+
+def serializar(datos):
+    """Cuerpo JSON (bytes) determinista: claves ordenadas y sin espacios."""
+    return json.dumps(datos, default=_a_json, ensure_ascii=False, sort_keys=True, separators=(",", ":")).encode("utf-8")
+
+def etag(cuerpo):
+    return hashlib.blake2b(cuerpo, digest_size=16).hexdigest()
+
+def estudio_terminado(all_data):
+    return all_data.get('final_score_raw', '?-?') != '?-?'
+
+def cuerpo_estudio(all_data):
+    return serializar({"version": VERSION_API, "terminado": estudio_terminado(all_data), "estudio": all_data})
+
+def max_age_estudio(all_data, inicio=None, ahora=None):
+    """Terminado, en juego (ya pasó el comienzo, timestamp `inicio`) o previo, sin pasar del comienzo."""
+    if estudio_terminado(all_data): return MAX_AGE_TERMINADO
+    if inicio is None: return MAX_AGE_PREVIO
+    falta = inicio - (ahora or time.time())
+    if falta <= 0: return MAX_AGE_EN_JUEGO
+    return max(MAX_AGE_MINIMO, int(min(MAX_AGE_PREVIO, falta)))
+
+def cuerpo_partidos(matches, total, siguiente=None):
+    return serializar({"version": VERSION_API, "total": total, "partidos": matches, "siguiente": siguiente})
+
+def max_age_partidos(matches, edad=0):
+    """Lo que le queda a la caché de la portada, sin pasar del próximo comienzo (la lista cambia al empezar)."""
+    restante = MAX_AGE_PARTIDOS - edad
+    ahora = datetime.datetime.utcnow()
+    for m in matches:
+        try: inicio = datetime.datetime.strptime(m.get('time', ''), '%Y-%m-%d %H:%M')
+        except ValueError: continue
+        if inicio > ahora: restante = min(restante, (inicio - ahora).total_seconds())
+    return max(MAX_AGE_MINIMO, int(restante))
+
+def cache_control(max_age):
+    return f"public, max-age={max_age}" if max_age > 0 else "public, no-cache"
@@ -0,0 +1,140 @@
+# modules/backtest.py
+"""
+Backtest de las señales basadas en precedentes (H2H, últimos partidos, comparativas y Regla 3).
+Recalcula cada señal en columnas, la cruza con el resultado final (Fin) y devuelve tasas de
+acierto por bucket de AH, liga y temporada.
+
+Uso:  python -m modules.backtest export_hoja.csv [--por bucket_ah liga temporada]
+"""
+import argparse
+import numpy as np
+import pandas as pd
+
+from modules.evaluador_lineas import (parse_lineas, evaluar_handicap, evaluar_goles, CUBIERTO, NO_CUBIERTO)
+
+# --- DEFINICIÓN DE SEÑALES SOBRE LAS COLUMNAS DEL SCRAPER MASIVO ---
+# Orientación fija (+1: el marcador ya está en la óptica del local principal) o columna de localía.
+SENALES_MASIVO = {
+    "h2h_estadio": ("Res_H2H_V", 1),
+    "h2h_general": ("Res_H2H_G", 0),        # sin nombres en la fila: solo se evalúa la línea de goles
+    "ultimo_local": ("Res_L_H", 1),
+    "ultimo_visitante": ("Res_V_A", 1),     # el rival del visitante jugó en casa: su margen equivale al del local
+    "L_vs_UV_A": ("L_vs_UV_A", "localia"),
+    "V_vs_UL_H": ("V_vs_UL_H", "localia_inversa"),
+    "Regla_3": ("Regla_3", "rl_rv"),        # el rival del local (RL) actúa como referencia
+}
+SENALES_ESTUDIO = {"h2h_stadium": "h2h_estadio", "h2h_general": "h2h_general", "last_home_match": "ultimo_local",
+                   "last_away_match": "ultimo_visitante", "comp_L_vs_UV_A": "L_vs_UV_A", "comp_V_vs_UL_H": "V_vs_UL_H", "h2h_col3": "Regla_3"}
+LIMITE_BUCKET_AH = 2.5
+_RE_COMPARATIVA = r'^\s*(\d+)\s*[*:-]\s*(\d+)\s*(?:/\s*\S+)?\s*(\(RL-RV\)|\(RV-RL\)|H|A)?\s*$'
+
+# --- NORMALIZACIÓN DE ENTRADAS ---
+def _texto_hoja(serie):
+    """Deshace el formato de Google Sheets ("'-0,25" -> "-0.25")."""
+    return serie.astype(str).str.strip().str.lstrip("'").str.replace(',', '.', regex=False)
+
+def _goles(serie):
+    partes = _texto_hoja(serie).str.extract(r'^\s*(\d+)\s*[*:-]\s*(\d+)')
+    return partes[0].astype(float).to_numpy(), partes[1].astype(float).to_numpy()
+
+def _lineas(serie):
+    texto = _texto_hoja(serie)
+    unicos = pd.unique(texto)
+    return texto.map(dict(zip(unicos, parse_lineas(list(unicos))))).to_numpy(dtype=float)
+
+def _temporada(fechas):
+    """Temporada europea (julio-junio) de cada fecha dd-mm-aaaa; "N/A" si no se puede leer."""
+    fechas = pd.to_datetime(pd.Series(fechas).str.extract(r'(\d{2}-\d{2}-\d{4})')[0], format='%d-%m-%Y', errors='coerce')
+    inicio = (fechas.dt.year - (fechas.dt.month < 7)).astype('Int64')
+    return (inicio.astype(str) + "/" + (inicio + 1).astype(str)).where(inicio.notna(), "N/A")
+
+def normalizar_filas_masivo(df):
+    """Columnas de la hoja del Scraper masivo (COLS) -> marco normalizado para el backtest."""
+    n = len(df)
+    base = pd.DataFrame({"match_id": df.get("match_id", pd.Series(range(n))).astype(str).str.lstrip("'").to_numpy(),
+                         "ah_actual": _lineas(df["AH_Act"]), "goles_actual": _lineas(df["G_i"])})
+    base["fin_h"], base["fin_a"] = _goles(df["Fin"])
+    base["liga"] = df["Liga"].astype(str).to_numpy() if "Liga" in df else "N/A"
+    base["temporada"] = _temporada(df["Fecha"]).to_numpy() if "Fecha" in df else "N/A"
+    for senal, (columna, orientacion) in SENALES_MASIVO.items():
+        if columna not in df: continue
+        partes = _texto_hoja(df[columna]).str.extract(_RE_COMPARATIVA)
+        base[f"{senal}_h"], base[f"{senal}_a"] = partes[0].astype(float).to_numpy(), partes[1].astype(float).to_numpy()
+        marca = partes[2].fillna('')
+        if orientacion == "localia": base[f"{senal}_ori"] = np.select([marca == 'H', marca == 'A'], [1, -1], 0)
+        elif orientacion == "localia_inversa": base[f"{senal}_ori"] = np.select([marca == 'H', marca == 'A'], [-1, 1], 0)
+        elif orientacion == "rl_rv": base[f"{senal}_ori"] = np.select([marca == '(RL-RV)', marca == '(RV-RL)'], [1, -1], 0)
+        else: base[f"{senal}_ori"] = orientacion
+    return base
+
+def normalizar_estudios(estudios):
+    """Lista de diccionarios de obtener_datos_completos_partido -> marco normalizado para el backtest."""
+    filas = []
+    for estudio in estudios:
+        if not estudio or "error" in estudio or not (precedentes := estudio.get('precedentes')): continue
+        odds = estudio.get('main_match_odds', {})
+        fila = {"match_id": str(estudio.get('match_id', '')), "ah_actual": odds.get('ah_linea_raw'), "goles_actual": odds.get('goals_linea_raw'),
+                "fin": estudio.get('final_score_raw', '?-?'), "liga": str(estudio.get('league_id') or "N/A"), "temporada": "N/A"}
+        for i, clave in enumerate(precedentes['claves']):
+            senal = SENALES_ESTUDIO[clave]
+            fila[f"{senal}_h"], fila[f"{senal}_a"] = precedentes['goles_h'][i], precedentes['goles_a'][i]
+            fila[f"{senal}_ori"] = int(precedentes['orientacion'][i])
+        filas.append(fila)
+    if not filas: return pd.DataFrame()
+    base = pd.DataFrame(filas)
+    base["ah_actual"], base["goles_actual"] = _lineas(base["ah_actual"]), _lineas(base["goles_actual"])
+    base["fin_h"], base["fin_a"] = _goles(base.pop("fin"))
+    return base
+
+# --- EVALUACIÓN ---
+def _bucket_ah(ah):
+    recortado = np.clip(ah, -LIMITE_BUCKET_AH, LIMITE_BUCKET_AH)
+    etiquetas = np.char.mod('%+.2f', np.nan_to_num(recortado))
+    etiquetas = np.where(np.abs(ah) >= LIMITE_BUCKET_AH, np.where(ah > 0, f"≥+{LIMITE_BUCKET_AH}", f"≤-{LIMITE_BUCKET_AH}"), etiquetas)
+    return np.where(np.isnan(ah), "N/A", etiquetas)
+
+def evaluar_senales(base):
+    """Marco largo con una fila por (partido, señal, mercado) decidible y su acierto."""
+    if base.empty: return pd.DataFrame(columns=["senal", "mercado", "bucket_ah", "liga", "temporada", "acierto"])
+    n = len(base)
+    ah, goles = base["ah_actual"].to_numpy()[:, None], base["goles_actual"].to_numpy()[:, None]
+    real_ah = evaluar_handicap(base["fin_h"], base["fin_a"], np.ones(n), ah)[:, 0]
+    real_goles = evaluar_goles(base["fin_h"], base["fin_a"], goles)[:, 0]
+    bucket = _bucket_ah(base["ah_actual"].to_numpy())
+    bloques = []
+    for senal in dict.fromkeys(list(SENALES_MASIVO) + list(SENALES_ESTUDIO.values())):
+        if f"{senal}_h" not in base: continue
+        gh, ga = base[f"{senal}_h"].to_numpy(dtype=float), base[f"{senal}_a"].to_numpy(dtype=float)
+        for mercado, prediccion, real in (("ah", evaluar_handicap(gh, ga, base[f"{senal}_ori"].to_numpy(dtype=float), ah)[:, 0], real_ah),
+                                          ("goles", evaluar_goles(gh, ga, goles)[:, 0], real_goles)):
+            # Solo cuentan los casos en que la señal y el resultado real son decisivos (sin push ni indeterminado)
+            decidible = np.isin(prediccion, (CUBIERTO, NO_CUBIERTO)) & np.isin(real, (CUBIERTO, NO_CUBIERTO))
+            bloques.append(pd.DataFrame({"senal": senal, "mercado": mercado, "bucket_ah": bucket[decidible],
+                                         "liga": base["liga"].to_numpy()[decidible], "temporada": base["temporada"].to_numpy()[decidible],
+                                         "acierto": prediccion[decidible] == real[decidible]}))
+    return pd.concat(bloques, ignore_index=True)
+
+def tasas_de_acierto(evaluacion, por=("bucket_ah",)):
+    """Agrega la evaluación: n, aciertos y tasa por señal, mercado y las dimensiones pedidas."""
+    claves = ["senal", "mercado", *por]
+    resumen = evaluacion.groupby(claves, sort=True)["acierto"].agg(n="size", aciertos="sum").reset_index()
+    resumen["tasa"] = resumen["aciertos"] / resumen["n"]
+    return resumen
+
+def ejecutar_backtest(df_masivo=None, estudios=None, por=("bucket_ah",)):
+    marcos = [m for m in (normalizar_filas_masivo(df_masivo) if df_masivo is not None else None,
+                          normalizar_estudios(estudios) if estudios else None) if m is not None and not m.empty]
+    if not marcos: return pd.DataFrame(columns=["senal", "mercado", *por, "n", "aciertos", "tasa"])
+    return tasas_de_acierto(evaluar_senales(pd.concat(marcos, ignore_index=True)), por)
+
+def main():
+    parser = argparse.ArgumentParser(description="Backtest de señales de precedentes sobre filas del scraper masivo.")
+    parser.add_argument("csv", help="Exportación CSV de la hoja (columnas COLS de Scraper.py).")
+    parser.add_argument("--por", nargs="+", default=["bucket_ah"], choices=["bucket_ah", "liga", "temporada"])
+    args = parser.parse_args()
+    resultado = ejecutar_backtest(pd.read_csv(args.csv, dtype=str, keep_default_na=False), por=tuple(args.por))
+    with pd.option_context("display.max_rows", None, "display.width", 200):
+        print(resultado.to_string(index=False, formatters={"tasa": "{:.1%}".format}))
+
+if __name__ == "__main__":
+    main()
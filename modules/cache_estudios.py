@@ -0,0 +1,97 @@
+# modules/cache_estudios.py
+"""
+Estudios completos (all_data) guardados en la caché SQLite compartida, para que todos los procesos
+(gunicorn, Streamlit, reinicios) reutilicen el mismo estudio. La caducidad depende del partido:
+
+    terminado                     no caduca (el resultado y los precedentes ya no cambian)
+    en juego (ya ha empezado)     TTL_EN_JUEGO
+    antes del comienzo            1/12 del tiempo que falta, entre TTL_MINIMO y TTL_MAXIMO, sin pasar del comienzo
+    sin hora de comienzo          TTL_SIN_INICIO (lo que hacía @st.cache_data)
+
+Encima hay una copia en memoria de los más usados; precargar() la llena al arrancar con los
+estudios vigentes más recientes del disco.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from modules.api_json import estudio_terminado
+from modules.cache_local import CacheLocal
+
+CACHE_ESTUDIOS = CacheLocal("estudios", binario=True)
+TTL_EN_JUEGO = 120
+TTL_MINIMO = 300
+TTL_MAXIMO = 6 * 3600
+TTL_SIN_INICIO = 3600
+FRACCION_HASTA_INICIO = 1 / 12
+MAX_MEMORIA = int(os.environ.get("MASIVO_MAX_ESTUDIOS_MEMORIA", "200"))
+
+_memoria = OrderedDict()       # match_id -> (all_data, expira)
+_bloqueo = threading.Lock()
+
+def ttl_estudio(all_data, inicio=None, ahora=None):
+    """Segundos de vida del estudio (None = no caduca) según su estado y la hora de comienzo (timestamp)."""
+    if estudio_terminado(all_data): return None
+    if inicio is None: return TTL_SIN_INICIO
+    falta = inicio - (ahora or time.time())
+    if falta <= 0: return TTL_EN_JUEGO
+    ttl = min(TTL_MAXIMO, max(TTL_MINIMO, falta * FRACCION_HASTA_INICIO))
+    # La alineación y las cuotas de cierre llegan al empezar: el estudio previo no debe sobrevivirlo
+    return ttl if ttl < falta else max(TTL_EN_JUEGO, falta)
+
+def _a_memoria(match_id, all_data, expira):
+    with _bloqueo:
+        _memoria[match_id] = (all_data, expira); _memoria.move_to_end(match_id)
+        while len(_memoria) > MAX_MEMORIA: _memoria.popitem(last=False)
+
+def obtener(match_id):
+    """(all_data, expira) vigente de memoria o de disco, o None."""
+    match_id = str(match_id)
+    with _bloqueo:
+        if (guardado := _memoria.get(match_id)) is not None:
+            if guardado[1] is None or guardado[1] > time.time():
+                _memoria.move_to_end(match_id); return guardado
+            del _memoria[match_id]
+    if (guardado := CACHE_ESTUDIOS.obtener_con_caducidad(match_id)) is not None: _a_memoria(match_id, *guardado)
+    return guardado
+
+def guardar(match_id, all_data, inicio=None):
+    """Guarda el estudio (los que tienen error no se guardan) y devuelve su caducidad."""
+    if not all_data or "error" in all_data: return None
+    ttl = ttl_estudio(all_data, inicio)
+    CACHE_ESTUDIOS.guardar(str(match_id), all_data, ttl=ttl)
+    expira = None if ttl is None else time.time() + ttl
+    _a_memoria(str(match_id), all_data, expira)
+    return expira
+
+def obtener_o_calcular(match_id, calcular, inicio=None):
+    """(all_data, expira): el guardado si sigue vigente; si no, calcular(match_id) y se guarda."""
+    if (guardado := obtener(match_id)) is not None: return guardado
+    all_data = calcular(match_id)
+    return all_data, guardar(match_id, all_data, inicio) if "error" not in all_data else time.time()
+
+def iterar_cacheado(match_id, iterar, secciones, inicio=None):
+    """
+    Como iterar(match_id) -> (sección, all_data), pero si el estudio está guardado produce todas las
+    secciones de golpe con él; al llegar a "completo" el estudio nuevo se guarda.
+    """
+    if (guardado := obtener(match_id)) is not None:
+        for seccion in secciones: yield seccion, guardado[0]
+        return
+    for seccion, all_data in iterar(match_id):
+        if seccion == "completo": guardar(match_id, all_data, inicio)
+        yield seccion, all_data
+
+_precargado = False
+
+def precargar(limite=None):
+    """Llena la copia en memoria con los estudios vigentes más recientes del disco (una vez por proceso)."""
+    global _precargado
+    with _bloqueo:
+        if _precargado: return 0
+        _precargado = True
+    recientes = CACHE_ESTUDIOS.recientes(limite or MAX_MEMORIA)
+    # Del más antiguo al más reciente, para que el orden LRU quede como en disco
+    for match_id, all_data, expira in reversed(recientes): _a_memoria(match_id, all_data, expira)
+    return len(recientes)
@@ -0,0 +1,132 @@
+# modules/cache_local.py
+"""
+Caché clave -> valor persistente en SQLite, compartida entre hilos, procesos y reinicios.
+Cada CacheLocal es una tabla del mismo fichero; los valores se guardan como JSON (o con pickle si
+binario=True, para DataFrames y arrays) con una caducidad opcional (None = no caduca nunca). CacheLRU es la versión en memoria, acotada,
+para valores que no merece la pena persistir (fragmentos HTML ya renderizados).
+
+La ruta se configura con MASIVO_CACHE_DB (por defecto <MASIVO_DATA_DIR>/cache.sqlite).
+"""
+import json
+import os
+import pickle
+from collections import OrderedDict
+import re
+import sqlite3
+import threading
+import time
+
+DIRECTORIO_DATOS = os.environ.get("MASIVO_DATA_DIR", "datos")
+RUTA_CACHE = os.environ.get("MASIVO_CACHE_DB", os.path.join(DIRECTORIO_DATOS, "cache.sqlite"))
+
+_local = threading.local()
+
+def conexion_sqlite(ruta, esquema=""):
+    """Una conexión por hilo y ruta, en modo WAL para que varios procesos lean mientras otro escribe."""
+    conexiones, preparadas = _local.__dict__.setdefault("conexiones", {}), _local.__dict__.setdefault("preparadas", set())
+    if ruta not in conexiones:
+        if os.path.dirname(ruta): os.makedirs(os.path.dirname(ruta), exist_ok=True)
+        con = sqlite3.connect(ruta, timeout=30)
+        con.row_factory = sqlite3.Row
+        con.execute("PRAGMA journal_mode=WAL"); con.execute("PRAGMA synchronous=NORMAL")
+        conexiones[ruta] = con
+    if esquema and (ruta, esquema) not in preparadas:
+        conexiones[ruta].executescript(esquema); preparadas.add((ruta, esquema))
+    return conexiones[ruta]
+
+class CacheLocal:
+    def __init__(self, nombre, ruta=None, binario=False):
+        if not re.fullmatch(r"\w+", nombre): raise ValueError(f"Nombre de caché no válido: {nombre!r}")
+        self.nombre, self.ruta, self.binario = nombre, ruta or RUTA_CACHE, binario
+        self._esquema = f"CREATE TABLE IF NOT EXISTS {nombre} (clave TEXT PRIMARY KEY, valor TEXT NOT NULL, expira REAL)"
+
+    def _con(self):
+        return conexion_sqlite(self.ruta, self._esquema)
+
+    def _codificar(self, valor):
+        return pickle.dumps(valor, protocol=pickle.HIGHEST_PROTOCOL) if self.binario else json.dumps(valor, ensure_ascii=False)
+
+    def _decodificar(self, valor, por_defecto=None):
+        # Un valor ilegible (p. ej. pickle de una versión anterior del código) cuenta como ausente
+        try: return pickle.loads(valor) if self.binario else json.loads(valor)
+        except (pickle.UnpicklingError, ValueError, EOFError, AttributeError, ImportError, TypeError): return por_defecto
+
+    def obtener(self, clave, por_defecto=None):
+        """Valor guardado o por_defecto si no existe, ha caducado o la caché no está disponible."""
+        try:
+            fila = self._con().execute(f"SELECT valor, expira FROM {self.nombre} WHERE clave = ?", (str(clave),)).fetchone()
+        except sqlite3.Error: return por_defecto
+        if fila is None or (fila["expira"] is not None and fila["expira"] < time.time()): return por_defecto
+        return self._decodificar(fila["valor"], por_defecto)
+
+    def obtener_con_caducidad(self, clave):
+        """(valor, expira) o None; expira es un timestamp o None si no caduca."""
+        try:
+            fila = self._con().execute(f"SELECT valor, expira FROM {self.nombre} WHERE clave = ?", (str(clave),)).fetchone()
+        except sqlite3.Error: return None
+        if fila is None or (fila["expira"] is not None and fila["expira"] < time.time()): return None
+        return None if (valor := self._decodificar(fila["valor"])) is None else (valor, fila["expira"])
+
+    def recientes(self, limite):
+        """[(clave, valor, expira)] vigentes, de la última guardada hacia atrás (INSERT OR REPLACE renueva el rowid)."""
+        try:
+            filas = self._con().execute(f"SELECT clave, valor, expira FROM {self.nombre} WHERE expira IS NULL OR expira >= ? ORDER BY rowid DESC LIMIT ?", (time.time(), limite)).fetchall()
+        except sqlite3.Error: return []
+        return [(f["clave"], valor, f["expira"]) for f in filas if (valor := self._decodificar(f["valor"])) is not None]
+
+    def guardar(self, clave, valor, ttl=None):
+        try:
+            with self._con() as con:
+                con.execute(f"INSERT OR REPLACE INTO {self.nombre} (clave, valor, expira) VALUES (?, ?, ?)",
+                            (str(clave), self._codificar(valor), None if ttl is None else time.time() + ttl))
+        except sqlite3.Error: pass
+
+    def guardar_varios(self, valores, ttl=None):
+        """Como guardar() para cada clave -> valor de `valores`, en una sola transacción."""
+        expira = None if ttl is None else time.time() + ttl
+        try:
+            with self._con() as con:
+                con.executemany(f"INSERT OR REPLACE INTO {self.nombre} (clave, valor, expira) VALUES (?, ?, ?)",
+                                [(str(clave), self._codificar(valor), expira) for clave, valor in valores.items()])
+        except sqlite3.Error: pass
+
+    def borrar(self, clave):
+        try:
+            with self._con() as con: con.execute(f"DELETE FROM {self.nombre} WHERE clave = ?", (str(clave),))
+        except sqlite3.Error: pass
+
+    def purgar_caducados(self):
+        try:
+            with self._con() as con: return con.execute(f"DELETE FROM {self.nombre} WHERE expira IS NOT NULL AND expira < ?", (time.time(),)).rowcount
+        except sqlite3.Error: return 0
+
+class CacheLRU:
+    """Caché en memoria de como mucho `maximo` entradas; al llenarse se expulsa la menos usada."""
+    def __init__(self, maximo):
+        self.maximo, self._datos, self._bloqueo = maximo, OrderedDict(), threading.Lock()
+        self.aciertos = self.fallos = 0
+
+    def obtener_o_crear(self, clave, crear):
+        with self._bloqueo:
+            if clave in self._datos:
+                self._datos.move_to_end(clave); self.aciertos += 1
+                return self._datos[clave]
+            self.fallos += 1
+        # Se crea fuera del bloqueo: dos hilos pueden generar el mismo valor, pero nunca se esperan entre sí
+        valor = crear()
+        self.guardar(clave, valor)
+        return valor
+
+    def obtener(self, clave):
+        with self._bloqueo:
+            if clave not in self._datos: self.fallos += 1; return None
+            self._datos.move_to_end(clave); self.aciertos += 1
+            return self._datos[clave]
+
+    def guardar(self, clave, valor):
+        with self._bloqueo:
+            self._datos[clave] = valor; self._datos.move_to_end(clave)
+            while len(self._datos) > self.maximo: self._datos.popitem(last=False)
+
+    def __len__(self):
+        return len(self._datos)
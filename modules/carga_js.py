@@ -0,0 +1,181 @@
+# modules/carga_js.py
+"""
+Datos de la página h2h leídos de los scripts que la acompañan en vez del DOM renderizado.
+La página trae en sus <script> los datos con los que el navegador pinta las tablas
+(`var _matchInfo = {...}`, `var v_data = [[...], ...]`...). Leer unos pocos literales JS del HTML
+crudo es mucho más barato que recorrer las filas de table_v1..3 en un árbol BeautifulSoup.
+
+Las variables y la posición de cada campo están declaradas abajo (VARIABLES_HISTORIAL, CAMPOS_FILA):
+si la página cambia, se ajustan ahí. Cada fila se valida (fecha, goles, IDs numéricos y que el
+equipo de _matchInfo que corresponde a la tabla esté en la fila) y, si falta una variable o una fila
+no encaja, las funciones devuelven None y el llamante vuelve al parseo del DOM.
+tests/test_carga_js.py compara la salida con la del DOM en las páginas de tests/paginas/.
+"""
+import re
+
+from modules.lineas_ah import parse_ah
+
+VARIABLES_HISTORIAL = {"table_v1": "h_data", "table_v2": "a_data", "table_v3": "v_data"}
+# Posición de cada campo dentro de las filas de h_data / a_data / v_data
+CAMPOS_FILA = {"fecha": 0, "league_id": 1, "home_id": 4, "home": 5, "away_id": 6, "away": 7,
+               "goles_local": 8, "goles_visitante": 9, "ah_raw": 11, "match_id": 15, "vs": 16}
+# Equipos de _matchInfo (posición en info_partido) que juegan todas las filas de cada tabla:
+# h_data es el historial del local, a_data el del visitante y v_data sus enfrentamientos
+EQUIPOS_TABLA = {"table_v1": (0,), "table_v2": (1,), "table_v3": (0, 1)}
+VARIABLE_CUOTAS = "earlyOdds"   # [[id_casa, ..., ah_inicial, ..., goles_inicial], ...]
+CASAS_CUOTAS = ("8", "31")      # Bet365 y su alternativa, como tr_o_1_8 / tr_o_1_31 en el DOM
+CAMPOS_CUOTAS = {"casa": 0, "ah_raw": 3, "goles_raw": 9}
+
+_RE_ETIQUETA = re.compile(r"<[^>]+>")
+_RE_NUMERO = re.compile(r"-?(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?")
+_RE_IDENTIFICADOR = re.compile(r"[A-Za-z_$][\w$]*")
+_ESCAPES = {"n": "\n", "t": "\t", "r": "\r", "b": "\b", "f": "\f", "v": "\v", "0": "\0"}
+_CONSTANTES = {"true": True, "false": False, "null": None, "undefined": None}
+
+class ErrorJS(ValueError):
+    pass
+
+# --- DECODIFICADOR DE LITERALES JS ---
+def _saltar(texto, i):
+    """Salta espacios y comentarios // y /* */."""
+    while i < len(texto):
+        if texto[i].isspace(): i += 1
+        elif texto.startswith("//", i): i = (texto.find("\n", i) + 1) or len(texto)
+        elif texto.startswith("/*", i):
+            if (fin := texto.find("*/", i + 2)) < 0: raise ErrorJS("comentario sin cerrar")
+            i = fin + 2
+        else: break
+    return i
+
+def _cadena(texto, i):
+    comilla, partes, i = texto[i], [], i + 1
+    while i < len(texto):
+        c = texto[i]
+        if c == comilla: return "".join(partes), i + 1
+        if c == "\\":
+            siguiente = texto[i + 1:i + 2]
+            if siguiente == "u": partes.append(chr(int(texto[i + 2:i + 6], 16))); i += 6; continue
+            if siguiente == "x": partes.append(chr(int(texto[i + 2:i + 4], 16))); i += 4; continue
+            if siguiente == "\n": i += 2; continue
+            partes.append(_ESCAPES.get(siguiente, siguiente)); i += 2; continue
+        partes.append(c); i += 1
+    raise ErrorJS("cadena sin cerrar")
+
+def _secuencia(texto, i, cierre, elemento):
+    """Elementos separados por comas hasta `cierre`; admite coma final y huecos ([1,,2] -> [1, None, 2])."""
+    valores, i = [], _saltar(texto, i + 1)
+    while True:
+        if i >= len(texto): raise ErrorJS(f"falta '{cierre}'")
+        if texto[i] == cierre: return valores, i + 1
+        if texto[i] == ",": valores.append(None); i = _saltar(texto, i + 1); continue
+        valor, i = elemento(texto, i)
+        valores.append(valor)
+        i = _saltar(texto, i)
+        if i < len(texto) and texto[i] == ",": i = _saltar(texto, i + 1)
+        elif i < len(texto) and texto[i] != cierre: raise ErrorJS(f"se esperaba ',' o '{cierre}' en {i}")
+
+def _par(texto, i):
+    if texto[i] in "'\"": clave, i = _cadena(texto, i)
+    elif m := (_RE_IDENTIFICADOR.match(texto, i) or _RE_NUMERO.match(texto, i)): clave, i = m.group(), m.end()
+    else: raise ErrorJS(f"clave no válida en {i}")
+    i = _saltar(texto, i)
+    if texto[i:i + 1] != ":": raise ErrorJS(f"se esperaba ':' en {i}")
+    valor, i = decodificar(texto, _saltar(texto, i + 1))
+    return (clave, valor), i
+
+def decodificar(texto, i=0):
+    """
+    Decodifica el literal JS que empieza en `i` y devuelve (valor, posición final).
+    Admite arrays, objetos con claves sin comillas, cadenas con ' o ", números, true/false/null/undefined,
+    new Array(...) y llamadas simples como parseInt('12'), que valen lo que su primer argumento.
+    """
+    i = _saltar(texto, i)
+    if i >= len(texto): raise ErrorJS("texto vacío")
+    c = texto[i]
+    if c == "[": return _secuencia(texto, i, "]", decodificar)
+    if c == "{":
+        pares, i = _secuencia(texto, i, "}", _par)
+        return dict(p for p in pares if p is not None), i
+    if c in "'\"": return _cadena(texto, i)
+    if m := _RE_NUMERO.match(texto, i):
+        numero = m.group()
+        return (float(numero) if any(x in numero for x in ".eE") else int(numero)), m.end()
+    if m := _RE_IDENTIFICADOR.match(texto, i):
+        nombre, i = m.group(), m.end()
+        if nombre in _CONSTANTES: return _CONSTANTES[nombre], i
+        if nombre == "new": return decodificar(texto, i)
+        if texto[_saltar(texto, i):_saltar(texto, i) + 1] == "(":
+            argumentos, i = _secuencia(texto, _saltar(texto, i), ")", decodificar)
+            if nombre == "Array": return argumentos, i
+            return (argumentos[0] if argumentos else None), i
+        raise ErrorJS(f"identificador no literal '{nombre}' en {m.start()}")
+    raise ErrorJS(f"carácter inesperado {c!r} en {i}")
+
+def variable(html, nombre):
+    """Valor de `var nombre = <literal>` (también let/const/window.nombre) en el HTML; None si no está o no se puede leer."""
+    if not (m := re.search(rf"(?:\b(?:var|let|const)\s+|\bwindow\.){re.escape(nombre)}\s*=\s*", html)): return None
+    try: return decodificar(html, m.end())[0]
+    except (ErrorJS, ValueError, IndexError): return None
+
+# --- REGISTROS ---
+def _texto(valor):
+    return _RE_ETIQUETA.sub("", str(valor)).strip() if valor is not None else ""
+
+def _id(valor):
+    return texto if (texto := _texto(valor)).isdigit() else None
+
+def _fecha_ddmmyyyy(valor):
+    """Fecha en el formato del DOM (dd-mm-yyyy) desde yyyy-mm-dd, yy-mm-dd o dd-mm-yyyy."""
+    texto = _texto(valor).replace("/", "-")
+    if m := re.match(r"(\d{4})-(\d{1,2})-(\d{1,2})", texto): return f"{int(m[3]):02d}-{int(m[2]):02d}-{m[1]}"
+    if m := re.match(r"(\d{1,2})-(\d{1,2})-(\d{4})", texto): return f"{int(m[1]):02d}-{int(m[2]):02d}-{m[3]}"
+    if m := re.match(r"(\d{2})-(\d{1,2})-(\d{1,2})$", texto): return f"{int(m[3]):02d}-{int(m[2]):02d}-20{m[1]}"
+    return None
+
+def info_partido(html):
+    """(home_id, away_id, league_id, home_name, away_name, league_name) de _matchInfo, o None."""
+    if not isinstance(info := variable(html, "_matchInfo"), dict): return None
+    return _id(info.get("hId")), _id(info.get("gId")), _id(info.get("sclassId")), _texto(info.get("hName")) or None, _texto(info.get("gName")) or None, _texto(info.get("lName")) or None
+
+def _fila(valores):
+    """Registro neutro de una fila de h_data/a_data/v_data, o None si no encaja con CAMPOS_FILA."""
+    if not isinstance(valores, list) or len(valores) <= max(CAMPOS_FILA.values()): return None
+    campo = {k: valores[i] for k, i in CAMPOS_FILA.items()}
+    goles = [_texto(campo["goles_local"]), _texto(campo["goles_visitante"])]
+    if not (fecha := _fecha_ddmmyyyy(campo["fecha"])) or not all(g.isdigit() or g == "" for g in goles): return None
+    if not (_id(campo["home_id"]) and _id(campo["away_id"]) and _id(campo["match_id"])): return None
+    return {"fecha": fecha, "league_id": _id(campo["league_id"]), "home_id": _id(campo["home_id"]), "away_id": _id(campo["away_id"]),
+            "home": _texto(campo["home"]), "away": _texto(campo["away"]),
+            "score_raw": f"{goles[0]}-{goles[1]}" if all(goles) else "?-?", "ah_raw": _texto(campo["ah_raw"]),
+            "match_id": _id(campo["match_id"]), "vs": _texto(campo["vs"]) == "1"}
+
+def _de_la_tabla(registro, equipos):
+    return all(team_id in (registro["home_id"], registro["away_id"]) for team_id in equipos)
+
+def historial(html):
+    """{table_id: [registro neutro, ...]} de las tres tablas de historial, o None si alguna no se puede leer entera."""
+    if not (info := info_partido(html)) or not (info[0] and info[1]): return None
+    tablas = {}
+    for table_id, nombre in VARIABLES_HISTORIAL.items():
+        if not isinstance(filas := variable(html, nombre), list): return None
+        registros = [_fila(f) for f in filas]
+        if any(r is None for r in registros): return None
+        # Un ID que no cuadra con _matchInfo indica posiciones desplazadas aunque la fila parezca válida
+        if not all(_de_la_tabla(r, [info[i] for i in EQUIPOS_TABLA[table_id]]) for r in registros): return None
+        tablas[table_id] = registros
+    return tablas
+
+def _linea(texto, positiva=False):
+    """Vacía o una línea que se entiende (positiva si es de goles)."""
+    return not texto or ((valor := parse_ah(texto)) is not None and (valor > 0 or not positiva))
+
+def cuotas_iniciales(html):
+    """(ah_raw, goles_raw) iniciales de Bet365 (o su alternativa), o None si no están en los scripts."""
+    if not isinstance(filas := variable(html, VARIABLE_CUOTAS), list): return None
+    por_casa = {_texto(f[CAMPOS_CUOTAS["casa"]]): f for f in filas if isinstance(f, list) and len(f) > max(CAMPOS_CUOTAS.values())}
+    for casa in CASAS_CUOTAS:
+        if (fila := por_casa.get(casa)) is not None:
+            ah, goles = _texto(fila[CAMPOS_CUOTAS["ah_raw"]]), _texto(fila[CAMPOS_CUOTAS["goles_raw"]])
+            # Una línea que no se entiende indica que la estructura ha cambiado: mejor el DOM
+            return (ah, goles) if _linea(ah) and _linea(goles, positiva=True) else None
+    return None
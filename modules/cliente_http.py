@@ -0,0 +1,85 @@
+# modules/cliente_http.py
+"""
+Cliente HTTP asíncrono (httpx) único por proceso para todas las descargas que no usan navegador.
+Un solo pool de conexiones keep-alive (HTTP/2 si está instalado `h2` y el host lo admite), un
+límite de peticiones simultáneas por host y reintentos ante 5xx, igual que el Retry de las
+antiguas requests.Session. El bucle de eventos vive en un hilo propio, así que también se puede
+llamar desde código síncrono (Streamlit, hilos del scraper masivo).
+"""
+import asyncio
+import threading
+from collections import defaultdict
+from urllib.parse import urlsplit
+
+import httpx
+
+from modules import limitador
+
+try:
+    import h2  # noqa: F401  (habilita HTTP/2 en httpx)
+    HTTP2_DISPONIBLE = True
+except ImportError:
+    HTTP2_DISPONIBLE = False
+
+USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 Chrome/116.0.0.0 Safari/537.36"
+MAX_CONEXIONES = 20
+MAX_KEEPALIVE = 10
+LIMITE_POR_HOST = 4
+TIMEOUT_SEGUNDOS = 10
+REINTENTOS = 3
+BACKOFF_SEGUNDOS = 0.5
+ESTADOS_REINTENTABLES = {429, 500, 502, 503, 504}
+
+_bloqueo = threading.Lock()
+_bucle = None
+_cliente = None
+_semaforos = defaultdict(lambda: asyncio.Semaphore(LIMITE_POR_HOST))
+
+def _iniciar():
+    """Arranca (una vez por proceso) el hilo con el bucle de eventos y el AsyncClient compartido."""
+    global _bucle, _cliente
+    with _bloqueo:
+        if _bucle is None:
+            bucle = asyncio.new_event_loop()
+            threading.Thread(target=bucle.run_forever, name="cliente-http", daemon=True).start()
+            # El transporte reintenta los fallos de conexión; los 5xx se reintentan en obtener_async
+            transporte = httpx.AsyncHTTPTransport(http2=HTTP2_DISPONIBLE, retries=REINTENTOS,
+                                                  limits=httpx.Limits(max_connections=MAX_CONEXIONES, max_keepalive_connections=MAX_KEEPALIVE))
+            async def crear():
+                return httpx.AsyncClient(transport=transporte, timeout=TIMEOUT_SEGUNDOS, follow_redirects=True, headers={"User-Agent": USER_AGENT})
+            _cliente = asyncio.run_coroutine_threadsafe(crear(), bucle).result()
+            _bucle = bucle
+    return _bucle
+
+def _retry_after(respuesta):
+    try: return float(respuesta.headers.get("Retry-After"))
+    except (TypeError, ValueError): return None
+
+async def obtener_async(url, **kwargs):
+    """GET con el cliente compartido; lanza httpx.HTTPError si falla tras los reintentos o el estado es de error."""
+    host = urlsplit(url).netloc
+    for intento in range(REINTENTOS + 1):
+        # El limitador por host es común a todos los procesos (scraper masivo, app, estudio.py)
+        await limitador.esperar_async(url)
+        async with _semaforos[host]:
+            try: respuesta = await _cliente.get(url, **kwargs)
+            except httpx.TransportError: await limitador.registrar_async(url, False); raise
+        await limitador.registrar_async(url, respuesta.status_code < 500 and respuesta.status_code != 429, respuesta.status_code, _retry_after(respuesta))
+        if respuesta.status_code not in ESTADOS_REINTENTABLES or intento == REINTENTOS: break
+        await asyncio.sleep(BACKOFF_SEGUNDOS * 2 ** intento)
+    respuesta.raise_for_status()
+    return respuesta
+
+def ejecutar(corrutina):
+    """Ejecuta una corrutina en el bucle del cliente y espera su resultado desde código síncrono."""
+    return asyncio.run_coroutine_threadsafe(corrutina, _iniciar()).result()
+
+def obtener(url, **kwargs):
+    return ejecutar(obtener_async(url, **kwargs))
+
+async def _en_paralelo(funcion, argumentos):
+    return await asyncio.gather(*(funcion(a) for a in argumentos), return_exceptions=True)
+
+def mapear(funcion_async, argumentos):
+    """Aplica una función asíncrona a cada argumento de forma concurrente; las excepciones se devuelven en su posición."""
+    return ejecutar(_en_paralelo(funcion_async, list(argumentos)))
@@ -0,0 +1,144 @@
+# modules/cola_trabajo.py
+"""
+Cola de trabajo duradera en un directorio de ficheros, para repartir la extracción masiva entre
+varios procesos o máquinas que comparten sistema de ficheros (no necesita servidor ni SQLite,
+que no es fiable sobre NFS/SMB). Cada trozo de trabajo es un JSON que pasa de carpeta en carpeta:
+
+    pendientes/  -> en_curso/ (+ .lease con el dueño y la caducidad) -> hechos/  | fallidos/
+    resultados/  filas y contadores de cada trozo terminado, hasta que el coordinador los recoge
+
+Reclamar un trozo es un os.rename de pendientes/ a en_curso/: si dos procesos lo intentan a la
+vez, solo uno lo consigue. Mientras trabaja, el dueño renueva el lease; si deja de hacerlo
+(proceso muerto, máquina caída), cualquiera devuelve el trozo a pendientes/ al ver el lease caducado.
+
+Configuración: MASIVO_COLA_DIR (por defecto <MASIVO_DATA_DIR>/cola_masiva).
+"""
+import json
+import os
+import socket
+import threading
+import time
+
+from modules.cache_local import DIRECTORIO_DATOS
+
+DIRECTORIO_COLA = os.environ.get("MASIVO_COLA_DIR", os.path.join(DIRECTORIO_DATOS, "cola_masiva"))
+DURACION_LEASE = 300           # segundos sin renovar tras los que un trozo se reasigna
+MAX_INTENTOS = 3
+CARPETAS = ("pendientes", "en_curso", "hechos", "fallidos", "resultados")
+
+def identificador_trabajador():
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+def _ruta(carpeta, nombre=""):
+    return os.path.join(DIRECTORIO_COLA, carpeta, nombre)
+
+def _escribir_json(ruta, datos):
+    """Escritura atómica: fichero temporal + os.replace, así nadie lee un JSON a medias."""
+    temporal = f"{ruta}.{identificador_trabajador()}.tmp"
+    with open(temporal, "w", encoding="utf-8") as f: json.dump(datos, f, ensure_ascii=False)
+    os.replace(temporal, ruta)
+
+def _leer_json(ruta):
+    try:
+        with open(ruta, encoding="utf-8") as f: return json.load(f)
+    except (OSError, ValueError): return None
+
+def _trozos(carpeta):
+    try: return sorted(n for n in os.listdir(_ruta(carpeta)) if n.endswith(".json"))
+    except FileNotFoundError: return []
+
+def preparar():
+    for carpeta in CARPETAS: os.makedirs(_ruta(carpeta), exist_ok=True)
+
+# --- COORDINADOR ---
+def encolar(trozos):
+    """Añade trozos {"id", ...}; los que ya están en cualquier carpeta se ignoran (volver a coordinar es seguro)."""
+    preparar()
+    existentes = {n for c in ("pendientes", "en_curso", "hechos", "fallidos") for n in _trozos(c)}
+    nuevos = 0
+    for trozo in trozos:
+        if (nombre := f"{trozo['id']}.json") in existentes: continue
+        _escribir_json(_ruta("pendientes", nombre), {**trozo, "intentos": 0}); nuevos += 1
+    return nuevos
+
+def reasignar_caducados(ahora=None):
+    """Devuelve a pendientes/ los trozos cuyo lease ha caducado (o a fallidos/ si agotaron los intentos)."""
+    ahora, reasignados = ahora or time.time(), 0
+    for nombre in _trozos("en_curso"):
+        lease = _leer_json(_ruta("en_curso", nombre[:-5] + ".lease"))
+        # Sin lease (recién reclamado o dueño caído antes de escribirlo) cuenta el momento del rename (ctime)
+        try: expira = lease["expira"] if lease else os.path.getctime(_ruta("en_curso", nombre)) + DURACION_LEASE
+        except OSError: continue
+        if expira > ahora: continue
+        trozo = _leer_json(_ruta("en_curso", nombre)) or {}
+        destino = "fallidos" if trozo.get("intentos", 0) >= MAX_INTENTOS else "pendientes"
+        try: os.rename(_ruta("en_curso", nombre), _ruta(destino, nombre))
+        except OSError: continue   # otro proceso lo ha reasignado o el dueño lo ha terminado
+        try: os.remove(_ruta("en_curso", nombre[:-5] + ".lease"))
+        except OSError: pass
+        reasignados += 1
+    return reasignados
+
+def recoger_resultados():
+    """Resultados nuevos [(id, datos)]; cada uno se entrega una sola vez (se mueven a resultados/recogidos)."""
+    os.makedirs(_ruta("resultados", "recogidos"), exist_ok=True)
+    entregados = []
+    for nombre in _trozos("resultados"):
+        # Un trozo reasignado puede terminarse dos veces: el segundo resultado se descarta
+        if os.path.exists(_ruta(os.path.join("resultados", "recogidos"), nombre)):
+            try: os.remove(_ruta("resultados", nombre))
+            except OSError: pass
+            continue
+        try: os.rename(_ruta("resultados", nombre), _ruta(os.path.join("resultados", "recogidos"), nombre))
+        except OSError: continue
+        if (datos := _leer_json(_ruta(os.path.join("resultados", "recogidos"), nombre))) is not None: entregados.append((nombre[:-5], datos))
+    return entregados
+
+def estado():
+    return {c: len(_trozos(c)) for c in CARPETAS}
+
+def terminado():
+    e = estado()
+    return e["pendientes"] == 0 and e["en_curso"] == 0
+
+# --- TRABAJADOR ---
+def reclamar(trabajador=None):
+    """Primer trozo pendiente que este proceso consiga mover a en_curso/, con su lease; None si no queda ninguno."""
+    trabajador = trabajador or identificador_trabajador()
+    for nombre in _trozos("pendientes"):
+        try: os.rename(_ruta("pendientes", nombre), _ruta("en_curso", nombre))
+        except OSError: continue
+        renovar(nombre[:-5], trabajador)
+        if (trozo := _leer_json(_ruta("en_curso", nombre))) is None: continue
+        trozo["intentos"] = trozo.get("intentos", 0) + 1
+        _escribir_json(_ruta("en_curso", nombre), trozo)
+        return trozo
+    return None
+
+def renovar(id_trozo, trabajador=None):
+    _escribir_json(_ruta("en_curso", f"{id_trozo}.lease"), {"trabajador": trabajador or identificador_trabajador(), "expira": time.time() + DURACION_LEASE})
+
+def completar(id_trozo, resultado):
+    """Publica el resultado y mueve el trozo a hechos/ (si ya se había reasignado, el resultado vale igual)."""
+    _escribir_json(_ruta("resultados", f"{id_trozo}.json"), resultado)
+    try: os.replace(_ruta("en_curso", f"{id_trozo}.json"), _ruta("hechos", f"{id_trozo}.json"))
+    except OSError: pass
+    try: os.remove(_ruta("en_curso", f"{id_trozo}.lease"))
+    except OSError: pass
+
+class Latido:
+    """Renueva el lease de un trozo en segundo plano mientras dura el bloque with."""
+    def __init__(self, id_trozo, trabajador=None):
+        self.id_trozo, self.trabajador, self._parar = id_trozo, trabajador, threading.Event()
+
+    def _bucle(self):
+        while not self._parar.wait(DURACION_LEASE / 3):
+            try: renovar(self.id_trozo, self.trabajador)
+            except OSError: pass
+
+    def __enter__(self):
+        threading.Thread(target=self._bucle, name=f"lease-{self.id_trozo}", daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self._parar.set()
@@ -0,0 +1,85 @@
+# modules/cribado.py
+"""
+Cribado de la jornada: una fila compacta por partido de la portada para decidir qué estudios abrir.
+
+    líneas        AH y goles actuales (portada) e iniciales de Bet365
+    coberturas    H2H en el estadio y último partido de cada equipo contra la línea actual
+                  (evaluador_lineas, la misma semántica que el estudio)
+    O/U           % de Over de los últimos partidos de local y visitante
+
+Los datos salen, por este orden, del estudio completo guardado (cache_estudios), del subconjunto
+guardado de un cribado anterior (caché "cribado", misma caducidad que los estudios) o de
+estudio_scraper.datos_cribado con como mucho MAX_NAVEGADORES navegadores a la vez. cribar()
+produce las filas según terminan, las guardadas primero.
+"""
+import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from modules import cache_estudios
+from modules.cache_local import CacheLocal
+from modules.evaluador_lineas import CUBIERTO, ETIQUETAS_AH, evaluar_handicap, precedentes_desde_estudio
+from modules.lineas_ah import format_ah, parse_ah
+from modules.partidos_proximos import inicio_partido
+
+MAX_NAVEGADORES = int(os.environ.get("MASIVO_NAVEGADORES_CRIBADO", "4"))
+CACHE_CRIBADO = CacheLocal("cribado")
+# Precedentes de la fila: clave de all_data -> columna
+PRECEDENTES_CRIBADO = {"h2h_stadium": "h2h_estadio", "last_home_match": "ultimo_local", "last_away_match": "ultimo_visitante"}
+CLAVES_CRIBADO = ("match_id", "home_name", "away_name", "league_id", "final_score_raw", "main_match_odds", "home_ou_stats", "away_ou_stats", *PRECEDENTES_CRIBADO)
+
+def _subconjunto(all_data):
+    return {k: all_data.get(k) for k in CLAVES_CRIBADO}
+
+def fila_cribado(partido, all_data, origen):
+    """Fila del cribado para un partido de la portada y su all_data (completo o de datos_cribado)."""
+    odds = all_data.get("main_match_odds") or {}
+    fila = {"match_id": str(partido.get("id")), "hora": partido.get("time"), "liga": partido.get("league"),
+            "local": all_data.get("home_name") or partido.get("home_team"), "visitante": all_data.get("away_name") or partido.get("away_team"),
+            "ah": partido.get("handicap"), "goles": partido.get("goal_line"),
+            "ah_inicial": format_ah(odds.get("ah_linea_raw")), "goles_inicial": format_ah(odds.get("goals_linea_raw")), "origen": origen}
+    # Línea actual de la portada; sin ella, la inicial
+    linea = parse_ah(partido.get("handicap"))
+    if linea is None: linea = parse_ah(odds.get("ah_linea_raw"))
+    precedentes = precedentes_desde_estudio(all_data, fila["local"], fila["visitante"])
+    resultados = dict(zip(precedentes["claves"], evaluar_handicap(precedentes["goles_h"], precedentes["goles_a"], precedentes["orientacion"], [linea])[:, 0])) if linea is not None else {}
+    fila.update({columna: ETIQUETAS_AH[resultados[clave]] if clave in resultados else None for clave, columna in PRECEDENTES_CRIBADO.items()})
+    fila["cubiertos"] = sum(1 for clave in PRECEDENTES_CRIBADO if resultados.get(clave) == CUBIERTO)
+    fila["over_local"], fila["over_visitante"] = ((all_data.get(k) or {}).get("over_pct") for k in ("home_ou_stats", "away_ou_stats"))
+    return fila
+
+def _guardado(match_id):
+    """(all_data, origen) de un estudio completo o de un cribado anterior vigentes, o None."""
+    if (estudio := cache_estudios.obtener(match_id)) is not None: return estudio[0], "estudio"
+    if (subconjunto := CACHE_CRIBADO.obtener(match_id)) is not None: return subconjunto, "cribado"
+    return None
+
+def _calcular(match_id):
+    # Import diferido: estudio_scraper arrastra Selenium y no hace falta si todo está guardado
+    from modules.estudio_scraper import datos_cribado
+    all_data = datos_cribado(match_id)
+    if "error" not in all_data:
+        subconjunto = _subconjunto(all_data)
+        CACHE_CRIBADO.guardar(match_id, subconjunto, ttl=cache_estudios.ttl_estudio(subconjunto, inicio_partido(match_id)))
+    return all_data
+
+def _fila_error(partido, mensaje):
+    return {"match_id": str(partido.get("id")), "hora": partido.get("time"), "liga": partido.get("league"), "local": partido.get("home_team"),
+            "visitante": partido.get("away_team"), "ah": partido.get("handicap"), "goles": partido.get("goal_line"), "origen": "error", "error": mensaje}
+
+def cribar(partidos, maximo=None):
+    """Genera una fila por partido según van terminando; al cerrar el generador se cancelan los pendientes."""
+    pendientes = []
+    for partido in partidos:
+        if (guardado := _guardado(str(partido.get("id")))) is not None: yield fila_cribado(partido, *guardado)
+        else: pendientes.append(partido)
+    if not pendientes: return
+    executor = ThreadPoolExecutor(max_workers=maximo or MAX_NAVEGADORES, thread_name_prefix="cribado")
+    try:
+        futuros = {executor.submit(_calcular, str(p.get("id"))): p for p in pendientes}
+        for futuro in as_completed(futuros):
+            partido = futuros[futuro]
+            try: all_data = futuro.result()
+            except Exception as e: all_data = {"error": f"{type(e).__name__}: {e}"}
+            yield _fila_error(partido, all_data["error"]) if "error" in all_data else fila_cribado(partido, all_data, "nuevo")
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
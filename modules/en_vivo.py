@@ -0,0 +1,149 @@
+# modules/en_vivo.py
+"""
+Seguimiento en directo de partidos en juego. Un único hilo sondea /match/live-{id} de todos los
+partidos seguidos, descargándolos juntos por el cliente HTTP compartido (una tanda asíncrona,
+conexiones del pool), y de cada página solo lee marcador, minuto y las estadísticas de
+teamTechDiv_detail. Cada sondeo se compara con el anterior y a los suscriptores solo les llegan
+los cambios. Todos los que miran el mismo partido comparten el mismo sondeo.
+
+El intervalo es adaptativo por partido: se acorta cuando hay cambios, se alarga cuando no los
+hay, durante el descanso y tras errores. Al terminar el partido se avisa y se deja de seguir.
+"""
+import queue
+import threading
+import time
+
+import httpx
+from bs4 import BeautifulSoup
+
+from modules import cliente_http, espejos
+from modules.estadisticas_progresion import RUTA_LIVE
+
+INTERVALO_INICIAL = 15.0
+INTERVALO_MINIMO = 8.0
+INTERVALO_MAXIMO = 60.0
+MAX_MENSAJES_PENDIENTES = 50   # un suscriptor más lento recibe una foto completa en vez de la cola
+
+_bloqueo = threading.Lock()
+_despertar = threading.Event()
+_partidos = {}                 # match_id -> {"suscriptores", "ultimo", "intervalo", "proximo"}
+_hilo_iniciado = False
+
+# --- PARSEO DE LA PÁGINA EN DIRECTO ---
+def parse_en_vivo(html):
+    """{"marcador", "minuto", "terminado", "stats": {titulo: {"Casa", "Fuera"}}} de una página /match/live-{id}."""
+    soup = BeautifulSoup(html, 'lxml')
+    marcador, minuto, terminado = None, None, False
+    if bloque := soup.find('div', id='mScore'):
+        goles = [s.text.strip() for s in bloque.select('.score')]
+        if len(goles) == 2 and all(g.isdigit() for g in goles): marcador = f"{goles[0]}-{goles[1]}"
+        terminado = bloque.select_one('.end') is not None
+        if tiempo := (bloque.select_one('.time') or soup.find(id='mState')): minuto = tiempo.get_text(strip=True) or None
+    stats = {}
+    if ul := soup.select_one('div#teamTechDiv_detail ul.stat'):
+        for li in ul.find_all('li'):
+            valores = [v.text.strip() for v in li.find_all('span', class_='stat-c')]
+            if (titulo := li.find('span', class_='stat-title')) and len(valores) == 2:
+                stats[titulo.text.strip()] = {"Casa": valores[0], "Fuera": valores[1]}
+    return {"marcador": marcador, "minuto": minuto, "terminado": terminado, "stats": stats}
+
+def _aplanar(foto):
+    plano = {k: foto.get(k) for k in ("marcador", "minuto", "terminado")}
+    for titulo, valores in foto.get("stats", {}).items():
+        for lado, valor in valores.items(): plano[f"stats.{titulo}.{lado}"] = valor
+    return plano
+
+def diferencias(anterior, actual):
+    """Claves planas ('marcador', 'stats.Shots.Casa'...) cuyo valor ha cambiado entre dos fotos."""
+    antes, ahora = _aplanar(anterior or {}), _aplanar(actual)
+    return {k: v for k, v in ahora.items() if antes.get(k) != v}
+
+def _en_descanso(foto):
+    return (foto.get("minuto") or "").strip().upper() in ("HT", "DESCANSO", "HALF")
+
+# --- SUSCRIPCIONES ---
+def suscribir(match_id):
+    """Cola con los mensajes del partido; si ya hay una foto, el primero es la foto completa."""
+    match_id = str(match_id)
+    cola = queue.Queue(maxsize=MAX_MENSAJES_PENDIENTES)
+    with _bloqueo:
+        estado = _partidos.setdefault(match_id, {"suscriptores": set(), "ultimo": None, "intervalo": INTERVALO_INICIAL, "proximo": 0.0})
+        estado["suscriptores"].add(cola)
+        if estado["ultimo"] is not None: cola.put_nowait(_mensaje("completo", match_id, estado["ultimo"]))
+    _iniciar()
+    _despertar.set()
+    return cola
+
+def cancelar(match_id, cola):
+    """Quita la suscripción; sin suscriptores el partido deja de sondearse."""
+    with _bloqueo:
+        if (estado := _partidos.get(str(match_id))) is None: return
+        estado["suscriptores"].discard(cola)
+        if not estado["suscriptores"]: del _partidos[str(match_id)]
+
+def seguidos():
+    """Partidos en seguimiento con su intervalo actual y número de suscriptores."""
+    with _bloqueo:
+        return {m: {"suscriptores": len(e["suscriptores"]), "intervalo": e["intervalo"], "minuto": (e["ultimo"] or {}).get("minuto")} for m, e in _partidos.items()}
+
+def _mensaje(tipo, match_id, datos):
+    return {"tipo": tipo, "match_id": match_id, "datos": datos, "ts": time.time()}
+
+def _publicar(estado, mensaje, foto):
+    for cola in list(estado["suscriptores"]):
+        try: cola.put_nowait(mensaje)
+        except queue.Full:
+            # Se descarta lo pendiente: con la foto completa el cliente se pone al día
+            while True:
+                try: cola.get_nowait()
+                except queue.Empty: break
+            cola.put_nowait(_mensaje("completo", mensaje["match_id"], foto))
+
+# --- SONDEO COMPARTIDO ---
+async def _descargar(match_id):
+    return (await espejos.obtener_async(RUTA_LIVE.format(match_id=match_id))).text
+
+def _procesar(match_id, resultado):
+    # El parseo va fuera del bloqueo para no frenar a quien se suscribe mientras tanto
+    foto = None if isinstance(resultado, BaseException) else parse_en_vivo(resultado)
+    with _bloqueo:
+        if (estado := _partidos.get(match_id)) is None: return
+        if foto is None:
+            estado["intervalo"] = min(INTERVALO_MAXIMO, estado["intervalo"] * 2)
+            estado["proximo"] = time.time() + estado["intervalo"]
+            if not isinstance(resultado, httpx.HTTPError): _publicar(estado, _mensaje("error", match_id, f"{type(resultado).__name__}: {resultado}"), estado["ultimo"])
+            return
+        anterior = estado["ultimo"]
+        cambios = diferencias(anterior, foto)
+        estado["ultimo"] = foto
+        if anterior is None: _publicar(estado, _mensaje("completo", match_id, foto), foto)
+        elif cambios: _publicar(estado, _mensaje("cambios", match_id, cambios), foto)
+        if foto["terminado"]:
+            _publicar(estado, _mensaje("fin", match_id, foto), foto)
+            del _partidos[match_id]
+            return
+        if _en_descanso(foto): estado["intervalo"] = INTERVALO_MAXIMO
+        elif cambios: estado["intervalo"] = max(INTERVALO_MINIMO, estado["intervalo"] / 2)
+        else: estado["intervalo"] = min(INTERVALO_MAXIMO, estado["intervalo"] * 1.5)
+        estado["proximo"] = time.time() + estado["intervalo"]
+
+def _bucle():
+    while True:
+        ahora = time.time()
+        with _bloqueo:
+            pendientes = [m for m, e in _partidos.items() if e["proximo"] <= ahora]
+        if pendientes:
+            # Todos los partidos que tocan van en una sola tanda por las conexiones compartidas
+            for match_id, resultado in zip(pendientes, cliente_http.mapear(_descargar, pendientes)):
+                _procesar(match_id, resultado)
+        with _bloqueo:
+            siguiente = min((e["proximo"] for e in _partidos.values()), default=time.time() + INTERVALO_MAXIMO)
+        _despertar.wait(max(0.2, siguiente - time.time()))
+        _despertar.clear()
+
+def _iniciar():
+    global _hilo_iniciado
+    with _bloqueo:
+        if _hilo_iniciado: return
+        _hilo_iniciado = True
+    threading.Thread(target=_bucle, name="en-vivo", daemon=True).start()
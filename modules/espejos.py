@@ -0,0 +1,139 @@
+# modules/espejos.py
+"""
+Pool de espejos de NowGoal con selección por latencia y failover automático.
+Cada petición (httpx o navegación de Selenium/Playwright) va al espejo sano más rápido según
+una media móvil de latencia; si falla, se reintenta en el siguiente sin que el llamante lo note.
+Un hilo en segundo plano sondea todos los espejos para detectar caídas y recuperaciones.
+
+Configuración: MASIVO_ESPEJOS="https://live18.nowgoal25.com,https://live20.nowgoal25.com".
+"""
+import os
+import threading
+import time
+
+import httpx
+from selenium.common.exceptions import WebDriverException
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support import expected_conditions as EC
+from selenium.webdriver.support.ui import WebDriverWait
+
+from modules import cliente_http, limitador
+
+ESPEJOS = [e.strip().rstrip('/') for e in os.environ.get("MASIVO_ESPEJOS", "https://live18.nowgoal25.com,https://live20.nowgoal25.com").split(',') if e.strip()]
+INTERVALO_SONDEO = 60          # segundos entre sondeos de salud
+ALFA_LATENCIA = 0.3            # peso de la última medida en la media móvil
+FALLOS_PARA_CAIDA = 2          # fallos seguidos para dar un espejo por caído
+ENFRIAMIENTO = 120             # segundos que un espejo caído queda fuera de la rotación
+SIN_ESPEJOS = "No hay espejos configurados (MASIVO_ESPEJOS)"
+
+_bloqueo = threading.Lock()
+_estado = {e: {"latencia": None, "fallos_seguidos": 0, "caido_hasta": 0.0, "peticiones": 0, "errores": 0, "ultimo_error": None} for e in ESPEJOS}
+_sondeo_iniciado = False
+
+def registrar(espejo, correcto, latencia=None, error=None):
+    """Actualiza la latencia media y la salud de un espejo tras una petición o un sondeo."""
+    with _bloqueo:
+        e = _estado.setdefault(espejo, {"latencia": None, "fallos_seguidos": 0, "caido_hasta": 0.0, "peticiones": 0, "errores": 0, "ultimo_error": None})
+        e["peticiones"] += 1
+        if correcto:
+            e["fallos_seguidos"], e["caido_hasta"] = 0, 0.0
+            if latencia is not None: e["latencia"] = latencia if e["latencia"] is None else (1 - ALFA_LATENCIA) * e["latencia"] + ALFA_LATENCIA * latencia
+        else:
+            e["errores"] += 1; e["fallos_seguidos"] += 1; e["ultimo_error"] = error
+            if e["fallos_seguidos"] >= FALLOS_PARA_CAIDA: e["caido_hasta"] = time.time() + ENFRIAMIENTO
+
+def candidatos():
+    """Espejos ordenados: primero los sanos por latencia (los no medidos al final de ellos), después los caídos."""
+    _iniciar_sondeo()
+    ahora = time.time()
+    with _bloqueo:
+        return sorted(_estado, key=lambda k: (_estado[k]["caido_hasta"] > ahora, _estado[k]["latencia"] is None, _estado[k]["latencia"] or 0.0))
+
+def mejor():
+    return candidatos()[0]
+
+def metricas():
+    """Una fila por espejo con latencia media (ms), peticiones, errores y si está en la rotación."""
+    ahora = time.time()
+    with _bloqueo:
+        return [{"espejo": k, "latencia_ms": round(e["latencia"] * 1000) if e["latencia"] is not None else None, "peticiones": e["peticiones"],
+                 "errores": e["errores"], "sano": e["caido_hasta"] <= ahora, "ultimo_error": e["ultimo_error"]} for k, e in _estado.items()]
+
+# --- PETICIONES HTTP CON FAILOVER ---
+async def obtener_async(ruta, **kwargs):
+    """GET de `ruta` (p. ej. "/match/live-123") en el mejor espejo; los 4xx se devuelven tal cual, sin failover."""
+    ultimo_error = None
+    for espejo in candidatos():
+        inicio = time.monotonic()
+        try:
+            respuesta = await cliente_http.obtener_async(espejo + ruta, **kwargs)
+        except httpx.HTTPStatusError as e:
+            if e.response.status_code < 500: registrar(espejo, True, time.monotonic() - inicio); raise
+            registrar(espejo, False, error=str(e)); ultimo_error = e
+        except httpx.HTTPError as e:
+            registrar(espejo, False, error=f"{type(e).__name__}: {e}"); ultimo_error = e
+        else:
+            registrar(espejo, True, time.monotonic() - inicio)
+            return respuesta
+    raise ultimo_error or RuntimeError(SIN_ESPEJOS)
+
+# --- NAVEGACIÓN DEL NAVEGADOR CON FAILOVER ---
+_ESTADO_NAVEGACION = "const n = performance.getEntriesByType('navigation')[0]; return [location.href, n ? n.responseStatus || 0 : 0];"
+
+def fallo_de_conexion(driver, error):
+    """
+    True si el error es del espejo (DNS, conexión rechazada, TLS, HTTP 5xx) y no de la página servida
+    (un selector que no aparece, un partido que no existe...): solo esos cuentan para su salud y el limitador.
+    """
+    if "net::ERR_" in str(error): return True
+    try: url, estado = driver.execute_script(_ESTADO_NAVEGACION)
+    except WebDriverException: return False
+    # Chrome muestra sus páginas de error de red en chrome-error://
+    return str(url).startswith("chrome-error://") or (isinstance(estado, int) and estado >= 500)
+
+def navegar(driver, ruta, id_esperado, timeout):
+    """
+    Carga `ruta` con Selenium en el mejor espejo y espera al elemento `id_esperado`.
+    Devuelve el espejo usado. Ante un fallo de conexión pasa al siguiente espejo (y si fallan todos,
+    relanza el último error); si la página llega pero sin el elemento, relanza sin probar otros.
+    """
+    ultimo_error = None
+    for espejo in candidatos():
+        url, inicio = espejo + ruta, time.monotonic()
+        limitador.esperar(url)
+        try:
+            driver.get(url)
+        except WebDriverException as e:
+            # Si falla la carga en sí (DNS, conexión, TLS, timeout de carga) el problema es del espejo
+            registrar(espejo, False, error=type(e).__name__); limitador.registrar(url, False); ultimo_error = e
+            continue
+        try:
+            WebDriverWait(driver, timeout).until(EC.presence_of_element_located((By.ID, id_esperado)))
+        except WebDriverException as e:
+            if not fallo_de_conexion(driver, e): registrar(espejo, True); limitador.registrar(url, True); raise
+            registrar(espejo, False, error=type(e).__name__); limitador.registrar(url, False); ultimo_error = e
+            continue
+        registrar(espejo, True, time.monotonic() - inicio); limitador.registrar(url, True)
+        return espejo
+    raise ultimo_error or RuntimeError(SIN_ESPEJOS)
+
+# --- SONDEOS DE SALUD EN SEGUNDO PLANO ---
+async def _sondear(espejo):
+    inicio = time.monotonic()
+    try:
+        await cliente_http.obtener_async(espejo + "/")
+        registrar(espejo, True, time.monotonic() - inicio)
+    except httpx.HTTPError as e:
+        registrar(espejo, False, error=f"sondeo: {type(e).__name__}")
+
+def _bucle_sondeo():
+    while True:
+        cliente_http.mapear(_sondear, list(_estado))
+        time.sleep(INTERVALO_SONDEO)
+
+def _iniciar_sondeo():
+    global _sondeo_iniciado
+    with _bloqueo:
+        if _sondeo_iniciado: return
+        _sondeo_iniciado = True
+    threading.Thread(target=_bucle_sondeo, name="sondeo-espejos", daemon=True).start()
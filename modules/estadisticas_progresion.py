@@ -0,0 +1,64 @@
+# modules/estadisticas_progresion.py
+"""
+Estadísticas de progresión (Shots, Attacks...) de /match/live-{id} con caché persistente.
+Los precedentes están terminados y sus números ya no cambian: una página con estadísticas se
+guarda sin caducidad y una sin teamTechDiv_detail se recuerda poco tiempo (caché negativa).
+Los errores de red no se guardan.
+"""
+import httpx
+import pandas as pd
+from bs4 import BeautifulSoup
+
+from modules import cliente_http, espejos
+from modules.cache_local import CacheLocal
+
+RUTA_LIVE = "/match/live-{match_id}"
+TTL_SIN_ESTADISTICAS = 30 * 60
+TTL_EN_JUEGO = 60
+CACHE_PROGRESION = CacheLocal("estadisticas_progresion")
+
+# Mapeo de posibles nombres de estadísticas a un nombre canónico en inglés
+STATS_MAP = {
+    "Shots": "Shots", "Disparos": "Shots",
+    "Shots on Goal": "Shots on Goal", "Disparos a Puerta": "Shots on Goal",
+    "Attacks": "Attacks", "Ataques": "Attacks",
+    "Dangerous Attacks": "Dangerous Attacks", "Ataques Peligrosos": "Dangerous Attacks"
+}
+
+def parse_estadisticas_progresion(html):
+    """Filas {Estadistica_EN, Casa, Fuera} en el orden de STATS_MAP; lista vacía si la página no tiene el bloque."""
+    soup = BeautifulSoup(html, 'lxml')
+    stats_results = {}
+    if ul := soup.select_one('div#teamTechDiv_detail ul.stat'):
+        for li in ul.find_all('li'):
+            if (title_span := li.find('span', class_='stat-title')) and (canonical_key := STATS_MAP.get(title_span.text.strip())):
+                values = [v.text.strip() for v in li.find_all('span', class_='stat-c')]
+                if len(values) == 2: stats_results[canonical_key] = {"Casa": values[0], "Fuera": values[1]}
+    return [{"Estadistica_EN": key, **stats_results[key]} for key in dict.fromkeys(STATS_MAP.values()) if key in stats_results]
+
+def _como_dataframe(filas):
+    return pd.DataFrame(filas).set_index("Estadistica_EN") if filas else pd.DataFrame(columns=['Casa', 'Fuera'])
+
+async def obtener_estadisticas_progresion_async(match_id, terminado=True):
+    """
+    DataFrame indexado por Estadistica_EN con columnas Casa/Fuera (vacío si no hay datos).
+    Con terminado=False (partido en juego) las estadísticas solo se guardan TTL_EN_JUEGO segundos.
+    """
+    if not (match_id and str(match_id).isdigit()): return pd.DataFrame(columns=['Casa', 'Fuera'])
+    if (filas := CACHE_PROGRESION.obtener(match_id)) is not None: return _como_dataframe(filas)
+    try:
+        response = await espejos.obtener_async(RUTA_LIVE.format(match_id=match_id))
+    except httpx.HTTPError:
+        return pd.DataFrame(columns=['Casa', 'Fuera'])
+    filas = parse_estadisticas_progresion(response.text)
+    CACHE_PROGRESION.guardar(match_id, filas, ttl=TTL_SIN_ESTADISTICAS if not filas else (None if terminado else TTL_EN_JUEGO))
+    return _como_dataframe(filas)
+
+def obtener_estadisticas_progresion(match_id, terminado=True):
+    return cliente_http.ejecutar(obtener_estadisticas_progresion_async(match_id, terminado))
+
+def obtener_estadisticas_varias(match_ids):
+    """{match_id: DataFrame} descargando en paralelo solo los que no están en caché."""
+    match_ids = list(dict.fromkeys(m for m in match_ids if m))
+    resultados = cliente_http.mapear(obtener_estadisticas_progresion_async, match_ids)
+    return {m: (r if isinstance(r, pd.DataFrame) else pd.DataFrame(columns=['Casa', 'Fuera'])) for m, r in zip(match_ids, resultados)}
@@ -1,12 +1,9 @@
 # modules/estudio_scraper.py
+import datetime
 import time
-import requests
 import re
-import math
 import pandas as pd
 from bs4 import BeautifulSoup
-from requests.adapters import HTTPAdapter
-from urllib3.util.retry import Retry
 from concurrent.futures import ThreadPoolExecutor
 import traceback
 
@@ -18,47 +15,20 @@ from selenium.webdriver.support.ui import WebDriverWait, Select
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.common.exceptions import TimeoutException, WebDriverException
 
+from modules.lineas_ah import parse_ah, format_ah
+from modules.evaluador_lineas import precedentes_desde_estudio
+from modules.indice_equipos import IndiceEquipos, _parse_date_ddmmyyyy
+from modules import historial_local, espejos, api_json, pestanas, movimientos_cuotas, trazas, carga_js, regiones_html, extraccion_js
+from modules.cache_local import CacheLRU
+from modules.partidos_proximos import inicio_partido
+from modules.estadisticas_progresion import obtener_estadisticas_progresion, obtener_estadisticas_varias
+
 # --- CONFIGURACIÓN GLOBAL ---
-BASE_URL = "https://live18.nowgoal25.com"
 SELENIUM_TIMEOUT_SECONDS = 15
 
-# --- FUNCIONES DE FORMATEO Y PARSEO (IDÉNTICAS A ESTUDIO.PY) ---
-def parse_ah_to_number_of(ah_line_str: str):
-    if not isinstance(ah_line_str, str): return None
-    s = ah_line_str.strip().replace(' ', '')
-    if not s or s in ['-', '?']: return None
-    original_starts_with_minus = ah_line_str.strip().startswith('-')
-    try:
-        if '/' in s:
-            parts = s.split('/')
-            if len(parts) != 2: return None
-            val1, val2 = float(parts[0]), float(parts[1])
-            if val1 < 0 and not parts[1].startswith('-') and val2 > 0: val2 = -abs(val2)
-            elif original_starts_with_minus and val1 == 0.0 and not parts[1].startswith('-') and val2 > 0: val2 = -abs(val2)
-            return (val1 + val2) / 2.0
-        return float(s)
-    except (ValueError, IndexError): return None
-
-def format_ah_as_decimal_string_of(ah_line_str: str):
-    numeric_value = parse_ah_to_number_of(ah_line_str)
-    if numeric_value is None: return ah_line_str.strip() if isinstance(ah_line_str, str) and ah_line_str.strip() in ['-','?'] else '-'
-    if numeric_value == 0.0: return "0"
-    sign = -1 if numeric_value < 0 else 1
-    abs_num = abs(numeric_value)
-    mod_val = abs_num % 1
-    if mod_val == 0.0: abs_rounded = abs_num
-    elif mod_val == 0.25: abs_rounded = math.floor(abs_num) + 0.25
-    elif mod_val == 0.5: abs_rounded = abs_num
-    elif mod_val == 0.75: abs_rounded = math.floor(abs_num) + 0.75
-    else:
-        if mod_val < 0.25: abs_rounded = math.floor(abs_num)
-        elif mod_val < 0.75: abs_rounded = math.floor(abs_num) + 0.5
-        else: abs_rounded = math.ceil(abs_num)
-    final_value = sign * abs_rounded
-    if final_value == 0.0: return "0"
-    if abs(final_value % 1) < 1e-9: return str(int(final_value))
-    if abs(final_value - (math.floor(final_value) + 0.5)) < 1e-9: return f"{final_value:.1f}"
-    return f"{final_value:.2f}"
+# --- FUNCIONES DE FORMATEO Y PARSEO (CODEC COMPARTIDO EN modules/lineas_ah.py) ---
+parse_ah_to_number_of = parse_ah
+format_ah_as_decimal_string_of = format_ah
 
 # --- SISTEMA DE ANÁLISIS DE MERCADO (100% FIEL A ESTUDIO.PY) ---
 def check_handicap_cover(resultado_raw, ah_line_num, favorite_team_name, home_team, away_team, main_home_team_name):
@@ -153,6 +123,13 @@ def _analizar_precedente_goles(precedente_data, goles_actual_num):
         return f"<li><span class='score-value'>Goles:</span> El partido tuvo <strong>{total_goles} goles</strong>, por lo que la línea actual habría resultado {cover_html}.</li>"
     except (ValueError, TypeError): return "<li><span class='score-value'>Goles:</span> No se pudo procesar el resultado del precedente.</li>"
 
+# HTML del análisis de mercado ya generado, por huella de sus entradas (cuotas, H2H y nombres)
+ANALISIS_MERCADO = CacheLRU(256)
+
+def analisis_mercado_cacheado(main_odds, h2h_data, home_name, away_name):
+    clave = api_json.etag(api_json.serializar([main_odds, h2h_data, home_name, away_name]))
+    return ANALISIS_MERCADO.obtener_o_crear(clave, lambda: generar_analisis_completo_mercado(main_odds, h2h_data, home_name, away_name))
+
 def generar_analisis_completo_mercado(main_odds, h2h_data, home_name, away_name):
     ah_actual_str = format_ah_as_decimal_string_of(main_odds.get('ah_linea_raw', '-'))
     ah_actual_num = parse_ah_to_number_of(ah_actual_str)
@@ -184,13 +161,6 @@ def _get_selenium_driver():
     try: return webdriver.Chrome(options=options)
     except WebDriverException as e: print(f"Error inicializando Selenium: {e}"); return None
 
-def _create_requests_session():
-    session = requests.Session()
-    retries = Retry(total=3, backoff_factor=0.5, status_forcelist=[500, 502, 503, 504])
-    session.mount("https://", HTTPAdapter(max_retries=retries))
-    session.headers.update({"User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 Chrome/116.0.0.0 Safari/537.36"})
-    return session
-
 def get_match_details_from_row_of(row, score_class_selector):
     try:
         cells = row.find_all('td')
@@ -208,71 +178,64 @@ def get_match_details_from_row_of(row, score_class_selector):
         return {'home_team': home_team, 'away_team': away_team, 'score': score_fmt, 'score_raw': score_raw, 'handicap_line_raw': ah_line_raw or '-', 'match_id': row.get('index'), 'league_id_hist': row.get('name'), 'date': date_span.get_text(strip=True) if date_span else ''}
     except Exception: return None
 
-# ¡FUNCIÓN CLAVE CORREGIDA PARA EL IDIOMA!
-def get_match_progression_stats_data(session, match_id):
-    if not (match_id and match_id.isdigit()): return pd.DataFrame(columns=['Casa', 'Fuera'])
-    try:
-        url = f"https://live18.nowgoal25.com/match/live-{match_id}"
-        soup = BeautifulSoup(session.get(url, timeout=10).text, 'lxml')
-        
-        # Mapeo de posibles nombres de estadísticas a un nombre canónico en inglés
-        stats_map = {
-            "Shots": "Shots", "Disparos": "Shots",
-            "Shots on Goal": "Shots on Goal", "Disparos a Puerta": "Shots on Goal",
-            "Attacks": "Attacks", "Ataques": "Attacks",
-            "Dangerous Attacks": "Dangerous Attacks", "Ataques Peligrosos": "Dangerous Attacks"
-        }
-        # Diccionario para guardar los resultados con los nombres canónicos
-        stats_results = { "Shots": "-", "Shots on Goal": "-", "Attacks": "-", "Dangerous Attacks": "-" }
-
-        if ul := soup.select_one('div#teamTechDiv_detail ul.stat'):
-            for li in ul.find_all('li'):
-                title_span = li.find('span', class_='stat-title')
-                if title_span:
-                    title_text = title_span.text.strip()
-                    if title_text in stats_map:
-                        canonical_key = stats_map[title_text]
-                        values = [v.text.strip() for v in li.find_all('span', class_='stat-c')]
-                        if len(values) == 2:
-                            stats_results[canonical_key] = {"Home": values[0], "Away": values[1]}
-        
-        df = pd.DataFrame([
-            {"Estadistica_EN": key, "Casa": val.get('Home', '-'), "Fuera": val.get('Away', '-')}
-            for key, val in stats_results.items() if isinstance(val, dict)
-        ])
-        
-        return df.set_index("Estadistica_EN") if not df.empty else pd.DataFrame(columns=['Casa', 'Fuera'])
-    except requests.RequestException:
-        return pd.DataFrame(columns=['Casa', 'Fuera'])
-
-def get_rival_h2h_info(soup, table_id, league_id):
-    if not (table := soup.find("table", id=table_id)): return (None, None, None)
-    for row in table.find_all("tr", {"vs": "1"}):
-        if league_id and row.get("name") != str(league_id): continue
-        if (key_id := row.get("index")) and (links := row.find_all("a", onclick=True)):
-            rival_idx = 1 if table_id == "table_v1" else 0
-            if len(links) > rival_idx and (m := re.search(r"team\((\d+)\)", links[rival_idx].get("onclick", ""))):
-                return key_id, m.group(1), links[rival_idx].text.strip()
-    return (None, None, None)
+def get_match_details_from_record_of(registro, table_id=None):
+    """Mismo formato que get_match_details_from_row_of a partir de un registro de modules/carga_js."""
+    score_raw = registro['score_raw']
+    return {'home_team': registro['home'], 'away_team': registro['away'], 'score': score_raw.replace('-', ':'), 'score_raw': score_raw,
+            'handicap_line_raw': registro['ah_raw'] or '-', 'match_id': registro['match_id'], 'league_id_hist': registro['league_id'], 'date': registro['fecha']}
+
+# Estadísticas de progresión de los precedentes (terminados): caché persistente compartida
+def get_match_progression_stats_data(match_id):
+    return obtener_estadisticas_progresion(match_id)
+
+def get_rival_h2h_info(indice, table_id, league_id):
+    # El rival es el visitante en table_v1 y el local en table_v2
+    if not (fila := indice.primera_fila_vs(table_id, league_id)) or not fila.get('match_id'): return (None, None, None)
+    lado = 'away' if table_id == "table_v1" else 'home'
+    if not (rival_id := fila.get(f'{lado}_id')): return (None, None, None)
+    return fila['match_id'], rival_id, fila.get(f'{lado}_team')
+
+def parse_h2h_rivales_of(html, rival_a_id, rival_b_id):
+    soup = regiones_html.soup_h2h(html, ("table_v2",))
+    table = soup.find("table", id="table_v2")
+    if not table: return {"status": "error", "resultado": "Tabla de H2H de rival no encontrada."}
+    for row in table.find_all("tr", id=re.compile(r"tr2_\d+")):
+        links = row.find_all("a", onclick=True)
+        if len(links) < 2: continue
+        h_m, a_m = re.search(r"team\((\d+)\)", links[0].get('onclick','')), re.search(r"team\((\d+)\)", links[1].get('onclick',''))
+        if h_m and a_m and {h_m.group(1), a_m.group(1)} == {str(rival_a_id), str(rival_b_id)}:
+            if (score := row.find("span", class_="fscore_2")) and '-' in score.text:
+                g_h, g_a = score.text.strip().split('(')[0].strip().split('-')
+                ah = (row.find_all('td')[11].get("data-o") or row.find_all('td')[11].text).strip()
+                return {"status": "found", "goles_home": g_h, "goles_away": g_a, "handicap": ah, "match_id": row.get('index'), "h2h_home_team_name": links[0].text.strip(), "h2h_away_team_name": links[1].text.strip()}
+    return {"status": "not_found", "resultado": "H2H directo no encontrado."}
 
-def get_h2h_details_for_original_logic_of(driver, key_match_id, rival_a_id, rival_b_id):
-    if not all([driver, key_match_id, rival_a_id, rival_b_id]): return {"status": "error", "resultado": "Datos de rivales incompletos."}
-    try:
-        driver.get(f"{BASE_URL}/match/h2h-{key_match_id}"); WebDriverWait(driver, 10).until(EC.presence_of_element_located((By.ID, "table_v2")))
-        soup = BeautifulSoup(driver.page_source, "lxml")
-        table = soup.find("table", id="table_v2")
-        if not table: return {"status": "error", "resultado": "Tabla de H2H de rival no encontrada."}
-        for row in table.find_all("tr", id=re.compile(r"tr2_\d+")):
-            links = row.find_all("a", onclick=True)
-            if len(links) < 2: continue
-            h_m, a_m = re.search(r"team\((\d+)\)", links[0].get('onclick','')), re.search(r"team\((\d+)\)", links[1].get('onclick',''))
-            if h_m and a_m and {h_m.group(1), a_m.group(1)} == {str(rival_a_id), str(rival_b_id)}:
-                if (score := row.find("span", class_="fscore_2")) and '-' in score.text:
-                    g_h, g_a = score.text.strip().split('(')[0].strip().split('-')
-                    ah = (row.find_all('td')[11].get("data-o") or row.find_all('td')[11].text).strip()
-                    return {"status": "found", "goles_home": g_h, "goles_away": g_a, "handicap": ah, "match_id": row.get('index'), "h2h_home_team_name": links[0].text.strip(), "h2h_away_team_name": links[1].text.strip()}
+def abrir_h2h_rivales_of(driver, key_match_id, rival_a_id, rival_b_id):
+    """Lanza la carga del H2H de rivales en otra pestaña en cuanto se conoce key_match_id (None si faltan datos)."""
+    if not all([driver, key_match_id, rival_a_id, rival_b_id]): return None
+    try: return pestanas.abrir(driver, f"/match/h2h-{key_match_id}")
+    except WebDriverException: return None
+
+def h2h_rivales_desde_js_of(datos, rival_a_id, rival_b_id):
+    """Igual que parse_h2h_rivales_of con el JSON de extraccion_js."""
+    if not (fila := extraccion_js.fila_rivales(datos, rival_a_id, rival_b_id)): return {"status": "not_found", "resultado": "H2H directo no encontrado."}
+    g_h, g_a = fila["marcador"].split('(')[0].strip().split('-')
+    return {"status": "found", "goles_home": g_h, "goles_away": g_a, "handicap": fila["ah"], "match_id": fila["index"], "h2h_home_team_name": fila["nombres"][0], "h2h_away_team_name": fila["nombres"][1]}
+
+def recoger_h2h_rivales_of(driver, pestana, rival_a_id, rival_b_id):
+    if not pestana: return {"status": "error", "resultado": "Datos de rivales incompletos."}
+    # En modo js se extrae el JSON dentro de la pestaña; si no se puede, se lee su HTML allí mismo
+    leer = (lambda d: extraccion_js.extraer(d) or d.page_source) if extraccion_js.ACTIVA else None
+    try: pagina = pestanas.recoger(driver, pestana, "table_v2", 10, leer=leer)
     except Exception as e: return {"status": "error", "resultado": f"Error en Selenium: {type(e).__name__}"}
-    return {"status": "not_found", "resultado": "H2H directo no encontrado."}
+    return h2h_rivales_desde_js_of(pagina, rival_a_id, rival_b_id) if isinstance(pagina, dict) else parse_h2h_rivales_of(pagina, rival_a_id, rival_b_id)
+
+def get_h2h_details_for_original_logic_of(driver, key_match_id, rival_a_id, rival_b_id):
+    return recoger_h2h_rivales_of(driver, abrir_h2h_rivales_of(driver, key_match_id, rival_a_id, rival_b_id), rival_a_id, rival_b_id)
+
+def get_team_league_info_from_js_of(html):
+    if not (info := carga_js.info_partido(html)) or not all(info[:3]): return None
+    return info[0], info[1], info[2], info[3] or "Local", info[4] or "Visitante"
 
 def get_team_league_info_from_script_of(soup):
     if (tag := soup.find("script", string=re.compile(r"var _matchInfo ="))) and tag.string:
@@ -280,27 +243,23 @@ def get_team_league_info_from_script_of(soup):
         return find(r"hId:\s*parseInt\('(\d+)'\)"), find(r"gId:\s*parseInt\('(\d+)'\)"), find(r"sclassId:\s*parseInt\('(\d+)'\)"), find(r"hName:\s*'([^']*)'") or "Local", find(r"gName:\s*'([^']*)'") or "Visitante"
     return None, None, None, "Local", "Visitante"
 
-def _parse_date_ddmmyyyy(d):
-    m = re.search(r'(\d{2})-(\d{2})-(\d{4})', d or ''); return (int(m[3]), int(m[2]), int(m[1])) if m else (1900, 1, 1)
-
-def extract_last_match(soup, table_id, team_name, league_id, is_home):
-    def find(league_filter):
-        matches = []
-        if table := soup.find("table", id=table_id):
-            score_class = 'fscore_1' if table_id == 'table_v1' else 'fscore_2'
-            for row in table.find_all("tr", id=re.compile(rf"tr{table_id[-1]}_\d+")):
-                if not (d := get_match_details_from_row_of(row, score_class)): continue
-                if league_filter and d.get("league_id_hist") != str(league_filter): continue
-                is_team_home = team_name.lower() in d.get('home_team', '').lower()
-                is_team_away = team_name.lower() in d.get('away_team', '').lower()
-                if (is_home and is_team_home) or (not is_home and is_team_away): matches.append(d)
-        return matches
-    candidates = find(league_id) or find(None)
-    return sorted(candidates, key=lambda x: _parse_date_ddmmyyyy(x.get('date')), reverse=True)[0] if candidates else None
-
-def extract_bet365_initial_odds_of(soup):
+def fecha_partido_of(match_id):
+    """Fecha aaaa-mm-dd del partido estudiado según la portada (hoy si no se conoce)."""
+    inicio = inicio_partido(match_id)
+    momento = datetime.datetime.fromtimestamp(inicio, datetime.timezone.utc) if inicio else datetime.datetime.now(datetime.timezone.utc)
+    return momento.strftime('%Y-%m-%d')
+
+def extract_last_match(indice, team_id, team_name, league_id, is_home, antes_de=None):
+    team_id = team_id or indice.id_de_nombre(team_name)
+    venue = 'home' if is_home else 'away'
+    # Si la página llega incompleta, el historial local puede tener el partido de liga (solo anteriores al estudiado)
+    return indice.ultimo(team_id, venue, league_id) or historial_local.ultimo_partido(team_id, venue, league_id, antes_de=antes_de) or indice.ultimo(team_id, venue)
+
+def extract_bet365_initial_odds_of(soup, html=None):
     odds = {"ah_linea_raw": "N/A", "goals_linea_raw": "N/A"}
-    if (row := soup.select_one("tr#tr_o_1_8[name='earlyOdds'], tr#tr_o_1_31[name='earlyOdds']")) and len(tds := row.find_all("td")) > 9:
+    if html and (cuotas := carga_js.cuotas_iniciales(html)):
+        odds["ah_linea_raw"], odds["goals_linea_raw"] = cuotas
+    elif (row := soup.select_one("tr#tr_o_1_8[name='earlyOdds'], tr#tr_o_1_31[name='earlyOdds']")) and len(tds := row.find_all("td")) > 9:
         odds["ah_linea_raw"], odds["goals_linea_raw"] = (tds[3].get("data-o") or tds[3].text).strip(), (tds[9].get("data-o") or tds[9].text).strip()
     return odds
 
@@ -335,89 +294,199 @@ def extract_over_under_stats_from_div_of(soup, team_type):
                 except (ValueError, TypeError, AttributeError): pass
     return default
 
-def extract_h2h_data_of(soup, home_name, away_name):
+def extract_final_score_of(soup):
+    scores = soup.select('#mScore .end .score')
+    if len(scores) == 2 and scores[0].text.strip().isdigit() and scores[1].text.strip().isdigit(): return f"{scores[0].text.strip()}-{scores[1].text.strip()}"
+    return '?-?'
+
+def extract_h2h_data_of(soup, home_name, away_name, registros_v3=None):
     results = {'res1': '?:?', 'match1_id': None, 'res6': '?:?', 'match6_id': None, 'ah1': '-', 'ah6': '-', 'h2h_gen_home': 'N/A', 'h2h_gen_away': 'N/A', 'res1_raw': '?-?', 'res6_raw': '?-?'}
-    if table := soup.find("table", id="table_v3"):
-        matches = sorted([d for r in table.find_all("tr") if (d := get_match_details_from_row_of(r, 'fscore_3'))], key=lambda x: _parse_date_ddmmyyyy(x.get('date')), reverse=True)
-        if matches:
-            results.update({k: matches[0][v] for k, v in {'res6': 'score', 'res6_raw': 'score_raw', 'ah6': 'handicap_line_raw', 'match6_id': 'match_id', 'h2h_gen_home': 'home_team', 'h2h_gen_away': 'away_team'}.items()})
-            for m in matches:
-                if m['home_team'].lower() == home_name.lower() and m['away_team'].lower() == away_name.lower():
-                    results.update({k: m[v] for k, v in {'res1': 'score', 'res1_raw': 'score_raw', 'ah1': 'handicap_line_raw', 'match1_id': 'match_id'}.items()}); break
+    if registros_v3 is not None: filas = [get_match_details_from_record_of(r) for r in registros_v3]
+    elif table := soup.find("table", id="table_v3"): filas = [d for r in table.find_all("tr") if (d := get_match_details_from_row_of(r, 'fscore_3'))]
+    else: filas = []
+    if matches := sorted(filas, key=lambda x: _parse_date_ddmmyyyy(x.get('date')), reverse=True):
+        results.update({k: matches[0][v] for k, v in {'res6': 'score', 'res6_raw': 'score_raw', 'ah6': 'handicap_line_raw', 'match6_id': 'match_id', 'h2h_gen_home': 'home_team', 'h2h_gen_away': 'away_team'}.items()})
+        for m in matches:
+            if m['home_team'].lower() == home_name.lower() and m['away_team'].lower() == away_name.lower():
+                results.update({k: m[v] for k, v in {'res1': 'score', 'res1_raw': 'score_raw', 'ah1': 'handicap_line_raw', 'match1_id': 'match_id'}.items()}); break
     return results
 
-def extract_comparative_match_of(soup, table_id, main_team, opponent, league_id):
-    if not all([opponent, opponent != "N/A", main_team, table := soup.find("table", id=table_id)]): return None
-    score_class = 'fscore_1' if table_id == 'table_v1' else 'fscore_2'
-    for row in table.find_all("tr", id=re.compile(rf"tr{table_id[-1]}_\d+")):
-        if d := get_match_details_from_row_of(row, score_class):
-            if league_id and d.get('league_id_hist') and d.get('league_id_hist') != str(league_id): continue
-            h, a = d.get('home_team','').lower(), d.get('away_team','').lower()
-            if {main_team.lower(), opponent.lower()} == {h, a}:
-                d['localia'] = 'H' if main_team.lower() == h else 'A'; return d
-    return None
+def extract_comparative_match_of(indice, main_team_id, opponent_id, league_id, antes_de=None):
+    return indice.comparativa(main_team_id, opponent_id, league_id) or historial_local.comparativa(main_team_id, opponent_id, league_id, antes_de=antes_de)
+
+def leer_pagina_h2h_of(driver, span):
+    """
+    Todo lo que se lee de la página h2h ya cargada: IDs y nombres, índice del historial, cuotas iniciales,
+    marcador, H2H, clasificación y O/U. Primero con el script de extraccion_js dentro del navegador;
+    si no se puede, desde page_source con el parseo por regiones de siempre.
+    """
+    if extraccion_js.ACTIVA and (datos := extraccion_js.extraer(driver)) and (info := extraccion_js.info_partido(datos)):
+        span.bytes = datos["bytes"]; span.anotar(fuente="navegador")
+        home_name, away_name = info[3] or "Local", info[4] or "Visitante"
+        historial_js = extraccion_js.historial(datos)
+        main_odds = {"ah_linea_raw": "N/A", "goals_linea_raw": "N/A"}
+        if cuotas := extraccion_js.cuotas_iniciales(datos): main_odds["ah_linea_raw"], main_odds["goals_linea_raw"] = cuotas
+        return {"home_id": info[0], "away_id": info[1], "league_id": info[2], "home_name": home_name, "away_name": away_name,
+                "indice": IndiceEquipos.desde_registros(historial_js, get_match_details_from_record_of),
+                "final_score_raw": extraccion_js.marcador_final(datos), "main_match_odds": main_odds,
+                "h2h": extract_h2h_data_of(None, home_name, away_name, historial_js.get("table_v3", [])),
+                "home_standings": extraccion_js.clasificacion(datos, home_name), "away_standings": extraccion_js.clasificacion(datos, away_name),
+                "home_ou_stats": extraccion_js.over_under(datos, 'home'), "away_ou_stats": extraccion_js.over_under(datos, 'away')}
+    html = driver.page_source
+    span.bytes = len(html)
+    # Solo las regiones que se leen (regiones_html); todo lo que sale del árbol se saca aquí y se libera
+    soup = regiones_html.soup_h2h(html)
+    # Historial e IDs de los scripts de la página (carga_js); si no encajan, del DOM
+    historial_js = carga_js.historial(html)
+    span.anotar(fuente="js" if historial_js else "dom")
+    home_id, away_id, league_id, home_name, away_name = get_team_league_info_from_js_of(html) or get_team_league_info_from_script_of(soup)
+    pagina = {"home_id": home_id, "away_id": away_id, "league_id": league_id, "home_name": home_name, "away_name": away_name,
+              "indice": IndiceEquipos.desde_registros(historial_js, get_match_details_from_record_of) if historial_js else IndiceEquipos.desde_soup(soup, get_match_details_from_row_of),
+              "final_score_raw": extract_final_score_of(soup), "main_match_odds": extract_bet365_initial_odds_of(soup, html),
+              "h2h": extract_h2h_data_of(soup, home_name, away_name, historial_js and historial_js["table_v3"]),
+              "home_standings": extract_standings_data_from_h2h_page_of(soup, home_name), "away_standings": extract_standings_data_from_h2h_page_of(soup, away_name),
+              "home_ou_stats": extract_over_under_stats_from_div_of(soup, 'home'), "away_ou_stats": extract_over_under_stats_from_div_of(soup, 'away')}
+    regiones_html.liberar(soup)
+    return pagina
 
 # --- FUNCIÓN PRINCIPAL ORQUESTADORA ---
-def obtener_datos_completos_partido(match_id: str) -> dict:
-    if not (match_id and match_id.isdigit()): return {"error": "ID de partido no válido."}
+# Secciones que produce iterar_datos_partido, en el orden en que suelen estar listas
+SECCIONES_ESTUDIO = ("cabecera", "precedentes", "mercado", "clasificacion", "estadisticas", "col3", "completo")
+
+def _sin_precedente():
+    return {"details": None, "stats": None, "analysis": []}
+
+def iterar_datos_partido(match_id: str):
+    """
+    Estudio por partes: produce (sección, all_data) en cuanto cada bloque está listo, para poder
+    mostrarlo sin esperar al resto. Termina con ("completo", all_data) o ("error", {"error": ...}).
+    """
+    with trazas.span("estudio", match_id=match_id, origen="estudio") as raiz:
+        for seccion, datos in _iterar_datos_partido(match_id, raiz):
+            if seccion == "error": raiz.resultado, raiz.error = "error", datos.get("error")
+            yield seccion, datos
+
+def _iterar_datos_partido(match_id, raiz):
+    if not (match_id and match_id.isdigit()): yield "error", {"error": "ID de partido no válido."}; return
     driver = _get_selenium_driver()
-    if not driver: return {"error": "No se pudo inicializar el navegador."}
+    if not driver: yield "error", {"error": "No se pudo inicializar el navegador."}; return
     
-    session = _create_requests_session()
     all_data, start_time = {}, time.time()
     
     try:
-        driver.get(f"{BASE_URL}/match/h2h-{match_id}"); WebDriverWait(driver, SELENIUM_TIMEOUT_SECONDS).until(EC.presence_of_element_located((By.ID, "table_v1")))
-        for select_id in ["hSelect_1", "hSelect_2", "hSelect_3"]:
-            try: Select(WebDriverWait(driver, 2).until(EC.presence_of_element_located((By.ID, select_id)))).select_by_value("8"); time.sleep(0.1)
-            except TimeoutException: pass
-        soup = BeautifulSoup(driver.page_source, "lxml")
-
-        _, _, league_id, home_name, away_name = get_team_league_info_from_script_of(soup)
-        all_data.update({"home_name": home_name, "away_name": away_name})
+        # El espejo más rápido y sano; si no responde se pasa al siguiente
+        with trazas.span("navegar", padre=raiz):
+            espejos.navegar(driver, f"/match/h2h-{match_id}", "table_v1", SELENIUM_TIMEOUT_SECONDS)
+        with trazas.span("filtrar", padre=raiz):
+            for select_id in ["hSelect_1", "hSelect_2", "hSelect_3"]:
+                try: Select(WebDriverWait(driver, 2).until(EC.presence_of_element_located((By.ID, select_id)))).select_by_value("8"); time.sleep(0.1)
+                except TimeoutException: pass
+        with trazas.span("parsear", padre=raiz) as s:
+            pagina = leer_pagina_h2h_of(driver, s)
+        home_id, away_id, league_id, home_name, away_name, indice = (pagina[k] for k in ("home_id", "away_id", "league_id", "home_name", "away_name", "indice"))
+        main_odds, h2h_data = pagina["main_match_odds"], pagina["h2h"]
+        clasificacion = {k: pagina[k] for k in ("home_standings", "away_standings", "home_ou_stats", "away_ou_stats")}
+        # El H2H de rivales (col3) empieza a cargar ya en otra pestaña y se recoge al final
+        key_match_id_a, rival_a_id, _ = get_rival_h2h_info(indice, "table_v1", league_id)
+        _, rival_b_id, _ = get_rival_h2h_info(indice, "table_v2", league_id)
+        pestana_col3 = abrir_h2h_rivales_of(driver, key_match_id_a, rival_a_id, rival_b_id)
+        all_data.update({"match_id": match_id, "home_name": home_name, "away_name": away_name, "league_id": league_id, "final_score_raw": pagina["final_score_raw"]})
         
-        main_odds = extract_bet365_initial_odds_of(soup)
         main_odds['ah_linea'], main_odds['goals_linea'] = format_ah_as_decimal_string_of(main_odds.get('ah_linea_raw')), format_ah_as_decimal_string_of(main_odds.get('goals_linea_raw'))
         ah_num, goles_num = parse_ah_to_number_of(main_odds.get('ah_linea_raw')), parse_ah_to_number_of(main_odds.get('goals_linea_raw'))
         fav_name = away_name if ah_num is not None and ah_num < 0 else (home_name if ah_num is not None and ah_num > 0 else "Ninguno")
         all_data['main_match_odds'] = main_odds
-
-        key_match_id_a, rival_a_id, _ = get_rival_h2h_info(soup, "table_v1", league_id)
-        _, rival_b_id, _ = get_rival_h2h_info(soup, "table_v2", league_id)
-
-        with ThreadPoolExecutor(max_workers=8) as executor:
-            f_h_stand = executor.submit(extract_standings_data_from_h2h_page_of, soup, home_name)
-            f_a_stand = executor.submit(extract_standings_data_from_h2h_page_of, soup, away_name)
-            f_h_ou = executor.submit(extract_over_under_stats_from_div_of, soup, 'home')
-            f_a_ou = executor.submit(extract_over_under_stats_from_div_of, soup, 'away')
-            f_last_h = executor.submit(extract_last_match, soup, "table_v1", home_name, league_id, True)
-            f_last_a = executor.submit(extract_last_match, soup, "table_v2", away_name, league_id, False)
-            f_h2h = executor.submit(extract_h2h_data_of, soup, home_name, away_name)
-            f_h2h_col3 = executor.submit(get_h2h_details_for_original_logic_of, driver, key_match_id_a, rival_a_id, rival_b_id)
-            
-            last_home, last_away, h2h_data = f_last_h.result(), f_last_a.result(), f_h2h.result()
-            comp_L_vs_UV_A = extract_comparative_match_of(soup, "table_v1", home_name, (last_away or {}).get('home_team'), league_id)
-            comp_V_vs_UL_H = extract_comparative_match_of(soup, "table_v2", away_name, (last_home or {}).get('away_team'), league_id)
-            all_data.update({k: f.result() for k, f in {'home_standings': f_h_stand, 'away_standings': f_a_stand, 'home_ou_stats': f_h_ou, 'away_ou_stats': f_a_ou, 'h2h_col3_raw': f_h2h_col3}.items()})
-
-        partidos = {"last_home_match": last_home, "last_away_match": last_away, "h2h_col3": all_data.get('h2h_col3_raw') if all_data.get('h2h_col3_raw', {}).get('status') == 'found' else None, "comp_L_vs_UV_A": comp_L_vs_UV_A, "comp_V_vs_UL_H": comp_V_vs_UL_H, "h2h_stadium": h2h_data if h2h_data.get('res1') != '?:?' else None, "h2h_general": h2h_data if h2h_data.get('res6') != '?:?' else None}
-        
-        with ThreadPoolExecutor(max_workers=len(partidos)) as executor:
-            future_stats = {executor.submit(get_match_progression_stats_data, session, (v or {}).get('match_id')): k for k, v in partidos.items() if v}
-            for future in future_stats:
-                key, details = future_stats[future], partidos[future_stats[future]]
-                all_data[key] = {"details": details, "stats": future.result(), "analysis": analizar_precedente({"details": details}, ah_num, goles_num, fav_name, home_name)}
-        
-        for key in partidos.keys():
-            if key not in all_data: all_data[key] = {"details": None, "stats": None, "analysis": []}
-        
-        all_data['market_analysis_html'] = generar_analisis_completo_mercado(main_odds, h2h_data, home_name, away_name)
+        yield "cabecera", all_data
+
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            executor.submit(historial_local.guardar_indice, indice)
+
+            # Búsquedas O(1) en el índice: no merece la pena repartirlas en hilos
+            fecha = fecha_partido_of(match_id)
+            last_home = extract_last_match(indice, home_id, home_name, league_id, True, antes_de=fecha)
+            last_away = extract_last_match(indice, away_id, away_name, league_id, False, antes_de=fecha)
+            comp_L_vs_UV_A = extract_comparative_match_of(indice, home_id, (last_away or {}).get('home_id'), league_id, antes_de=fecha)
+            comp_V_vs_UL_H = extract_comparative_match_of(indice, away_id, (last_home or {}).get('away_id'), league_id, antes_de=fecha)
+            partidos = {"last_home_match": last_home, "last_away_match": last_away, "comp_L_vs_UV_A": comp_L_vs_UV_A, "comp_V_vs_UL_H": comp_V_vs_UL_H, "h2h_stadium": h2h_data if h2h_data.get('res1') != '?:?' else None, "h2h_general": h2h_data if h2h_data.get('res6') != '?:?' else None}
+            for key, details in partidos.items():
+                all_data[key] = {"details": details, "stats": None, "analysis": analizar_precedente({"details": details}, ah_num, goles_num, fav_name, home_name)} if details else _sin_precedente()
+            yield "precedentes", all_data
+
+            all_data['market_analysis_html'] = analisis_mercado_cacheado(main_odds, h2h_data, home_name, away_name)
+            all_data['movimiento_lineas'] = movimientos_cuotas.movimiento(match_id)
+            all_data['resumen_movimiento'] = movimientos_cuotas.resumen_movimiento(all_data['movimiento_lineas'])
+            yield "mercado", all_data
+
+            all_data.update(clasificacion)
+            yield "clasificacion", all_data
+
+            # Todas las estadísticas de progresión en una sola tanda asíncrona por el cliente HTTP compartido
+            with trazas.span("progresion", padre=raiz) as s:
+                stats = obtener_estadisticas_varias(details.get('match_id') for details in partidos.values() if details)
+                s.anotar(partidos=len(stats))
+            for key, details in partidos.items():
+                if details: all_data[key]["stats"] = stats.get(details.get('match_id'), pd.DataFrame(columns=['Casa', 'Fuera']))
+            yield "estadisticas", all_data
+
+        # El driver solo se usa desde este hilo; para entonces la pestaña suele estar ya cargada
+        with trazas.span("col3", padre=raiz) as s:
+            all_data['h2h_col3_raw'] = recoger_h2h_rivales_of(driver, pestana_col3, rival_a_id, rival_b_id)
+            s.resultado = all_data['h2h_col3_raw'].get('status', 'ok')
+
+        col3 = all_data['h2h_col3_raw'] if all_data['h2h_col3_raw'].get('status') == 'found' else None
+        all_data['h2h_col3'] = {"details": col3, "stats": obtener_estadisticas_progresion(col3.get('match_id')), "analysis": analizar_precedente({"details": col3}, ah_num, goles_num, fav_name, home_name)} if col3 else _sin_precedente()
+        yield "col3", all_data
+
+        # Arrays de precedentes para evaluar cualquier línea alternativa sin volver a scrapear
+        all_data['precedentes'] = precedentes_desde_estudio(all_data, home_name, away_name)
+        yield "completo", all_data
 
     except Exception as e:
         print(f"Error crítico durante el scraping para el ID {match_id}: {e}")
         traceback.print_exc()
-        return {"error": f"Ocurrió un error al procesar el partido: {e}"}
+        yield "error", {"error": f"Ocurrió un error al procesar el partido: {e} (traza {raiz.traza})"}
     finally:
         if driver: driver.quit()
         print(f"Análisis para ID {match_id} completado en {time.time() - start_time:.2f} segundos.")
-    return all_data
\ No newline at end of file
+
+def obtener_datos_completos_partido(match_id: str) -> dict:
+    # Se agota el generador: cortarlo en "completo" cerraría el span raíz como "cancelado"
+    resultado = None
+    for seccion, datos in iterar_datos_partido(match_id):
+        if seccion in ("completo", "error"): resultado = datos
+    return resultado
+
+# --- SUBCONJUNTO PARA EL CRIBADO DE LA JORNADA (modules/cribado.py) ---
+def datos_cribado(match_id: str) -> dict:
+    """
+    Solo lo que necesita el cribado: líneas iniciales, últimos partidos, H2H en el estadio y O/U.
+    Una carga de la página h2h, sin H2H de rivales ni estadísticas de progresión. Mismas claves que all_data.
+    """
+    if not (match_id and str(match_id).isdigit()): return {"error": "ID de partido no válido."}
+    if not (driver := _get_selenium_driver()): return {"error": "No se pudo inicializar el navegador."}
+    try:
+        with trazas.span("cribado", match_id=match_id, origen="cribado"):
+            with trazas.span("navegar"):
+                espejos.navegar(driver, f"/match/h2h-{match_id}", "table_v1", SELENIUM_TIMEOUT_SECONDS)
+            with trazas.span("filtrar"):
+                for select_id in ["hSelect_1", "hSelect_2"]:
+                    try: Select(WebDriverWait(driver, 2).until(EC.presence_of_element_located((By.ID, select_id)))).select_by_value("8"); time.sleep(0.1)
+                    except TimeoutException: pass
+            with trazas.span("parsear") as s:
+                pagina = leer_pagina_h2h_of(driver, s)
+            home_id, away_id, league_id, home_name, away_name, indice = (pagina[k] for k in ("home_id", "away_id", "league_id", "home_name", "away_name", "indice"))
+            main_odds, h2h_data = pagina["main_match_odds"], pagina["h2h"]
+            main_odds['ah_linea'], main_odds['goals_linea'] = format_ah_as_decimal_string_of(main_odds.get('ah_linea_raw')), format_ah_as_decimal_string_of(main_odds.get('goals_linea_raw'))
+            fecha = fecha_partido_of(match_id)
+            last_home = extract_last_match(indice, home_id, home_name, league_id, True, antes_de=fecha)
+            last_away = extract_last_match(indice, away_id, away_name, league_id, False, antes_de=fecha)
+            return {"match_id": match_id, "home_name": home_name, "away_name": away_name, "league_id": league_id, "final_score_raw": pagina["final_score_raw"],
+                    "main_match_odds": main_odds,
+                    "last_home_match": {"details": last_home} if last_home else _sin_precedente(),
+                    "last_away_match": {"details": last_away} if last_away else _sin_precedente(),
+                    "h2h_stadium": {"details": h2h_data} if h2h_data.get('res1') != '?:?' else _sin_precedente(),
+                    "home_ou_stats": pagina["home_ou_stats"], "away_ou_stats": pagina["away_ou_stats"]}
+    except Exception as e:
+        return {"error": f"{type(e).__name__}: {e}"}
+    finally:
+        driver.quit()
@@ -0,0 +1,159 @@
+# modules/evaluador_lineas.py
+"""
+Evaluador vectorizado (NumPy) de hándicap asiático y línea de goles.
+Evalúa N precedentes contra K líneas candidatas de una sola pasada, con la
+misma semántica que check_handicap_cover / check_goal_line_cover salvo en un caso:
+
+    check_handicap_cover busca por nombre al equipo al que apunta la línea (el local principal con
+    línea >= 0, el visitante con línea < 0) y, si no jugó el precedente, toma el margen del
+    visitante del precedente como si fuera el suyo. Aquí el rival que ocupa el lado del equipo
+    ausente hace de él (orientación de _orientacion), igual que en modules/backtest.
+
+Con los dos equipos principales en el precedente, o con el equipo al que apunta la línea presente,
+los resultados coinciden (tests/test_evaluador_lineas.py).
+"""
+import re
+import numpy as np
+
+from modules.lineas_ah import parse_ah
+
+# --- CÓDIGOS DE RESULTADO ---
+CUBIERTO, PUSH, NO_CUBIERTO, INDETERMINADO = 1, 0, -1, -2
+ETIQUETAS_AH = {CUBIERTO: "CUBIERTO", PUSH: "PUSH", NO_CUBIERTO: "NO CUBIERTO", INDETERMINADO: "indeterminado"}
+ETIQUETAS_GOLES = {CUBIERTO: "SUPERADA (Over)", PUSH: "PUSH (Igual)", NO_CUBIERTO: "NO SUPERADA (Under)", INDETERMINADO: "indeterminado"}
+
+# --- CÓDIGOS DE MOVIMIENTO DE LÍNEA (línea histórica -> candidata) ---
+MAS_FAVORITO, IGUAL, MENOS_FAVORITO = 1, 0, -1
+CAMBIO_FAVORITO, NUEVO_FAVORITO, SIN_FAVORITO = 2, 3, -3
+ETIQUETAS_MOVIMIENTO = {MAS_FAVORITO: "más favorito", IGUAL: "magnitud idéntica", MENOS_FAVORITO: "menos favorito",
+                        CAMBIO_FAVORITO: "cambio total de favoritismo", NUEVO_FAVORITO: "nuevo favorito", SIN_FAVORITO: "favorito eliminado",
+                        INDETERMINADO: "indeterminado"}
+
+# Mismo margen de tolerancia que check_handicap_cover
+TOLERANCIA_PUSH = 0.05
+LINEAS_AH_CANDIDATAS = np.round(np.arange(-3.0, 3.0001, 0.25), 2)
+LINEAS_GOLES_CANDIDATAS = np.round(np.arange(0.5, 5.0001, 0.25), 2)
+
+_RE_MARCADOR = re.compile(r'^\s*(\d+)\s*[-:*]\s*(\d+)')
+
+def parse_marcadores(marcadores):
+    """Convierte marcadores ('2-1', '2:1', '2*1') en dos arrays float; NaN si no son válidos."""
+    n = len(marcadores)
+    goles_h, goles_a = np.full(n, np.nan), np.full(n, np.nan)
+    for i, marcador in enumerate(marcadores):
+        if isinstance(marcador, str) and (m := _RE_MARCADOR.match(marcador)):
+            goles_h[i], goles_a[i] = float(m.group(1)), float(m.group(2))
+    return goles_h, goles_a
+
+def parse_lineas(lineas_raw):
+    """Convierte líneas en texto ('0/0.5', '-0.25', ...) a un array float; NaN si no se pueden leer."""
+    valores = [parse_ah(l) if isinstance(l, str) else l for l in lineas_raw]
+    return np.array([np.nan if v is None else v for v in valores], dtype=float)
+
+def _como_columna_de_lineas(lineas):
+    lineas = np.atleast_1d(np.asarray(lineas, dtype=float))
+    return lineas[None, :] if lineas.ndim == 1 else lineas
+
+def _clasificar(diferencia):
+    resultado = np.full(diferencia.shape, INDETERMINADO, dtype=np.int8)
+    valido = ~np.isnan(diferencia)
+    resultado[valido & (diferencia > TOLERANCIA_PUSH)] = CUBIERTO
+    resultado[valido & (diferencia < -TOLERANCIA_PUSH)] = NO_CUBIERTO
+    resultado[valido & (np.abs(diferencia) <= TOLERANCIA_PUSH)] = PUSH
+    return resultado
+
+def margen_referencia(goles_h, goles_a, orientacion):
+    """
+    Margen del equipo de referencia (el local del partido principal) en cada precedente.
+    orientacion: +1 si la referencia fue el local del precedente, -1 si fue el visitante, 0 si no participó.
+    """
+    goles_h, goles_a = np.asarray(goles_h, dtype=float), np.asarray(goles_a, dtype=float)
+    orientacion = np.asarray(orientacion, dtype=float)
+    return np.where(orientacion != 0, (goles_h - goles_a) * orientacion, np.nan)
+
+def evaluar_handicap(goles_h, goles_a, orientacion, lineas):
+    """
+    Matriz (precedentes x líneas) con CUBIERTO/PUSH/NO_CUBIERTO/INDETERMINADO.
+    Con línea > 0 el favorito es el local, con línea < 0 el visitante y con 0 se apuesta al local,
+    igual que en check_handicap_cover.
+    """
+    margen = margen_referencia(goles_h, goles_a, orientacion)[:, None]
+    lineas = _como_columna_de_lineas(lineas)
+    signo = np.where(lineas < 0, -1.0, 1.0)
+    return _clasificar(signo * (margen - lineas))
+
+def evaluar_handicap_historico(goles_h, goles_a, lineas_historicas):
+    """Resultado de cada precedente contra su propia línea (vector de longitud N, óptica del local del precedente)."""
+    lineas = np.asarray(lineas_historicas, dtype=float)[:, None]
+    return evaluar_handicap(goles_h, goles_a, np.ones(len(lineas)), lineas)[:, 0]
+
+def evaluar_goles(goles_h, goles_a, lineas):
+    """Matriz (precedentes x líneas de goles): CUBIERTO = Over, NO_CUBIERTO = Under, PUSH = igual."""
+    total = (np.asarray(goles_h, dtype=float) + np.asarray(goles_a, dtype=float))[:, None]
+    diferencia = total - _como_columna_de_lineas(lineas)
+    resultado = np.full(diferencia.shape, INDETERMINADO, dtype=np.int8)
+    valido = ~np.isnan(diferencia)
+    resultado[valido & (diferencia > 0)] = CUBIERTO
+    resultado[valido & (diferencia < 0)] = NO_CUBIERTO
+    resultado[valido & (diferencia == 0)] = PUSH
+    return resultado
+
+def clasificar_movimiento(lineas_historicas, orientacion, lineas):
+    """Matriz (precedentes x líneas) con el movimiento de la línea histórica a cada candidata, en la óptica de la referencia."""
+    historica = (np.asarray(lineas_historicas, dtype=float) * np.asarray(orientacion, dtype=float))[:, None]
+    historica = np.where(np.asarray(orientacion)[:, None] != 0, historica, np.nan)
+    lineas = _como_columna_de_lineas(lineas)
+    signo_h, signo_l = np.sign(historica), np.sign(lineas)
+    magnitud = np.sign(np.abs(lineas) - np.abs(historica))
+    resultado = np.full(np.broadcast(historica, lineas).shape, INDETERMINADO, dtype=np.int8)
+    valido = ~np.isnan(historica) & ~np.isnan(lineas)
+    mismo = valido & (signo_h == signo_l)
+    resultado[mismo] = np.broadcast_to(magnitud, resultado.shape)[mismo]
+    resultado[valido & (signo_h != signo_l) & (signo_h == 0)] = NUEVO_FAVORITO
+    resultado[valido & (signo_h != signo_l) & (signo_l == 0)] = SIN_FAVORITO
+    resultado[valido & (signo_h * signo_l < 0)] = CAMBIO_FAVORITO
+    return resultado
+
+def resumen_por_linea(resultados, lineas):
+    """Cuenta CUBIERTO/PUSH/NO_CUBIERTO por cada línea candidata: {línea: {código: n}}."""
+    lineas = np.atleast_1d(np.asarray(lineas, dtype=float))
+    return {float(linea): {codigo: int(np.count_nonzero(resultados[:, j] == codigo)) for codigo in (CUBIERTO, PUSH, NO_CUBIERTO)}
+            for j, linea in enumerate(lineas)}
+
+# --- CONSTRUCCIÓN DE ARRAYS A PARTIR DE UN ESTUDIO ---
+def _orientacion(home_prec, away_prec, home_name, away_name):
+    """+1 / -1 si el local principal (o quien ocupa su lado) fue el local / visitante del precedente; 0 si no se sabe."""
+    h, a = (home_prec or '').strip().lower(), (away_prec or '').strip().lower()
+    home_name, away_name = (home_name or '').strip().lower(), (away_name or '').strip().lower()
+    if home_name and home_name == h: return 1
+    if home_name and home_name == a: return -1
+    # El visitante principal ocupa el lado contrario al que ocuparía el local
+    if away_name and away_name == a: return 1
+    if away_name and away_name == h: return -1
+    return 0
+
+def _campos_precedente(clave, details):
+    if 'goles_home' in details:
+        return f"{details.get('goles_home')}-{details.get('goles_away')}", details.get('handicap'), details.get('h2h_home_team_name'), details.get('h2h_away_team_name')
+    if clave == 'h2h_stadium':
+        return details.get('res1_raw'), details.get('ah1'), None, None
+    if clave == 'h2h_general':
+        return details.get('res6_raw'), details.get('ah6'), details.get('h2h_gen_home'), details.get('h2h_gen_away')
+    return details.get('score_raw'), details.get('handicap_line_raw'), details.get('home_team'), details.get('away_team')
+
+def precedentes_desde_estudio(all_data, home_name, away_name):
+    """
+    Arrays de precedentes a partir del diccionario de obtener_datos_completos_partido, listos para
+    evaluar cualquier línea sin volver a scrapear.
+    """
+    claves, marcadores, lineas_raw, orientaciones = [], [], [], []
+    for clave in ("last_home_match", "last_away_match", "h2h_col3", "comp_L_vs_UV_A", "comp_V_vs_UL_H", "h2h_stadium", "h2h_general"):
+        details = (all_data.get(clave) or {}).get('details')
+        if not isinstance(details, dict): continue
+        marcador, ah_raw, home_prec, away_prec = _campos_precedente(clave, details)
+        claves.append(clave); marcadores.append(marcador); lineas_raw.append(ah_raw)
+        # En el H2H del estadio el local principal jugó siempre en casa
+        orientaciones.append(1 if clave == 'h2h_stadium' else _orientacion(home_prec, away_prec, home_name, away_name))
+    goles_h, goles_a = parse_marcadores(marcadores)
+    return {"claves": claves, "goles_h": goles_h, "goles_a": goles_a,
+            "ah_historico": parse_lineas(lineas_raw), "orientacion": np.array(orientaciones, dtype=np.int8)}
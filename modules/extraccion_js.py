@@ -0,0 +1,173 @@
+# modules/extraccion_js.py
+"""
+Extracción dentro del navegador: un script inyectado recorre la página ya cargada y devuelve un
+JSON compacto (unos KB) con lo que se lee de ella, en vez de pasar por WebDriver/Playwright el DOM
+serializado entero (varios MB) y volver a parsearlo en Python.
+
+    página h2h   info     _matchInfo (IDs, nombres, liga)
+                 tablas   filas de table_v1/v2/v3: atributos index/name/vs, IDs de equipo del onclick,
+                          nombres, marcador, línea AH y fecha
+                 cuotas   fila earlyOdds de Bet365 (o su alternativa): AH y goles iniciales
+                 marcador #mScore; clasificacion porletP4 y tablas de resumen; ou barras O/U
+    portada      filas tr1_ con hora, equipos, cuotas y liga
+
+Las funciones de abajo convierten ese JSON a los mismos formatos que los parseos de siempre
+(registros de carga_js, tuplas de IDs...). Si el script falla o falta algo esencial devuelven None
+y el llamante lee page_source como antes. Está desactivada por defecto: se activa con
+MASIVO_EXTRACCION=js cuando tests/test_extraccion_js.py pasa con un navegador de verdad sobre las
+páginas guardadas (sin navegador ese test se salta y el script queda sin comprobar).
+"""
+import json
+import os
+import re
+
+from modules.carga_js import _fecha_ddmmyyyy
+
+ACTIVA = os.environ.get("MASIVO_EXTRACCION", "html") == "js"
+_RE_MARCADOR = re.compile(r"(\d+)\s*-\s*(\d+)")
+
+# --- SCRIPTS ---
+# Mismos criterios que los parseos de BeautifulSoup: celdas td (también anidadas), ids tr1_\d+...
+FUNCION_H2H = r"""() => {
+    const texto = n => n ? n.textContent.trim() : "";
+    const linea = td => td ? ((td.getAttribute("data-o") || td.textContent).trim()) : "";
+    const equipo = a => { const m = /team\((\d+)\)/.exec(a.getAttribute("onclick") || ""); return m ? m[1] : null; };
+    const tablas = {};
+    for (const t of [1, 2, 3]) {
+        const tabla = document.getElementById("table_v" + t);
+        if (!tabla) continue;
+        const patron = new RegExp("tr" + t + "_\\d+");
+        tablas["table_v" + t] = [...tabla.getElementsByTagName("tr")].filter(tr => patron.test(tr.id)).map(tr => {
+            const td = tr.getElementsByTagName("td"), enlaces = [...tr.querySelectorAll("a[onclick]")].slice(0, 2);
+            const marcador = td[3] ? [...td[3].getElementsByTagName("span")].find(s => s.className.includes("fscore_" + t)) : null;
+            const fecha = td[1] ? td[1].querySelector("span[name='timeData']") : null;
+            return {index: tr.getAttribute("index"), name: tr.getAttribute("name"), vs: tr.getAttribute("vs"), celdas: td.length,
+                    ids: enlaces.map(equipo), nombres: enlaces.map(texto),
+                    local: td[2] ? texto(td[2].querySelector("a") || td[2]) : "", visitante: td[4] ? texto(td[4].querySelector("a") || td[4]) : "",
+                    marcador: marcador ? texto(marcador) : null, celda_marcador: texto(td[3]), ah: linea(td[11]), fecha: texto(fecha)};
+        });
+    }
+    let cuotas = null;
+    for (const casa of ["8", "31"]) {
+        const tr = document.getElementById("tr_o_1_" + casa);
+        if (tr && tr.getAttribute("name") === "earlyOdds" && tr.getElementsByTagName("td").length > 9) {
+            const td = tr.getElementsByTagName("td"); cuotas = {casa, ah: linea(td[3]), goles: linea(td[9])}; break;
+        }
+    }
+    const filas = tabla => tabla ? [...tabla.getElementsByTagName("tr")].map(tr => ({centro: tr.getAttribute("align") === "center",
+        th: tr.querySelector("th") ? texto(tr.querySelector("th")) : null, td: [...tr.getElementsByTagName("td")].map(texto)})) : null;
+    const porlet = document.getElementById("porletP4"), clasificacion = {};
+    for (const lado of ["home", "guest"]) {
+        const div = porlet ? porlet.querySelector("div." + lado + "-div") : null;
+        if (div) { const tabla = div.querySelector("table"), enlace = tabla ? tabla.querySelector("a") : null;
+                   clasificacion[lado] = {clases: [...div.classList], texto: texto(div).toLowerCase(), enlace: enlace ? texto(enlace) : null, filas: filas(tabla)}; }
+    }
+    const ou = {};
+    for (const id of ["table_v1", "table_v2"]) {
+        const barra = document.querySelector("#" + id + " ul.y-bar");
+        const grupo = barra ? [...barra.querySelectorAll("li.group")].find(li => li.textContent.includes("Over/Under Odds")) : null;
+        if (grupo) ou[id] = {titulo: texto(grupo.querySelector("div.tit")), valores: [...grupo.querySelectorAll("span.value")].map(texto)};
+    }
+    let info = null;
+    if (typeof _matchInfo === "object" && _matchInfo) info = Object.fromEntries(["hId", "gId", "sclassId", "hName", "gName", "lName"].map(k => [k, _matchInfo[k] == null ? null : String(_matchInfo[k])]));
+    return JSON.stringify({info, tablas, cuotas, ou, clasificacion,
+        marcador: [...document.querySelectorAll("#mScore .end .score")].map(texto),
+        resumen: {home: filas(document.querySelector("table.team-table-home")), guest: filas(document.querySelector("table.team-table-guest"))}});
+}"""
+
+FUNCION_PORTADA = r"""() => JSON.stringify([...document.querySelectorAll("tr[id^='tr1_']")].map(tr => {
+    const id = tr.id.replace("tr1_", ""), hora = tr.querySelector("td[name='timeData']"), primera = tr.querySelector("td");
+    const local = tr.querySelector(`a[id='team1_${id}']`), visitante = tr.querySelector(`a[id='team2_${id}']`);
+    return {id, data_t: hora ? hora.getAttribute("data-t") : null, local: local ? local.textContent.trim() : null,
+            visitante: visitante ? visitante.textContent.trim() : null, odds: tr.getAttribute("odds") || "",
+            liga: primera && primera !== hora ? primera.textContent.trim() : null};
+}))"""
+
+def _leer(texto):
+    try: return json.loads(texto)
+    except (TypeError, ValueError): return None
+
+def extraer(driver):
+    """JSON de la página h2h cargada en `driver` (con su tamaño en "bytes"), o None si no se puede o no trae table_v1."""
+    from selenium.common.exceptions import WebDriverException
+    try: texto = driver.execute_script(f"return ({FUNCION_H2H})();")
+    except WebDriverException: return None
+    if not isinstance(datos := _leer(texto), dict) or "table_v1" not in datos.get("tablas", {}): return None
+    datos["bytes"] = len(texto)
+    return datos
+
+async def portada_async(page):
+    """Filas de la portada cargada en una página de Playwright, o None si el script falla."""
+    from playwright.async_api import Error as PlaywrightError
+    try: return _leer(await page.evaluate(FUNCION_PORTADA))
+    except PlaywrightError: return None
+
+# --- CONVERSIÓN A LOS FORMATOS DE SIEMPRE ---
+def _id(valor):
+    return valor if isinstance(valor, str) and valor.isdigit() else None
+
+def info_partido(datos):
+    """(home_id, away_id, league_id, home_name, away_name, league_name) como carga_js.info_partido, o None."""
+    if not (info := datos.get("info")) or not all(_id(info.get(k)) for k in ("hId", "gId", "sclassId")): return None
+    return info["hId"], info["gId"], info["sclassId"], info.get("hName") or None, info.get("gName") or None, info.get("lName") or None
+
+def _registro(fila):
+    """Registro con el formato de carga_js.historial a partir de una fila de tablas (None si no tiene 12 celdas o index)."""
+    if fila["celdas"] < 12 or not fila.get("index"): return None
+    ids = fila["ids"] + [None] * (2 - len(fila["ids"]))
+    m = _RE_MARCADOR.search(fila["marcador"] if fila["marcador"] is not None else fila["celda_marcador"])
+    return {"fecha": _fecha_ddmmyyyy(fila["fecha"]) or fila["fecha"], "league_id": fila.get("name"), "home_id": _id(ids[0]), "away_id": _id(ids[1]),
+            "home": fila["local"], "away": fila["visitante"], "score_raw": f"{m[1]}-{m[2]}" if m else "?-?", "ah_raw": fila["ah"],
+            "match_id": fila["index"], "vs": fila.get("vs") == "1"}
+
+def historial(datos):
+    """{table_id: [registro, ...]} de las tablas que haya, listo para IndiceEquipos.desde_registros."""
+    return {table_id: [r for f in filas if (r := _registro(f))] for table_id, filas in datos.get("tablas", {}).items()}
+
+def cuotas_iniciales(datos):
+    """(ah_raw, goles_raw) iniciales de Bet365 (o su alternativa), o None."""
+    return (cuotas["ah"], cuotas["goles"]) if (cuotas := datos.get("cuotas")) else None
+
+def marcador_final(datos, separador="-"):
+    marcador = datos.get("marcador") or []
+    return separador.join(marcador) if len(marcador) == 2 and all(s.isdigit() for s in marcador) else f"?{separador}?"
+
+def over_under(datos, team_type):
+    """Igual que extract_over_under_stats_from_div_of, desde las barras O/U del JSON."""
+    default = {"total": 0, "over_pct": 0, "under_pct": 0, "push_pct": 0}
+    if not (grupo := datos.get("ou", {}).get("table_v1" if team_type == 'home' else "table_v2")): return default
+    try:
+        total = int(re.search(r'\((\d+)', grupo["titulo"]).group(1))
+        vals = [float(v.strip('%')) for v in grupo["valores"]]
+        return {"over_pct": vals[0], "push_pct": vals[1], "under_pct": vals[2], "total": total} if len(vals) == 3 else default
+    except (ValueError, TypeError, AttributeError): return default
+
+def clasificacion(datos, team_name):
+    """Igual que extract_standings_data_from_h2h_page_of, desde porletP4 del JSON."""
+    data = {"name": team_name, "ranking": "N/A"}
+    lados = datos.get("clasificacion") or {}
+    lado = "home" if team_name.lower() in lados.get("home", {}).get("texto", "") else ("guest" if team_name.lower() in lados.get("guest", {}).get("texto", "") else None)
+    if not lado or lados[lado]["filas"] is None: return data
+    # Mismo criterio que la versión del DOM: la clase "home" del div
+    is_home = "home" in lados[lado]["clases"]
+    data["specific_type"] = "Est. como Local" if is_home else "Est. como Visitante"
+    if (enlace := lados[lado]["enlace"]) and (m := re.search(r'\[.*?-(\d+)\]', enlace)): data["ranking"] = m.group(1)
+    ft_section = False
+    for fila in lados[lado]["filas"]:
+        if not fila["centro"]: continue
+        if fila["th"] is not None: ft_section = "FT" in fila["th"]; continue
+        if ft_section and len(cells := fila["td"]) >= 7:
+            prefix = "total" if cells[0] == "Total" else "specific" if cells[0] == ("Home" if is_home else "Away") else None
+            if prefix: data.update({f"{prefix}_{k}": v for k, v in zip(["pj", "v", "e", "d", "gf", "gc"], cells[1:7])})
+    return data
+
+def filas_resumen(datos, lado):
+    """Celdas td de cada fila de table.team-table-home / -guest (lado 'home' o 'guest'), o None."""
+    return [f["td"] for f in filas] if (filas := (datos.get("resumen") or {}).get(lado)) is not None else None
+
+def fila_rivales(datos, rival_a_id, rival_b_id):
+    """Primera fila de table_v2 entre los dos rivales con marcador (span fscore_2), o None."""
+    for fila in datos.get("tablas", {}).get("table_v2", []):
+        if len(fila["ids"]) == 2 and all(fila["ids"]) and set(fila["ids"]) == {str(rival_a_id), str(rival_b_id)}:
+            if fila["marcador"] and "-" in fila["marcador"]: return fila
+    return None
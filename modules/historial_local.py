@@ -0,0 +1,104 @@
+# modules/historial_local.py
+"""
+Almacén local (SQLite) de todos los partidos terminados que aparecen en table_v1/v2/v3.
+Cada fila se guarda una sola vez por su `index` de partido (upsert) a medida que se scrapea,
+y sirve para responder último partido, comparativas y H2H cuando la página llega incompleta.
+
+La ruta se configura con MASIVO_HISTORIAL_DB (por defecto <MASIVO_DATA_DIR>/historial.sqlite).
+"""
+import os
+import re
+import sqlite3
+
+from modules.cache_local import DIRECTORIO_DATOS, conexion_sqlite
+
+RUTA_HISTORIAL = os.environ.get("MASIVO_HISTORIAL_DB", os.path.join(DIRECTORIO_DATOS, "historial.sqlite"))
+
+_ESQUEMA = """
+CREATE TABLE IF NOT EXISTS partidos (
+    match_index TEXT PRIMARY KEY,
+    home_id TEXT, away_id TEXT,
+    home_team TEXT, away_team TEXT,
+    league_id TEXT,
+    fecha TEXT,            -- dd-mm-aaaa, tal cual aparece en la web
+    fecha_orden TEXT,      -- aaaa-mm-dd, para ordenar
+    score_raw TEXT,
+    ah_raw TEXT,
+    actualizado REAL DEFAULT (julianday('now'))
+);
+CREATE INDEX IF NOT EXISTS ix_partidos_home ON partidos (home_id, league_id, fecha_orden);
+CREATE INDEX IF NOT EXISTS ix_partidos_away ON partidos (away_id, league_id, fecha_orden);
+CREATE INDEX IF NOT EXISTS ix_partidos_liga ON partidos (league_id, fecha_orden);
+"""
+# Un dato ausente en una fila nueva no borra el que ya se tenía
+_UPSERT = """
+INSERT INTO partidos (match_index, home_id, away_id, home_team, away_team, league_id, fecha, fecha_orden, score_raw, ah_raw)
+VALUES (:match_index, :home_id, :away_id, :home_team, :away_team, :league_id, :fecha, :fecha_orden, :score_raw, :ah_raw)
+ON CONFLICT(match_index) DO UPDATE SET
+    home_id = COALESCE(excluded.home_id, home_id), away_id = COALESCE(excluded.away_id, away_id),
+    home_team = COALESCE(excluded.home_team, home_team), away_team = COALESCE(excluded.away_team, away_team),
+    league_id = COALESCE(excluded.league_id, league_id), fecha = COALESCE(excluded.fecha, fecha),
+    fecha_orden = COALESCE(excluded.fecha_orden, fecha_orden), score_raw = COALESCE(excluded.score_raw, score_raw),
+    ah_raw = COALESCE(excluded.ah_raw, ah_raw), actualizado = julianday('now')
+"""
+_RE_FECHA = re.compile(r'(\d{2})-(\d{2})-(\d{4})')
+
+def _conexion(ruta=None):
+    return conexion_sqlite(ruta or RUTA_HISTORIAL, _ESQUEMA)
+
+def _vacio(valor):
+    return None if valor in (None, '', '-', '?', '?-?', 'N/A') else valor
+
+def _registro(d):
+    """Normaliza los detalles de fila de estudio_scraper (home_team, match_id...) y de Scraper.py (home, matchIndex...)."""
+    fecha = _vacio(d.get('date'))
+    m = _RE_FECHA.search(fecha or '')
+    return {"match_index": d.get('match_id') or d.get('matchIndex'), "home_id": d.get('home_id'), "away_id": d.get('away_id'),
+            "home_team": _vacio(d.get('home_team') or d.get('home')), "away_team": _vacio(d.get('away_team') or d.get('away')),
+            "league_id": _vacio(d.get('league_id_hist')), "fecha": fecha, "fecha_orden": f"{m[3]}-{m[2]}-{m[1]}" if m else None,
+            "score_raw": _vacio(d.get('score_raw')), "ah_raw": _vacio(d.get('handicap_line_raw') or d.get('ahLine_raw'))}
+
+def guardar_filas(filas, ruta=None):
+    """Upsert de filas de historial; devuelve cuántas se escribieron. Un fallo del almacén nunca corta el scraping."""
+    registros = [r for r in map(_registro, filas) if r["match_index"]]
+    if not registros: return 0
+    try:
+        with _conexion(ruta) as con: con.executemany(_UPSERT, registros)
+        return len(registros)
+    except sqlite3.Error: return 0
+
+def guardar_indice(indice, ruta=None):
+    return guardar_filas(indice.filas, ruta)
+
+# --- CONSULTAS (formato de filas de estudio_scraper) ---
+def _detalles(fila):
+    score_raw = fila["score_raw"] or '?-?'
+    return {'home_team': fila["home_team"] or '', 'away_team': fila["away_team"] or '', 'score': score_raw.replace('-', ':'), 'score_raw': score_raw,
+            'handicap_line_raw': fila["ah_raw"] or '-', 'match_id': fila["match_index"], 'league_id_hist': fila["league_id"],
+            'date': fila["fecha"] or '', 'home_id': fila["home_id"], 'away_id': fila["away_id"], 'origen': 'historial'}
+
+def _consultar(sql, parametros, ruta=None):
+    try: return [_detalles(f) for f in _conexion(ruta).execute(sql, parametros).fetchall()]
+    except sqlite3.Error: return []
+
+def ultimo_partido(team_id, venue, league_id=None, antes_de=None, ruta=None):
+    """Último partido del equipo como 'home' o 'away' (opcionalmente en una liga y anterior a una fecha aaaa-mm-dd)."""
+    if not team_id: return None
+    columna = "home_id" if venue == 'home' else "away_id"
+    sql = f"SELECT * FROM partidos WHERE {columna} = ? AND (? IS NULL OR league_id = ?) AND (? IS NULL OR fecha_orden < ?) ORDER BY fecha_orden DESC LIMIT 1"
+    league_id = str(league_id) if league_id else None
+    filas = _consultar(sql, (str(team_id), league_id, league_id, antes_de, antes_de), ruta)
+    return filas[0] if filas else None
+
+def enfrentamientos(team_id, rival_id, league_id=None, limite=10, antes_de=None, ruta=None):
+    """Partidos entre ambos equipos (en cualquier localía, opcionalmente anteriores a una fecha aaaa-mm-dd), del más reciente al más antiguo."""
+    if not (team_id and rival_id): return []
+    league_id = str(league_id) if league_id else None
+    sql = ("SELECT * FROM partidos WHERE ((home_id = ? AND away_id = ?) OR (home_id = ? AND away_id = ?)) "
+           "AND (? IS NULL OR league_id = ?) AND (? IS NULL OR fecha_orden < ?) ORDER BY fecha_orden DESC LIMIT ?")
+    return _consultar(sql, (str(team_id), str(rival_id), str(rival_id), str(team_id), league_id, league_id, antes_de, antes_de, limite), ruta)
+
+def comparativa(team_id, rival_id, league_id=None, antes_de=None, ruta=None):
+    """Mismo contrato que IndiceEquipos.comparativa: último enfrentamiento con la localía del primero."""
+    if not (filas := enfrentamientos(team_id, rival_id, league_id, limite=1, antes_de=antes_de, ruta=ruta)): return None
+    return dict(filas[0], localia='H' if filas[0]['home_id'] == str(team_id) else 'A')
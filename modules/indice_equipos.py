@@ -0,0 +1,110 @@
+# modules/indice_equipos.py
+"""
+Índice de las filas de table_v1/v2/v3 por ID de equipo.
+Los IDs se parsean una sola vez por fila (onclick="team(123)") y las consultas de último partido,
+comparativas y filas 'vs' pasan a ser búsquedas O(1) en diccionarios, sin comparar subcadenas de nombres.
+"""
+import re
+import unicodedata
+from collections import defaultdict
+
+_RE_EQUIPO = re.compile(r"team\((\d+)\)")
+TABLAS_HISTORIAL = {"table_v1": "fscore_1", "table_v2": "fscore_2", "table_v3": "fscore_3"}
+
+def normalizar_nombre(nombre):
+    """Minúsculas, sin acentos y con espacios colapsados: 'Atlético  Madrid' -> 'atletico madrid'."""
+    if not nombre: return ''
+    sin_acentos = unicodedata.normalize('NFKD', nombre).encode('ascii', 'ignore').decode('ascii')
+    return ' '.join(sin_acentos.lower().split())
+
+def _parse_date_ddmmyyyy(d):
+    m = re.search(r'(\d{2})-(\d{2})-(\d{4})', d or ''); return (int(m[3]), int(m[2]), int(m[1])) if m else (1900, 1, 1)
+
+def equipos_de_fila(row):
+    """(home_id, away_id, home_name, away_name) a partir de los enlaces onclick de una fila."""
+    links = row.find_all("a", onclick=True)
+    ids = [(m.group(1) if (m := _RE_EQUIPO.search(a.get("onclick", ""))) else None) for a in links[:2]]
+    nombres = [a.get_text(strip=True) for a in links[:2]]
+    ids += [None] * (2 - len(ids)); nombres += [None] * (2 - len(nombres))
+    return ids[0], ids[1], nombres[0], nombres[1]
+
+class IndiceEquipos:
+    def __init__(self):
+        self.filas = []
+        self._vistos = set()
+        self._por_equipo = defaultdict(list)   # (team_id, 'home'|'away', league_id|None) -> filas
+        self._por_pareja = defaultdict(list)   # (frozenset({id_a, id_b}), league_id|None) -> filas
+        self._filas_vs = defaultdict(list)     # table_id -> filas con vs="1", en orden del documento
+        self._alias = {}                       # nombre normalizado -> team_id (None si es ambiguo)
+
+    @classmethod
+    def desde_soup(cls, soup, parser_fila, tablas=TABLAS_HISTORIAL):
+        """Construye el índice con parser_fila(row, score_class) -> dict de detalles (o None)."""
+        indice = cls()
+        for table_id, score_class in tablas.items():
+            if not (table := soup.find("table", id=table_id)): continue
+            for row in table.find_all("tr", id=re.compile(rf"tr{table_id[-1]}_\d+")):
+                if details := parser_fila(row, score_class):
+                    indice.agregar(table_id, row, details)
+        indice.ordenar()
+        return indice
+
+    @classmethod
+    def desde_registros(cls, tablas, parser_registro):
+        """Igual que desde_soup pero con los registros de carga_js.historial: {table_id: [registro, ...]}."""
+        indice = cls()
+        for table_id, registros in tablas.items():
+            for r in registros:
+                if details := parser_registro(r, table_id):
+                    indice._agregar(table_id, details, r["home_id"], r["away_id"], r["home"], r["away"], r["vs"], r["match_id"], r["league_id"])
+        indice.ordenar()
+        return indice
+
+    def agregar(self, table_id, row, details):
+        home_id, away_id, home_name, away_name = equipos_de_fila(row)
+        self._agregar(table_id, details, home_id, away_id, home_name, away_name, row.get("vs") == "1", row.get("index") or id(row), row.get("name"))
+
+    def _agregar(self, table_id, details, home_id, away_id, home_name, away_name, vs, clave_partido, league_id):
+        registro = dict(details, home_id=home_id, away_id=away_id, tabla=table_id)
+        if vs: self._filas_vs[table_id].append(registro)
+        for nombre, team_id in ((home_name, home_id), (away_name, away_id)):
+            if team_id and (clave := normalizar_nombre(nombre)):
+                self._alias[clave] = team_id if self._alias.get(clave, team_id) == team_id else None
+        # Un mismo partido aparece en varias tablas: se indexa una sola vez
+        if clave_partido in self._vistos: return
+        self._vistos.add(clave_partido)
+        self.filas.append(registro)
+        ligas = (league_id, None) if league_id else (None,)
+        for team_id, venue in ((home_id, 'home'), (away_id, 'away')):
+            if team_id:
+                for liga in ligas: self._por_equipo[(team_id, venue, liga)].append(registro)
+        if home_id and away_id:
+            pareja = frozenset((home_id, away_id))
+            for liga in ligas: self._por_pareja[(pareja, liga)].append(registro)
+
+    def ordenar(self):
+        """Ordena cada lista por fecha descendente (estable: a igualdad de fecha se respeta el documento)."""
+        for filas in (*self._por_equipo.values(), *self._por_pareja.values()):
+            filas.sort(key=lambda d: _parse_date_ddmmyyyy(d.get('date')), reverse=True)
+
+    # --- CONSULTAS ---
+    def id_de_nombre(self, nombre):
+        return self._alias.get(normalizar_nombre(nombre))
+
+    def ultimo(self, team_id, venue, league_id=None):
+        """Último partido del equipo como local ('home') o visitante ('away'), opcionalmente en una liga."""
+        filas = self._por_equipo.get((team_id, venue, str(league_id) if league_id else None))
+        return filas[0] if filas else None
+
+    def comparativa(self, team_id, rival_id, league_id=None):
+        """Partido más reciente entre ambos equipos, con la localía del primero ('H'/'A')."""
+        if not (team_id and rival_id): return None
+        filas = self._por_pareja.get((frozenset((team_id, rival_id)), str(league_id) if league_id else None))
+        if not filas: return None
+        return dict(filas[0], localia='H' if filas[0].get('home_id') == team_id else 'A')
+
+    def primera_fila_vs(self, table_id, league_id=None):
+        """Primera fila vs="1" de la tabla (en orden del documento), opcionalmente filtrada por liga."""
+        for registro in self._filas_vs.get(table_id, []):
+            if not league_id or registro.get('league_id_hist') == str(league_id): return registro
+        return None
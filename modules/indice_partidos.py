@@ -0,0 +1,93 @@
+# modules/indice_partidos.py
+"""
+Lista de próximos partidos indexada en columnas, para paginar y filtrar sin volver a scrapear
+ni recorrer la lista entera. Se construye una vez por refresco de la portada:
+
+    columnas numpy   inicio (timestamp UTC), ah y goles (NaN si no hay línea), liga (código)
+    índices          posiciones ordenadas por inicio, por AH y por goles (búsqueda binaria de rangos)
+                     y liga -> posiciones
+
+Un filtro usa el rango más selectivo para sacar candidatos con searchsorted y aplica el resto con
+máscaras vectorizadas. La paginación es por cursor (inicio e ID del último partido devuelto), así
+que sigue siendo válida aunque la lista se reconstruya entre una página y otra.
+"""
+import base64
+import datetime
+
+import numpy as np
+
+from modules.lineas_ah import parse_ah
+
+def _timestamp(hora):
+    try: return datetime.datetime.strptime(hora, '%Y-%m-%d %H:%M').replace(tzinfo=datetime.timezone.utc).timestamp()
+    except (TypeError, ValueError): return np.nan
+
+def _numero(linea):
+    return np.nan if (valor := parse_ah(linea)) is None else valor
+
+def codificar_cursor(inicio, match_id):
+    return base64.urlsafe_b64encode(f"{inicio:.0f}|{match_id}".encode()).decode().rstrip("=")
+
+def decodificar_cursor(cursor):
+    """(inicio, match_id) o None si el cursor no es válido."""
+    try:
+        inicio, match_id = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode().split("|", 1)
+        return float(inicio), match_id
+    except (ValueError, UnicodeDecodeError): return None
+
+class IndicePartidos:
+    def __init__(self, matches):
+        # Orden canónico: por comienzo y, a igualdad, por ID (el mismo que usan los cursores)
+        matches = sorted(matches, key=lambda m: (_timestamp(m.get('time')), str(m.get('id'))))
+        self.partidos = matches
+        self.ids = np.array([str(m.get('id')) for m in matches], dtype=object)
+        self.inicio = np.array([_timestamp(m.get('time')) for m in matches], dtype=np.float64)
+        self.ah = np.array([_numero(m.get('handicap')) for m in matches], dtype=np.float64)
+        self.goles = np.array([_numero(m.get('goal_line')) for m in matches], dtype=np.float64)
+        self.ligas = sorted({m.get('league') or '' for m in matches})
+        codigos = {liga: i for i, liga in enumerate(self.ligas)}
+        self.liga = np.array([codigos[m.get('league') or ''] for m in matches], dtype=np.int32)
+        # Índices ordenados (los NaN quedan al final y nunca entran en un rango)
+        self._orden = {c: np.argsort(getattr(self, c), kind="stable") for c in ("inicio", "ah", "goles")}
+        self._ordenados = {c: getattr(self, c)[o] for c, o in self._orden.items()}
+        self._por_liga = {liga: np.flatnonzero(self.liga == i) for i, liga in enumerate(self.ligas)}
+
+    def __len__(self):
+        return len(self.partidos)
+
+    def _rango(self, columna, minimo, maximo):
+        """Posiciones con minimo <= valor <= maximo (cualquiera de los dos puede ser None)."""
+        valores = self._ordenados[columna]
+        izquierda = 0 if minimo is None else np.searchsorted(valores, minimo, side="left")
+        derecha = np.searchsorted(valores, np.inf, side="right") if maximo is None else np.searchsorted(valores, maximo, side="right")
+        return self._orden[columna][izquierda:derecha]
+
+    def filtrar(self, ah_min=None, ah_max=None, goles_min=None, goles_max=None, desde=None, hasta=None, liga=None, con_handicap=False):
+        """Posiciones (en orden de comienzo) de los partidos que cumplen todos los filtros."""
+        rangos = {c: (lo, hi) for c, lo, hi in (("inicio", desde, hasta), ("ah", ah_min, ah_max), ("goles", goles_min, goles_max)) if lo is not None or hi is not None}
+        if con_handicap and "ah" not in rangos: rangos["ah"] = (None, None)
+        candidatos = self._por_liga.get(liga, np.empty(0, dtype=np.int64)) if liga is not None else None
+        # Se parte del conjunto más pequeño y se comprueba el resto con máscaras
+        for columna, (lo, hi) in sorted(rangos.items(), key=lambda kv: len(self._rango(kv[0], *kv[1]))):
+            if candidatos is None:
+                candidatos = self._rango(columna, lo, hi); continue
+            valores = getattr(self, columna)[candidatos]
+            mascara = ~np.isnan(valores)
+            if lo is not None: mascara &= valores >= lo
+            if hi is not None: mascara &= valores <= hi
+            candidatos = candidatos[mascara]
+        return np.arange(len(self)) if candidatos is None else np.sort(candidatos)
+
+    def pagina(self, posiciones, limite, cursor=None):
+        """(partidos, cursor siguiente o None) a partir del cursor de la página anterior."""
+        if cursor and (clave := decodificar_cursor(cursor)):
+            inicio, match_id = clave
+            inicios = self.inicio[posiciones]
+            # Primer partido posterior a (inicio, id) en el orden canónico
+            desde = np.searchsorted(inicios, inicio, side="left")
+            while desde < len(posiciones) and inicios[desde] == inicio and self.ids[posiciones[desde]] <= match_id: desde += 1
+            posiciones = posiciones[desde:]
+        elegidas = posiciones[:max(0, limite)]
+        # Sin partidos en la página no hay cursor desde el que seguir
+        siguiente = codificar_cursor(self.inicio[elegidas[-1]], self.ids[elegidas[-1]]) if len(elegidas) and len(posiciones) > len(elegidas) else None
+        return [self.partidos[i] for i in elegidas], siguiente
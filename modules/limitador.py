@@ -0,0 +1,120 @@
+# modules/limitador.py
+"""
+Limitador de peticiones por host (token bucket) compartido entre procesos mediante SQLite:
+el Scraper masivo, la app y estudio.py consultan el mismo cubo antes de cada descarga o
+navegación del navegador. Si sube la tasa de errores o el host responde 429/503, la tasa
+sostenida se reduce (back-off) y se recupera poco a poco con las respuestas correctas.
+
+Configuración: MASIVO_TASA_SOSTENIDA (peticiones/s por host), MASIVO_RAFAGA (tamaño del cubo),
+MASIVO_LIMITADOR_DB (por defecto <MASIVO_DATA_DIR>/limitador.sqlite).
+"""
+import asyncio
+import os
+import sqlite3
+import time
+from urllib.parse import urlsplit
+
+from modules.cache_local import DIRECTORIO_DATOS, conexion_sqlite
+
+TASA_SOSTENIDA = float(os.environ.get("MASIVO_TASA_SOSTENIDA", "1.0"))
+RAFAGA = float(os.environ.get("MASIVO_RAFAGA", "4"))
+RUTA_LIMITADOR = os.environ.get("MASIVO_LIMITADOR_DB", os.path.join(DIRECTORIO_DATOS, "limitador.sqlite"))
+
+FACTOR_MINIMO = 0.1           # la tasa nunca baja del 10% de la configurada
+ALFA_ERRORES = 0.2            # peso de la última respuesta en la media móvil de errores
+UMBRAL_ERRORES = 0.2          # por encima de esta tasa de errores se frena
+RECUPERACION = 0.05           # aumento del factor por cada respuesta correcta
+PAUSA_FRENADO = 10.0          # segundos de pausa del host tras un 429/503 sin Retry-After
+ESTADOS_DE_FRENADO = {429, 503}
+
+_ESQUEMA = """
+CREATE TABLE IF NOT EXISTS cubos (
+    host TEXT PRIMARY KEY,
+    tokens REAL NOT NULL, actualizado REAL NOT NULL,
+    factor REAL NOT NULL DEFAULT 1.0, tasa_error REAL NOT NULL DEFAULT 0.0,
+    pausa_hasta REAL NOT NULL DEFAULT 0.0,
+    peticiones INTEGER NOT NULL DEFAULT 0, errores INTEGER NOT NULL DEFAULT 0
+);
+"""
+
+def _host(url_o_host):
+    return urlsplit(url_o_host).netloc or url_o_host
+
+def _con():
+    return conexion_sqlite(RUTA_LIMITADOR, _ESQUEMA)
+
+def _leer(con, host, ahora):
+    fila = con.execute("SELECT * FROM cubos WHERE host = ?", (host,)).fetchone()
+    return dict(fila) if fila else {"host": host, "tokens": RAFAGA, "actualizado": ahora, "factor": 1.0, "tasa_error": 0.0, "pausa_hasta": 0.0, "peticiones": 0, "errores": 0}
+
+def _escribir(con, cubo):
+    con.execute("INSERT OR REPLACE INTO cubos (host, tokens, actualizado, factor, tasa_error, pausa_hasta, peticiones, errores) "
+                "VALUES (:host, :tokens, :actualizado, :factor, :tasa_error, :pausa_hasta, :peticiones, :errores)", cubo)
+
+def _transaccion(funcion, host):
+    """Lee-modifica-escribe el cubo del host con BEGIN IMMEDIATE (un solo escritor entre procesos)."""
+    con = _con()
+    try:
+        con.execute("BEGIN IMMEDIATE")
+        try:
+            cubo = _leer(con, host, time.time())
+            resultado = funcion(cubo)
+            _escribir(con, cubo); con.commit()
+            return resultado
+        except BaseException:
+            con.rollback(); raise
+    except sqlite3.Error:
+        return None
+
+def reservar(url):
+    """Consume un token del host y devuelve los segundos que hay que esperar antes de usarlo."""
+    def consumir(cubo):
+        ahora = time.time()
+        tasa = TASA_SOSTENIDA * cubo["factor"]
+        cubo["tokens"] = min(RAFAGA, cubo["tokens"] + max(0.0, ahora - cubo["actualizado"]) * tasa) - 1
+        cubo["actualizado"], cubo["peticiones"] = ahora, cubo["peticiones"] + 1
+        # Con tokens negativos la petición queda reservada para cuando el cubo se rellene
+        return max(cubo["pausa_hasta"] - ahora, -cubo["tokens"] / tasa if cubo["tokens"] < 0 else 0.0, 0.0)
+    return _transaccion(consumir, _host(url)) or 0.0
+
+def esperar(url):
+    if (espera := reservar(url)) > 0: time.sleep(espera)
+
+# Las transacciones SQLite pueden bloquear (hasta el timeout de la conexión): en código asíncrono van
+# al executor por defecto para no parar el bucle de eventos
+async def esperar_async(url):
+    if (espera := await asyncio.get_running_loop().run_in_executor(None, reservar, url)) > 0: await asyncio.sleep(espera)
+
+def registrar(url, correcto, estado_http=None, retry_after=None):
+    """Actualiza la tasa de errores del host y aplica el back-off o la recuperación."""
+    def actualizar(cubo):
+        ahora, frenado = time.time(), estado_http in ESTADOS_DE_FRENADO
+        error = frenado or not correcto
+        cubo["tasa_error"] = (1 - ALFA_ERRORES) * cubo["tasa_error"] + ALFA_ERRORES * error
+        cubo["errores"] += int(error)
+        if frenado:
+            cubo["factor"] = max(FACTOR_MINIMO, cubo["factor"] / 2)
+            cubo["pausa_hasta"] = max(cubo["pausa_hasta"], ahora + (retry_after if retry_after is not None else PAUSA_FRENADO))
+        elif cubo["tasa_error"] > UMBRAL_ERRORES:
+            cubo["factor"] = max(FACTOR_MINIMO, cubo["factor"] * 0.7)
+        elif not error:
+            cubo["factor"] = min(1.0, cubo["factor"] + RECUPERACION)
+    _transaccion(actualizar, _host(url))
+
+async def registrar_async(url, correcto, estado_http=None, retry_after=None):
+    await asyncio.get_running_loop().run_in_executor(None, registrar, url, correcto, estado_http, retry_after)
+
+def estado(url):
+    """Foto del cubo del host: tokens disponibles, tasa efectiva, factor, tasa de errores y pausa restante."""
+    try: cubo = _leer(_con(), (host := _host(url)), ahora := time.time())
+    except sqlite3.Error: return None
+    tasa = TASA_SOSTENIDA * cubo["factor"]
+    return {"host": host, "tokens": min(RAFAGA, cubo["tokens"] + max(0.0, ahora - cubo["actualizado"]) * tasa), "tasa": tasa,
+            "factor": cubo["factor"], "tasa_error": cubo["tasa_error"], "pausa": max(0.0, cubo["pausa_hasta"] - ahora),
+            "peticiones": cubo["peticiones"], "errores": cubo["errores"]}
+
+def resumen(url):
+    """Texto corto para las líneas de progreso."""
+    if not (e := estado(url)): return "Límite: N/A"
+    pausa = f" | pausa {e['pausa']:.0f}s" if e['pausa'] > 0 else ""
+    return f"Límite {e['tasa']:.2f}/s (x{e['factor']:.2f}) | err {e['tasa_error']:.0%}{pausa}"
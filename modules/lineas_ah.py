@@ -0,0 +1,109 @@
+# modules/lineas_ah.py
+"""
+Codec canónico de líneas de hándicap asiático / goles compartido por todos los módulos.
+Tabla precalculada con todas las líneas de cuarto y medio gol y sus grafías habituales
+("0/0.5", "-0.5/1", "0,25", "+1.0"...); si la grafía no está en la tabla se parsea y se memoriza.
+"""
+import math
+
+LINEA_MAXIMA = 10.0
+MAX_MEMORIZADAS = 4096
+
+# --- IMPLEMENTACIÓN DE REFERENCIA (misma lógica que parse_ah_to_number_of / format_ah_as_decimal_string_of) ---
+def _normalizar(ah_line_str):
+    # Las hojas de cálculo escriben la coma decimal ("0,25")
+    return ah_line_str.replace(',', '.')
+
+def _parse_lento(ah_line_str):
+    if not isinstance(ah_line_str, str): return None
+    ah_line_str = _normalizar(ah_line_str)
+    s = ah_line_str.strip().replace(' ', '')
+    if not s or s in ['-', '?']: return None
+    original_starts_with_minus = ah_line_str.strip().startswith('-')
+    try:
+        if '/' in s:
+            parts = s.split('/')
+            if len(parts) != 2: return None
+            val1, val2 = float(parts[0]), float(parts[1])
+            if val1 < 0 and not parts[1].startswith('-') and val2 > 0: val2 = -abs(val2)
+            elif original_starts_with_minus and val1 == 0.0 and not parts[1].startswith('-') and val2 > 0: val2 = -abs(val2)
+            return (val1 + val2) / 2.0
+        return float(s)
+    except (ValueError, IndexError): return None
+
+def _formatear_valor(numeric_value):
+    if numeric_value == 0.0: return "0"
+    sign = -1 if numeric_value < 0 else 1
+    abs_num = abs(numeric_value)
+    mod_val = abs_num % 1
+    if mod_val == 0.0: abs_rounded = abs_num
+    elif mod_val == 0.25: abs_rounded = math.floor(abs_num) + 0.25
+    elif mod_val == 0.5: abs_rounded = abs_num
+    elif mod_val == 0.75: abs_rounded = math.floor(abs_num) + 0.75
+    else:
+        if mod_val < 0.25: abs_rounded = math.floor(abs_num)
+        elif mod_val < 0.75: abs_rounded = math.floor(abs_num) + 0.5
+        else: abs_rounded = math.ceil(abs_num)
+    final_value = sign * abs_rounded
+    if final_value == 0.0: return "0"
+    if abs(final_value % 1) < 1e-9: return str(int(final_value))
+    if abs(final_value - (math.floor(final_value) + 0.5)) < 1e-9: return f"{final_value:.1f}"
+    return f"{final_value:.2f}"
+
+def _sin_valor(ah_line_str):
+    return ah_line_str.strip() if isinstance(ah_line_str, str) and ah_line_str.strip() in ['-', '?'] else '-'
+
+# --- TABLA PRECALCULADA ---
+def _grafias(valor):
+    """Todas las formas en que la web o las hojas escriben una línea de cuarto/medio gol."""
+    decimales = {f"{valor}", f"{valor:g}", f"{valor:.2f}"}
+    if (valor * 2) % 1 == 0: decimales.add(f"{valor:.1f}")
+    if valor > 0: decimales |= {f"+{d}" for d in decimales}
+    if valor == 0: decimales |= {"-0", "+0", "-0.0"}
+    grafias = set(decimales)
+    if (valor * 4) % 2 == 1:  # línea de cuarto: se escribe como par de medias líneas
+        bajo, alto = math.floor(abs(valor) * 2) / 2, math.ceil(abs(valor) * 2) / 2
+        for b in {f"{bajo:g}", f"{bajo:.1f}"}:
+            for a in {f"{alto:g}", f"{alto:.1f}"}:
+                if valor > 0: grafias.add(f"{b}/{a}")
+                else: grafias |= {f"-{b}/{a}", f"-{b}/-{a}"} | ({f"{b}/-{a}"} if bajo == 0 else set())
+    return grafias | {g.replace('.', ',') for g in grafias}
+
+def _construir_tablas():
+    numeros, formatos = {}, {}
+    for i in range(int(-LINEA_MAXIMA * 4), int(LINEA_MAXIMA * 4) + 1):
+        valor = i / 4
+        for grafia in _grafias(valor):
+            # La tabla se rellena con la implementación de referencia: mismo resultado que el parseo por definición
+            if (numero := _parse_lento(grafia)) is not None:
+                numeros[grafia] = numero
+                formatos[grafia] = _formatear_valor(numero)
+    for especial in ('', '-', '?', 'N/A'):
+        numeros[especial], formatos[especial] = None, _sin_valor(especial)
+    return numeros, formatos
+
+_NUMEROS, _FORMATOS = _construir_tablas()
+_TAMANO_TABLA = len(_NUMEROS)
+
+# --- API PÚBLICA ---
+def parse_ah(ah_line_str):
+    """Valor numérico de una línea ('0/0.5' -> 0.25, '-0.5/1' -> -0.75); None si no es una línea."""
+    try:
+        return _NUMEROS[ah_line_str]
+    except (KeyError, TypeError):
+        numero = _parse_lento(ah_line_str)
+        if isinstance(ah_line_str, str) and len(_NUMEROS) < _TAMANO_TABLA + MAX_MEMORIZADAS: _NUMEROS[ah_line_str] = numero
+        return numero
+
+def format_ah(ah_line_str, for_sheets=False):
+    """Línea en decimal canónico ('0/0.5' -> '0.25', '1.0' -> '1'); '-' o '?' si no hay valor."""
+    try:
+        salida = _FORMATOS[ah_line_str]
+    except (KeyError, TypeError):
+        numero = parse_ah(ah_line_str)
+        salida = _sin_valor(ah_line_str) if numero is None else _formatear_valor(numero)
+        if isinstance(ah_line_str, str) and len(_FORMATOS) < _TAMANO_TABLA + MAX_MEMORIZADAS: _FORMATOS[ah_line_str] = salida
+    # Igual que la versión original de estudio.py, una línea exactamente 0 se devuelve sin formato de hoja
+    if for_sheets and salida not in ['-', '?'] and parse_ah(ah_line_str) != 0.0:
+        return "'" + salida.replace('.', ',')
+    return salida
@@ -0,0 +1,204 @@
+# modules/movimientos_cuotas.py
+"""
+Movimiento de las líneas (AH y goles) de los próximos partidos antes del comienzo.
+Cada refresco de la portada registra la línea de cada partido en un buffer circular de tamaño
+fijo, y solo cuando cambia. Los buffers son filas de matrices numpy preasignadas (MAX_PARTIDOS x
+CAPACIDAD), así que la memoria no depende de cuántos partidos se sigan. Al llenarse se libera la
+fila del partido que lleva más tiempo sin cambios. Consultar un partido es O(1): diccionario
+id -> fila.
+
+Los puntos nuevos se vuelcan cada cierto tiempo a disco en formato columnar (.npz con columnas
+match_id, ts, ah y goles), repartidos en NUM_PARTICIONES carpetas por match_id dentro de
+<MASIVO_DATA_DIR>/movimientos/. Si un partido ya no está en memoria (reinicio, otro proceso), se
+lee solo su partición. Cuando una partición pasa de MAX_FICHEROS_PARTICION ficheros se compacta en
+uno, descartando los puntos de más de MASIVO_RETENCION_MOVIMIENTOS_DIAS días.
+"""
+import atexit
+import glob
+import itertools
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from modules.cache_local import DIRECTORIO_DATOS
+from modules.lineas_ah import parse_ah
+
+MAX_PARTIDOS = int(os.environ.get("MASIVO_MAX_PARTIDOS_CUOTAS", "2000"))
+CAPACIDAD = 64                 # puntos por partido; al llenarse se pisan los más antiguos
+INTERVALO_VOLCADO = 300        # segundos entre volcados a disco
+MAX_PENDIENTES = 4096          # con tantos puntos sin volcar se vuelca aunque no toque
+DIRECTORIO_MOVIMIENTOS = os.path.join(DIRECTORIO_DATOS, "movimientos")
+NUM_PARTICIONES = 64
+MAX_FICHEROS_PARTICION = 8     # con más, la partición se compacta en un solo fichero
+RETENCION = float(os.environ.get("MASIVO_RETENCION_MOVIMIENTOS_DIAS", "30")) * 86400
+BLOQUEO_CADUCADO = 120         # segundos tras los que el bloqueo de un proceso caído se ignora
+COLUMNAS = ("match_id", "ts", "ah", "goles")
+TIPOS = {"match_id": np.int64, "ts": np.float64, "ah": np.float32, "goles": np.float32}
+
+_bloqueo = threading.Lock()
+_ts = np.zeros((MAX_PARTIDOS, CAPACIDAD), dtype=np.float64)
+_ah = np.full((MAX_PARTIDOS, CAPACIDAD), np.nan, dtype=np.float32)
+_goles = np.full((MAX_PARTIDOS, CAPACIDAD), np.nan, dtype=np.float32)
+_siguiente = np.zeros(MAX_PARTIDOS, dtype=np.int32)     # posición de escritura de cada fila
+_cantidad = np.zeros(MAX_PARTIDOS, dtype=np.int32)
+_filas = OrderedDict()         # match_id -> fila, del menos al más recientemente cambiado
+_libres = list(range(MAX_PARTIDOS - 1, -1, -1))
+_pendientes = {"match_id": [], "ts": [], "ah": [], "goles": []}
+_ultimo_volcado = time.time()
+_contador = itertools.count()
+
+def _fila_de(match_id):
+    """Fila del partido, reservando una nueva (o la del partido más antiguo) si no la tiene."""
+    if (fila := _filas.get(match_id)) is not None: return fila
+    fila = _libres.pop() if _libres else _filas.popitem(last=False)[1]
+    _siguiente[fila] = _cantidad[fila] = 0
+    _filas[match_id] = fila
+    return fila
+
+def _ultimo_punto(fila):
+    if _cantidad[fila] == 0: return None
+    i = (_siguiente[fila] - 1) % CAPACIDAD
+    return _ah[fila, i], _goles[fila, i]
+
+def _iguales(a, b):
+    return (a == b) or (np.isnan(a) and np.isnan(b))
+
+def registrar(matches, ts=None):
+    """Añade la línea actual de cada partido ({"id", "handicap", "goal_line"}) si ha cambiado desde el último punto."""
+    ts = ts or time.time()
+    with _bloqueo:
+        for m in matches:
+            if not (match_id := str(m.get("id") or "")).isdigit(): continue
+            ah, goles = parse_ah(m.get("handicap")), parse_ah(m.get("goal_line"))
+            ah, goles = np.float32(np.nan if ah is None else ah), np.float32(np.nan if goles is None else goles)
+            fila = _fila_de(match_id)
+            if (ultimo := _ultimo_punto(fila)) is not None and _iguales(ultimo[0], ah) and _iguales(ultimo[1], goles): continue
+            i = _siguiente[fila]
+            _ts[fila, i], _ah[fila, i], _goles[fila, i] = ts, ah, goles
+            _siguiente[fila], _cantidad[fila] = (i + 1) % CAPACIDAD, min(CAPACIDAD, _cantidad[fila] + 1)
+            _filas.move_to_end(match_id)
+            for columna, valor in (("match_id", int(match_id)), ("ts", ts), ("ah", ah), ("goles", goles)): _pendientes[columna].append(valor)
+        toca_volcar = len(_pendientes["ts"]) >= MAX_PENDIENTES or time.time() - _ultimo_volcado >= INTERVALO_VOLCADO
+    if toca_volcar: volcar()
+
+def _como_lista(valores):
+    return [None if np.isnan(v) else float(v) for v in valores]
+
+def movimiento(match_id):
+    """{"ts": [...], "ah": [...], "goles": [...]} en orden cronológico; de disco si no está en memoria."""
+    match_id = str(match_id)
+    with _bloqueo:
+        if (fila := _filas.get(match_id)) is not None:
+            n = _cantidad[fila]
+            orden = (np.arange(_siguiente[fila] - n, _siguiente[fila])) % CAPACIDAD
+            return {"ts": _ts[fila, orden].tolist(), "ah": _como_lista(_ah[fila, orden]), "goles": _como_lista(_goles[fila, orden])}
+    return leer_de_disco(match_id)
+
+def resumen_movimiento(mov):
+    """Apertura, actual y variación de cada línea (None si no hay puntos)."""
+    if not mov or not mov["ts"]: return None
+    def extremos(valores):
+        validos = [v for v in valores if v is not None]
+        return {"apertura": validos[0], "actual": validos[-1], "variacion": validos[-1] - validos[0]} if validos else None
+    return {"puntos": len(mov["ts"]), "desde": mov["ts"][0], "hasta": mov["ts"][-1], "ah": extremos(mov["ah"]), "goles": extremos(mov["goles"])}
+
+# --- VOLCADO COLUMNAR A DISCO ---
+def _particion(match_id):
+    return os.path.join(DIRECTORIO_MOVIMIENTOS, f"{int(match_id) % NUM_PARTICIONES:02d}")
+
+def _escribir(directorio, columnas):
+    """Escribe las columnas en un .npz nuevo de `directorio` (nombre único por proceso, sin bloqueos)."""
+    os.makedirs(directorio, exist_ok=True)
+    ruta = os.path.join(directorio, f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{next(_contador)}.npz")
+    temporal = ruta + ".tmp"
+    with open(temporal, "wb") as f:
+        np.savez_compressed(f, **{c: np.asarray(columnas[c], dtype=TIPOS[c]) for c in COLUMNAS})
+    os.replace(temporal, ruta)
+    return ruta
+
+def _leer(ruta):
+    try:
+        with np.load(ruta) as datos: return {c: datos[c] for c in COLUMNAS}
+    except (OSError, ValueError, KeyError): return None
+
+def _unir(partes):
+    return {c: np.concatenate([p[c] for p in partes]) for c in COLUMNAS}
+
+def _bloquear(directorio):
+    """True si este proceso consigue el bloqueo de compactación de `directorio` (fichero exclusivo)."""
+    ruta = os.path.join(directorio, ".bloqueo")
+    try:
+        if time.time() - os.path.getmtime(ruta) > BLOQUEO_CADUCADO: os.remove(ruta)
+    except OSError: pass
+    try: os.close(os.open(ruta, os.O_CREAT | os.O_EXCL | os.O_WRONLY)); return True
+    except OSError: return False
+
+def _desbloquear(directorio):
+    try: os.remove(os.path.join(directorio, ".bloqueo"))
+    except OSError: pass
+
+def _borrar(rutas):
+    for ruta in rutas:
+        try: os.remove(ruta)
+        except OSError: pass
+
+def compactar(directorio):
+    """Une los ficheros de una partición si pasan de MAX_FICHEROS_PARTICION, sin los puntos fuera de la retención."""
+    if len(glob.glob(os.path.join(directorio, "*.npz"))) <= MAX_FICHEROS_PARTICION or not _bloquear(directorio): return
+    try:
+        rutas = sorted(glob.glob(os.path.join(directorio, "*.npz")))
+        if not (partes := [p for r in rutas if (p := _leer(r)) is not None]): return
+        columnas = _unir(partes)
+        vigentes = columnas["ts"] >= time.time() - RETENCION
+        # Primero el fichero nuevo y después el borrado: un lector concurrente nunca se queda sin los puntos
+        if vigentes.any(): _escribir(directorio, {c: v[vigentes] for c, v in columnas.items()})
+        _borrar(rutas)
+    finally: _desbloquear(directorio)
+
+def _escribir_particiones(columnas):
+    """Un .npz por partición con los puntos de sus partidos; devuelve las particiones tocadas."""
+    particiones, directorios = columnas["match_id"] % NUM_PARTICIONES, []
+    for particion in np.unique(particiones):
+        mascara = particiones == particion
+        directorios.append(_particion(particion))
+        _escribir(directorios[-1], {c: v[mascara] for c, v in columnas.items()})
+    return directorios
+
+def _repartir_antiguos():
+    """Mueve a sus particiones los .npz de versiones anteriores (todos los partidos en la carpeta raíz)."""
+    if not glob.glob(os.path.join(DIRECTORIO_MOVIMIENTOS, "*.npz")) or not _bloquear(DIRECTORIO_MOVIMIENTOS): return []
+    try:
+        rutas = sorted(glob.glob(os.path.join(DIRECTORIO_MOVIMIENTOS, "*.npz")))
+        directorios = _escribir_particiones(_unir(partes)) if (partes := [p for r in rutas if (p := _leer(r)) is not None]) else []
+        _borrar(rutas)
+        return directorios
+    finally: _desbloquear(DIRECTORIO_MOVIMIENTOS)
+
+def volcar():
+    """Escribe los puntos pendientes en sus particiones y compacta las que se hayan llenado."""
+    global _pendientes, _ultimo_volcado
+    with _bloqueo:
+        pendientes, _pendientes = _pendientes, {"match_id": [], "ts": [], "ah": [], "goles": []}
+        _ultimo_volcado = time.time()
+    directorios = _repartir_antiguos()
+    if pendientes["ts"]: directorios += _escribir_particiones({c: np.asarray(pendientes[c], dtype=TIPOS[c]) for c in COLUMNAS})
+    for directorio in set(directorios): compactar(directorio)
+    return directorios
+
+def leer_de_disco(match_id):
+    """Puntos volcados de un partido, de los ficheros de su partición, en orden cronológico."""
+    objetivo, partes = int(match_id), []
+    # Más los de la raíz que queden de versiones anteriores, hasta que el próximo volcado los reparta
+    for ruta in glob.glob(os.path.join(_particion(match_id), "*.npz")) + glob.glob(os.path.join(DIRECTORIO_MOVIMIENTOS, "*.npz")):
+        if (datos := _leer(ruta)) is not None and (mascara := datos["match_id"] == objetivo).any():
+            partes.append({c: v[mascara] for c, v in datos.items()})
+    if not partes: return {"ts": [], "ah": [], "goles": []}
+    columnas = _unir(partes)
+    # Orden cronológico y sin repetidos (un fichero recién compactado puede leerse junto con los que sustituye)
+    _, orden = np.unique(columnas["ts"], return_index=True)
+    return {"ts": columnas["ts"][orden].tolist(), "ah": _como_lista(columnas["ah"][orden]), "goles": _como_lista(columnas["goles"][orden])}
+
+atexit.register(volcar)
@@ -0,0 +1,119 @@
+# modules/partidos_proximos.py
+"""
+Lista de próximos partidos de la portada de NowGoal (Playwright), compartida por la app de
+Streamlit y el servidor web. La carga va al espejo más rápido con failover y pasa por el limitador.
+Cada carga registra las líneas en modules/movimientos_cuotas para seguir su movimiento.
+"""
+import datetime
+import time
+
+from bs4 import BeautifulSoup
+from playwright.async_api import async_playwright, Error as PlaywrightError
+
+from modules import espejos, extraccion_js, limitador, movimientos_cuotas
+from modules.cache_local import CacheLocal
+from modules.lineas_ah import format_ah
+
+# Portada compartida entre procesos: {"guardado": ts, "partidos": [...]} (la guarda web.py)
+CACHE_PARTIDOS = CacheLocal("partidos_proximos")
+# Hora de comienzo de cada partido visto en la portada (match_id -> timestamp UTC), también de los ya
+# empezados: la lista de próximos los descarta, pero la caducidad de sus estudios depende de ella
+CACHE_INICIOS = CacheLocal("inicios_partidos")
+TTL_INICIOS = 3 * 24 * 3600
+
+def filas_portada(html_content):
+    """Filas tr1_ de la portada con el mismo formato que extraccion_js.portada_async."""
+    soup = BeautifulSoup(html_content, 'html.parser')
+    filas = []
+    for row in soup.find_all('tr', id=lambda x: x and x.startswith('tr1_')):
+        match_id = row.get('id', '').replace('tr1_', '')
+        time_cell = row.find('td', {'name': 'timeData'})
+        home_team_tag = row.find('a', {'id': f'team1_{match_id}'})
+        away_team_tag = row.find('a', {'id': f'team2_{match_id}'})
+        # La primera celda es la de la liga (nombre corto con el color de la competición)
+        league_cell = row.find('td')
+        filas.append({"id": match_id, "data_t": time_cell.get('data-t') if time_cell else None,
+                      "local": home_team_tag.text.strip() if home_team_tag else None, "visitante": away_team_tag.text.strip() if away_team_tag else None,
+                      "odds": row.get('odds', ''), "liga": league_cell.get_text(strip=True) if league_cell is not None and league_cell is not time_cell else None})
+    return filas
+
+def partidos_desde_filas(filas):
+    """Próximos partidos (aún no empezados) ordenados por hora a partir de las filas de la portada."""
+    upcoming_matches = []
+    now_utc = datetime.datetime.utcnow()
+    for fila in filas:
+        if not fila["id"] or not fila["data_t"]: continue
+        try:
+            match_time = datetime.datetime.strptime(fila["data_t"], '%Y-%m-%d %H:%M:%S')
+        except (ValueError, IndexError):
+            continue
+        if match_time < now_utc: continue
+        odds_data = fila["odds"].split(',')
+        upcoming_matches.append({
+            "id": fila["id"],
+            "time": match_time.strftime('%Y-%m-%d %H:%M'),
+            "home_team": fila["local"] or "N/A",
+            "away_team": fila["visitante"] or "N/A",
+            "league": fila["liga"] if fila["liga"] is not None else "N/A",
+            "handicap": format_ah(odds_data[2]) if len(odds_data) > 2 else "N/A",
+            "goal_line": format_ah(odds_data[10]) if len(odds_data) > 10 else "N/A"
+        })
+    upcoming_matches.sort(key=lambda x: x['time'])
+    return upcoming_matches
+
+def parse_main_page_matches(html_content):
+    return partidos_desde_filas(filas_portada(html_content))
+
+def registrar_inicios(filas):
+    """Guarda la hora de comienzo de todas las filas de la portada (empezados incluidos) en CACHE_INICIOS."""
+    inicios = {}
+    for fila in filas:
+        try: inicios[fila["id"]] = datetime.datetime.strptime(fila["data_t"], '%Y-%m-%d %H:%M:%S').replace(tzinfo=datetime.timezone.utc).timestamp()
+        except (TypeError, ValueError): continue
+    if inicios: CACHE_INICIOS.guardar_varios(inicios, ttl=TTL_INICIOS)
+
+async def get_main_page_matches_async():
+    async with async_playwright() as p:
+        # En la nube, no es necesario especificar el ejecutable si está instalado globalmente
+        browser = await p.chromium.launch(headless=True)
+        page = await browser.new_page()
+        try:
+            # Espejo más rápido primero; si no carga la lista se prueba el siguiente
+            error = None
+            for espejo in espejos.candidatos():
+                await limitador.esperar_async(espejo)
+                inicio, respuesta = time.monotonic(), None
+                try:
+                    respuesta = await page.goto(f"{espejo}/", wait_until="networkidle", timeout=20000)
+                    await page.wait_for_selector('tr[id^="tr1_"]', timeout=10000)
+                except PlaywrightError as e:
+                    # Contra el espejo solo cuentan los fallos de conexión (carga fallida o 5xx), no una lista que no aparece
+                    if respuesta is None or respuesta.status >= 500 or "net::ERR_" in str(e):
+                        espejos.registrar(espejo, False, error=type(e).__name__); await limitador.registrar_async(espejo, False)
+                    error = e
+                    continue
+                espejos.registrar(espejo, True, time.monotonic() - inicio); await limitador.registrar_async(espejo, True)
+                # Las filas se leen dentro de la página (extraccion_js); si el script falla, del HTML
+                filas = await extraccion_js.portada_async(page) if extraccion_js.ACTIVA else None
+                if not isinstance(filas, list): filas = filas_portada(await page.content())
+                matches = partidos_desde_filas(filas)
+                registrar_inicios(filas)
+                # Cada refresco deja un punto en la serie de movimientos de línea de cada partido
+                movimientos_cuotas.registrar(matches)
+                return matches
+            raise error or RuntimeError(espejos.SIN_ESPEJOS)
+        finally:
+            await browser.close()
+
+def solo_con_handicap(matches):
+    return [m for m in matches if m.get('handicap') and m.get('handicap') not in ['N/A', '-']]
+
+def inicio_partido(match_id):
+    """Hora de comienzo (timestamp UTC) del partido según las portadas vistas, o None."""
+    if (inicio := CACHE_INICIOS.obtener(match_id)) is not None: return inicio
+    portada = CACHE_PARTIDOS.obtener("portada") or {}
+    for m in portada.get("partidos", []):
+        if m.get("id") == str(match_id):
+            try: return datetime.datetime.strptime(m["time"], '%Y-%m-%d %H:%M').replace(tzinfo=datetime.timezone.utc).timestamp()
+            except (KeyError, ValueError): return None
+    return None
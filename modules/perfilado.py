@@ -0,0 +1,102 @@
+# modules/perfilado.py
+"""
+Perfilado opcional de una unidad de trabajo (un estudio, un partido del scraper masivo).
+Mientras dura el bloque `with perfilar(...)` se recogen a la vez:
+  - un perfil cProfile del hilo que llama  -> <etiqueta>.prof  (snakeviz, pstats)
+  - muestras periódicas de la pila de ese hilo en formato "collapsed" -> <etiqueta>.folded
+    (flamegraph.pl, speedscope, inferno); aquí sí se ven las esperas de Selenium y de red.
+Los ficheros van a <MASIVO_DATA_DIR>/perfiles/ y solo se conservan los MAX_PERFILES más recientes.
+
+Activación: ?perfil=1 en /estudio/<id> (web.py), MASIVO_TASA_PERFIL=0.01 en Scraper.py
+(fracción de partidos perfilados) y MASIVO_PERFILAR_ESTUDIO=1 para estudio.py.
+"""
+import cProfile
+import glob
+import os
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+from modules.cache_local import DIRECTORIO_DATOS
+
+DIRECTORIO_PERFILES = os.path.join(DIRECTORIO_DATOS, "perfiles")
+MAX_PERFILES = int(os.environ.get("MASIVO_MAX_PERFILES", "50"))
+INTERVALO_MUESTREO = 0.005     # segundos entre muestras de la pila
+
+def muestrear(tasa):
+    """True para una fracción `tasa` de las llamadas (0 = nunca, 1 = siempre)."""
+    return tasa > 0 and random.random() < tasa
+
+class Perfil:
+    def __init__(self, etiqueta):
+        self.etiqueta, self.rutas = etiqueta, []
+        self._cprofile, self._muestras, self._parar = cProfile.Profile(), Counter(), threading.Event()
+        self._hilo_objetivo = threading.get_ident()
+
+    def _pila(self, frame):
+        nombres = []
+        while frame is not None:
+            codigo = frame.f_code
+            nombres.append(f"{codigo.co_name} ({os.path.basename(codigo.co_filename)}:{codigo.co_firstlineno})")
+            frame = frame.f_back
+        return ";".join(reversed(nombres))
+
+    def _muestrear(self):
+        while not self._parar.wait(INTERVALO_MUESTREO):
+            if (frame := sys._current_frames().get(self._hilo_objetivo)) is not None: self._muestras[self._pila(frame)] += 1
+
+    def iniciar(self):
+        self._inicio = time.time()
+        threading.Thread(target=self._muestrear, name=f"perfil-{self.etiqueta}", daemon=True).start()
+        # Desde Python 3.12 solo puede haber un cProfile activo por proceso: si ya hay otro, queda el muestreo
+        try: self._cprofile.enable()
+        except ValueError: self._cprofile = None
+
+    def detener(self):
+        if self._cprofile: self._cprofile.disable()
+        self._parar.set()
+        self.duracion = time.time() - self._inicio
+
+    def guardar(self):
+        """Escribe .prof y .folded con la etiqueta (p. ej. el match ID) y aplica el límite de retención."""
+        os.makedirs(DIRECTORIO_PERFILES, exist_ok=True)
+        etiqueta = re.sub(r'[^\w.-]', '_', self.etiqueta)
+        base = os.path.join(DIRECTORIO_PERFILES, f"{time.strftime('%Y%m%d-%H%M%S')}-{etiqueta}-{self.duracion:.1f}s")
+        with open(base + ".folded", "w", encoding="utf-8") as f:
+            for pila, n in self._muestras.most_common(): f.write(f"{pila} {n}\n")
+        self.rutas = [base + ".folded"]
+        if self._cprofile:
+            self._cprofile.dump_stats(base + ".prof"); self.rutas.insert(0, base + ".prof")
+        purgar()
+        return self.rutas
+
+@contextmanager
+def perfilar(etiqueta=None, activo=True):
+    """
+    Perfila el bloque si `activo`. La etiqueta puede fijarse dentro (perfil.etiqueta = ...) cuando
+    aún no se conoce al entrar; si al salir sigue siendo None, el perfil se descarta.
+    """
+    if not activo:
+        yield None; return
+    perfil = Perfil(etiqueta)
+    perfil.iniciar()
+    try:
+        yield perfil
+    finally:
+        perfil.detener()
+        if perfil.etiqueta:
+            try: print(f"Perfil guardado: {perfil.guardar()[0]}")
+            except OSError as e: print(f"No se pudo guardar el perfil: {e}")
+
+def purgar(maximo=None):
+    """Borra los perfiles más antiguos hasta dejar `maximo` unidades (cada una = .folded + .prof si lo hay)."""
+    maximo = MAX_PERFILES if maximo is None else maximo
+    bases = sorted({r.rsplit('.', 1)[0] for r in glob.glob(os.path.join(DIRECTORIO_PERFILES, "*.folded"))})
+    for base in bases[:max(0, len(bases) - maximo)]:
+        for extension in (".prof", ".folded"):
+            try: os.remove(base + extension)
+            except OSError: pass
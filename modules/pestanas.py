@@ -0,0 +1,67 @@
+# modules/pestanas.py
+"""
+Páginas secundarias (p. ej. el H2H de rivales de la columna 3) en una pestaña propia del mismo
+navegador. abrir() lanza la carga con window.open y vuelve al momento, sin cambiar de pestaña:
+el navegador descarga la página mientras Python sigue con el soup de la principal y con las
+estadísticas por HTTP. recoger() cambia a la pestaña, espera al elemento, devuelve el HTML,
+cierra la pestaña y vuelve a la principal, que nunca se recarga.
+
+El driver solo se toca desde el hilo que llama a abrir()/recoger(): WebDriver no admite dos
+órdenes a la vez, así que el solapamiento lo aporta el navegador, no los hilos de Python.
+"""
+from selenium.common.exceptions import WebDriverException
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support import expected_conditions as EC
+from selenium.webdriver.support.ui import WebDriverWait
+
+from modules import espejos, limitador
+
+def abrir(driver, ruta):
+    """Empieza a cargar `ruta` en una pestaña nueva del mejor espejo; devuelve el descriptor para recoger()."""
+    espejo = espejos.mejor()
+    url, antes = espejo + ruta, set(driver.window_handles)
+    limitador.esperar(url)
+    try:
+        driver.execute_script("window.open(arguments[0], '_blank');", url)
+        nuevas = set(driver.window_handles) - antes
+    except WebDriverException:
+        nuevas = set()
+    # Si el navegador bloquea la ventana emergente, recoger() cargará la ruta en una pestaña propia
+    return {"ruta": ruta, "espejo": espejo, "url": url, "ventana": nuevas.pop() if nuevas else None}
+
+def recoger(driver, pestana, id_esperado, timeout, preparar=None, leer=None):
+    """
+    HTML de la pestaña cuando aparece `id_esperado`; si el espejo falla se reintenta con failover en
+    la misma pestaña. `preparar(driver)` se ejecuta antes de leer el HTML (selects, clics...).
+    Con `leer(driver)` se devuelve lo que esta devuelva en lugar del HTML (p. ej. extraccion_js.extraer).
+    """
+    principal = driver.current_window_handle
+    try:
+        if pestana["ventana"] is None:
+            driver.switch_to.new_window('tab')
+            pestana["ventana"] = driver.current_window_handle
+            espejos.navegar(driver, pestana["ruta"], id_esperado, timeout)
+        else:
+            driver.switch_to.window(pestana["ventana"])
+            try:
+                WebDriverWait(driver, timeout).until(EC.presence_of_element_located((By.ID, id_esperado)))
+                # Sin latencia: el tiempo desde abrir() incluye el trabajo solapado, no solo la descarga
+                espejos.registrar(pestana["espejo"], True); limitador.registrar(pestana["url"], True)
+            except WebDriverException as e:
+                # Solo un fallo de conexión cuenta contra el espejo; en cualquier caso se reintenta con navegar()
+                if espejos.fallo_de_conexion(driver, e): espejos.registrar(pestana["espejo"], False, error=type(e).__name__); limitador.registrar(pestana["url"], False)
+                espejos.navegar(driver, pestana["ruta"], id_esperado, timeout)
+        if preparar: preparar(driver)
+        return leer(driver) if leer else driver.page_source
+    finally:
+        if driver.current_window_handle != principal: driver.close()
+        driver.switch_to.window(principal)
+
+def cerrar(driver, pestana):
+    """Cierra una pestaña abierta que al final no se va a recoger."""
+    if not pestana or not pestana.get("ventana"): return
+    principal = driver.current_window_handle
+    try:
+        driver.switch_to.window(pestana["ventana"]); driver.close()
+    except WebDriverException: pass
+    finally: driver.switch_to.window(principal)
@@ -0,0 +1,45 @@
+# modules/regiones_html.py
+"""
+Parseo de la página h2h limitado a las regiones que se leen (SoupStrainer): el resto de la página
+(publicidad, cuotas de decenas de casas, scripts...) no llega a convertirse en árbol.
+
+    table_v1 / table_v2 / table_v3   historial, H2H y barras O/U (ul.y-bar)
+    porletP4                         clasificación
+    tr_o_1_8 / tr_o_1_31             filas earlyOdds de Bet365 y su alternativa
+    mScore                           marcador final
+
+El script de _matchInfo no se puede elegir por atributos: se recorta del HTML y se añade al árbol,
+para que los find("script", string=...) de siempre lo sigan encontrando.
+El árbol se libera con liberar() en cuanto se han sacado los datos.
+"""
+import re
+
+from bs4 import BeautifulSoup, SoupStrainer
+
+REGIONES_H2H = ("table_v1", "table_v2", "table_v3", "porletP4", "tr_o_1_8", "tr_o_1_31", "mScore")
+SCRIPT_MATCH_INFO = "var _matchInfo"
+
+def estrategia(ids):
+    """SoupStrainer que deja pasar solo los elementos (con todo su contenido) cuyo id está en `ids`."""
+    return SoupStrainer(attrs={"id": re.compile("^(?:" + "|".join(map(re.escape, ids)) + ")$")})
+
+ESTRATEGIA_H2H = estrategia(REGIONES_H2H)
+
+def script_con(html, marca):
+    """Texto del <script> inline que contiene `marca`, o None. Sin regex sobre la página entera."""
+    if (posicion := html.find(marca)) < 0: return None
+    apertura = html.rfind("<script", 0, posicion)
+    if apertura < 0 or (inicio := html.find(">", apertura) + 1) > posicion or (fin := html.find("</script>", posicion)) < 0: return None
+    return html[inicio:fin]
+
+def soup_h2h(html, ids=None):
+    """Árbol con solo las regiones de REGIONES_H2H (o las de `ids`) y el script de _matchInfo."""
+    soup = BeautifulSoup(html, "lxml", parse_only=estrategia(ids) if ids else ESTRATEGIA_H2H)
+    if not ids and (texto := script_con(html, SCRIPT_MATCH_INFO)) is not None:
+        soup.append(script := soup.new_tag("script"))
+        script.string = texto
+    return soup
+
+def liberar(soup):
+    """Rompe las referencias del árbol para que la memoria se recupere ya y no al final del estudio."""
+    if soup is not None: soup.decompose()
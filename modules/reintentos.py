@@ -0,0 +1,96 @@
+# modules/reintentos.py
+"""
+Reintentos de los partidos que fallan en la extracción masiva. Cada fallo se clasifica:
+
+    timeout        el elemento esperado (table_v1) no apareció a tiempo
+    navegador      Chrome caído, sesión perdida, no se pudo arrancar el driver
+    limitado       página de bloqueo del servidor (429, Access Denied, captcha)
+    vacia          page_source vacío o casi vacío
+    parseo         la página cargó pero no tiene lo esperado  -> no se reintenta
+    no_encontrado  el partido no existe                       -> no se reintenta
+
+Los transitorios se reintentan hasta MAX_REINTENTOS veces con espera exponencial y jitter (más
+larga si el servidor está limitando). Los que fallan del todo se guardan en
+<MASIVO_DATA_DIR>/fallos_permanentes.jsonl para revisarlos.
+"""
+import json
+import os
+import random
+import threading
+import time
+
+from modules.cache_local import DIRECTORIO_DATOS
+
+MAX_REINTENTOS = int(os.environ.get("MASIVO_MAX_REINTENTOS", "3"))
+TRANSITORIAS = {"timeout", "navegador", "limitado", "vacia"}
+ESPERA_BASE = {"limitado": 30.0}  # segundos; el resto usa ESPERA_BASE_DEFECTO
+ESPERA_BASE_DEFECTO = 5.0
+ESPERA_MAXIMA = 300.0
+RUTA_FALLOS = os.path.join(DIRECTORIO_DATOS, "fallos_permanentes.jsonl")
+
+MARCAS_NO_ENCONTRADO = ("match not found",)  # misma marca que usa Scraper.leer_pagina_h2h
+MARCAS_BLOQUEO = ("access denied", "too many requests", "error 429", "captcha", "403 forbidden", "rate limit")
+MARCAS_NAVEGADOR = ("chrome not reachable", "disconnected", "session deleted", "invalid session id", "tab crashed", "no such window")
+ERRORES_NAVEGADOR = ("WebDriverException", "InvalidSessionIdException", "NoSuchWindowException", "SessionNotCreatedException")
+MINIMO_HTML = 500             # por debajo, la página se considera vacía
+MAXIMO_HTML_BLOQUEO = 50000   # por encima no puede ser una página de bloqueo
+
+_bloqueo_fichero = threading.Lock()
+
+def clasificar(mensaje, html=None):
+    """Clase del fallo a partir del mensaje 'Excepcion: detalle' y, si se tiene, del HTML que quedó cargado."""
+    if any(m in (html or "").lower() or m in mensaje.lower() for m in MARCAS_NO_ENCONTRADO): return "no_encontrado"
+    # Las páginas de bloqueo son cortas; en una página h2h completa esas palabras pueden salir en los scripts
+    if html is not None and len(html) < MAXIMO_HTML_BLOQUEO:
+        if any(m in html.lower() for m in MARCAS_BLOQUEO): return "limitado"
+        if len(html.strip()) < MINIMO_HTML: return "vacia"
+    nombre, minusculas = mensaje.split(":", 1)[0].strip(), mensaje.lower()
+    if nombre == "TimeoutException": return "timeout"
+    if nombre in ERRORES_NAVEGADOR or any(m in minusculas for m in MARCAS_NAVEGADOR): return "navegador"
+    return "parseo"
+
+def estado_de(clase):
+    """Estado de Scraper.py ('not_found', 'parse_error', 'load_error') que corresponde a una clase."""
+    return {"no_encontrado": "not_found", "parseo": "parse_error"}.get(clase, "load_error")
+
+def espera(clase, intento):
+    """Segundos antes del reintento `intento` (1, 2...): exponencial con jitter entre la mitad y el total."""
+    tope = min(ESPERA_MAXIMA, ESPERA_BASE.get(clase, ESPERA_BASE_DEFECTO) * 2 ** (intento - 1))
+    return random.uniform(tope / 2, tope)
+
+class ColaReintentos:
+    """Partidos pendientes de reintento con el momento a partir del cual pueden volver a intentarse."""
+    def __init__(self):
+        self._pendientes = {}  # mid -> {"clase", "intentos", "proximo"}
+        self._intentos = {}
+
+    def anotar(self, mid, clase):
+        """Programa el reintento si la clase es transitoria y quedan intentos; False si el fallo es definitivo."""
+        intentos = self._intentos.get(mid, 0)
+        if clase not in TRANSITORIAS or intentos >= MAX_REINTENTOS: return False
+        self._intentos[mid] = intentos + 1
+        self._pendientes[mid] = {"clase": clase, "intentos": intentos + 1, "proximo": time.time() + espera(clase, intentos + 1)}
+        return True
+
+    def intentos(self, mid):
+        return self._intentos.get(mid, 0)
+
+    def proximo(self):
+        return min((p["proximo"] for p in self._pendientes.values()), default=time.time())
+
+    def listos(self, ahora=None):
+        """Saca de la cola los partidos cuya espera ya ha pasado."""
+        ahora = ahora or time.time()
+        listos = [mid for mid, p in self._pendientes.items() if p["proximo"] <= ahora]
+        for mid in listos: del self._pendientes[mid]
+        return listos
+
+    def __len__(self):
+        return len(self._pendientes)
+
+def guardar_permanente(mid, clase, mensaje, intentos, **extra):
+    """Añade el partido a fallos_permanentes.jsonl (una línea JSON por partido)."""
+    registro = {"mid": mid, "clase": clase, "mensaje": mensaje, "intentos": intentos, "ts": time.time(), **extra}
+    os.makedirs(os.path.dirname(RUTA_FALLOS), exist_ok=True)
+    with _bloqueo_fichero, open(RUTA_FALLOS, "a", encoding="utf-8") as f:
+        f.write(json.dumps(registro, ensure_ascii=False, default=str) + "\n")
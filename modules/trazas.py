@@ -0,0 +1,150 @@
+# modules/trazas.py
+"""
+Trazas estructuradas (spans) de cada partido procesado, en el scraper masivo o en un estudio.
+Cada span es una línea JSON en <MASIVO_DATA_DIR>/trazas/trazas.jsonl (rotación por tamaño) con:
+traza (ID de correlación de todo el partido), span, padre, nombre, inicio, duracion_ms, bytes,
+resultado ("ok", "error" u otro estado) y los atributos que se añadan (match_id, filas...).
+
+    with trazas.span("partido", match_id=mid) as raiz:
+        with trazas.span("navegar") as s:
+            ...; s.bytes = len(html)
+        raiz.resultado = "not_found"
+
+Análisis: python -m modules.trazas [ficheros] [--desde 2024-05-01T10:00] [--top 15]
+Se desactiva con MASIVO_TRAZAS=0.
+"""
+import argparse
+import contextvars
+import glob
+import json
+import logging
+import os
+import re
+import sys
+import time
+import uuid
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from datetime import datetime
+from logging.handlers import RotatingFileHandler
+
+from modules.cache_local import DIRECTORIO_DATOS
+
+DIRECTORIO_TRAZAS = os.path.join(DIRECTORIO_DATOS, "trazas")
+RUTA_TRAZAS = os.path.join(DIRECTORIO_TRAZAS, "trazas.jsonl")
+ACTIVAS = os.environ.get("MASIVO_TRAZAS", "1") != "0"
+MAX_BYTES = 20 * 1024 * 1024
+COPIAS = 5
+
+_span_actual = contextvars.ContextVar("span_actual", default=None)
+_registro = None
+
+def _logger():
+    global _registro
+    if _registro is None:
+        registro = logging.getLogger("masivo.trazas")
+        registro.setLevel(logging.INFO); registro.propagate = False
+        if not registro.handlers:
+            os.makedirs(DIRECTORIO_TRAZAS, exist_ok=True)
+            manejador = RotatingFileHandler(RUTA_TRAZAS, maxBytes=MAX_BYTES, backupCount=COPIAS, encoding="utf-8")
+            manejador.setFormatter(logging.Formatter("%(message)s"))
+            registro.addHandler(manejador)
+        _registro = registro
+    return _registro
+
+class Span:
+    def __init__(self, nombre, padre, atributos):
+        self.nombre, self.atributos, self.bytes, self.resultado, self.error = nombre, atributos, None, "ok", None
+        self.traza = padre.traza if padre else uuid.uuid4().hex[:16]
+        self.id, self.padre = uuid.uuid4().hex[:8], padre.id if padre else None
+        self._inicio, self._reloj = time.time(), time.perf_counter()
+
+    def anotar(self, **atributos):
+        self.atributos.update(atributos)
+
+    def registro(self):
+        return {"traza": self.traza, "span": self.id, "padre": self.padre, "nombre": self.nombre,
+                "inicio": round(self._inicio, 3), "duracion_ms": round((time.perf_counter() - self._reloj) * 1000, 1),
+                "bytes": self.bytes, "resultado": self.resultado, "error": self.error, **self.atributos}
+
+@contextmanager
+def span(nombre, padre=None, **atributos):
+    """
+    Abre un span hijo del actual (o la raíz de una traza nueva) y lo escribe al salir, también si hay
+    excepción. En generadores, cuyo contexto puede cambiar entre un yield y otro, conviene pasar `padre`.
+    """
+    if not ACTIVAS:
+        yield Span(nombre, None, atributos); return
+    actual = Span(nombre, padre or _span_actual.get(), atributos)
+    token = _span_actual.set(actual)
+    try:
+        yield actual
+    except GeneratorExit:
+        actual.resultado = "cancelado"   # el consumidor dejó el generador a medias (p. ej. cliente desconectado)
+        raise
+    except BaseException as e:
+        actual.resultado, actual.error = "error", f"{type(e).__name__}: {str(e)[:300]}"
+        raise
+    finally:
+        try: _span_actual.reset(token)
+        except ValueError: pass          # cerrado desde otro contexto (generador recogido por el GC)
+        try: _logger().info(json.dumps(actual.registro(), ensure_ascii=False, default=str))
+        except (OSError, ValueError): pass
+
+def traza_actual():
+    """ID de correlación de la traza en curso (para mensajes de error y failed_mids)."""
+    return (s := _span_actual.get()) and s.traza
+
+# --- ANALIZADOR ---
+def _leer(rutas, desde=None):
+    for ruta in rutas:
+        try:
+            with open(ruta, encoding="utf-8") as f:
+                for linea in f:
+                    try: registro = json.loads(linea)
+                    except ValueError: continue
+                    if desde is None or registro.get("inicio", 0) >= desde: yield registro
+        except OSError: continue
+
+def _percentil(valores, p):
+    valores = sorted(valores)
+    return valores[min(len(valores) - 1, int(round(p / 100 * (len(valores) - 1))))]
+
+def _firma_error(error):
+    # Los números (IDs, puertos, tiempos) separan errores que en realidad son el mismo
+    return re.sub(r"\d+", "N", error or "")[:120]
+
+def analizar(registros, top=15):
+    """Texto con las etapas más lentas, los partidos más lentos y los grupos de errores."""
+    por_etapa, raices, errores, resultados = defaultdict(list), [], Counter(), Counter()
+    ejemplos = {}
+    for r in registros:
+        por_etapa[r["nombre"]].append(r["duracion_ms"])
+        if r.get("padre") is None:
+            raices.append(r); resultados[(r["nombre"], r.get("resultado"))] += 1
+        if r.get("error"):
+            clave = (r["nombre"], _firma_error(r.get("error")))
+            errores[clave] += 1; ejemplos.setdefault(clave, r.get("traza"))
+    lineas = [f"Spans: {sum(len(v) for v in por_etapa.values())} | Trazas: {len(raices)}", "", "== Etapas por tiempo total =="]
+    lineas.append(f"{'etapa':<16}{'n':>7}{'total s':>10}{'p50 ms':>10}{'p95 ms':>10}{'max ms':>10}")
+    for nombre, duraciones in sorted(por_etapa.items(), key=lambda kv: -sum(kv[1]))[:top]:
+        lineas.append(f"{nombre:<16}{len(duraciones):>7}{sum(duraciones) / 1000:>10.1f}{_percentil(duraciones, 50):>10.0f}{_percentil(duraciones, 95):>10.0f}{max(duraciones):>10.0f}")
+    lineas += ["", "== Trazas más lentas =="]
+    for r in sorted(raices, key=lambda r: -r["duracion_ms"])[:top]:
+        lineas.append(f"{r['duracion_ms'] / 1000:>8.1f}s  {r['nombre']:<10} match {r.get('match_id', '?'):<10} {r.get('resultado')}  traza {r['traza']}")
+    lineas += ["", "== Resultados =="] + [f"{n:>7}  {nombre}: {res}" for (nombre, res), n in resultados.most_common()]
+    lineas += ["", "== Grupos de errores =="] + ([f"{n:>7}  [{etapa}] {firma}  (ej. traza {ejemplos[(etapa, firma)]})" for (etapa, firma), n in errores.most_common(top)] or ["  (ninguno)"])
+    return "\n".join(lineas)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Resumen de las trazas JSONL del scraper y de los estudios.")
+    parser.add_argument("ficheros", nargs="*", help=f"por defecto {RUTA_TRAZAS} y sus copias rotadas")
+    parser.add_argument("--desde", help="solo spans desde esta fecha/hora ISO (p. ej. 2024-05-01T10:00)")
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args(argv)
+    rutas = args.ficheros or sorted(glob.glob(RUTA_TRAZAS + "*"), reverse=True)
+    desde = datetime.fromisoformat(args.desde).timestamp() if args.desde else None
+    print(analizar(_leer(rutas, desde), args.top))
+
+if __name__ == "__main__":
+    sys.exit(main())
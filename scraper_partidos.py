@@ -1,9 +1,11 @@
 import asyncio
 import datetime
-from playwright.async_api import async_playwright
+import time
+from playwright.async_api import async_playwright, Error as PlaywrightError
 from bs4 import BeautifulSoup
 
-URL = "https://live20.nowgoal25.com/"
+from modules import limitador, espejos
+
 
 def parse_match_data_from_html(html_content):
     soup = BeautifulSoup(html_content, 'html.parser')
@@ -58,8 +60,21 @@ async def main():
         page = await browser.new_page()
         
         try:
-            print(f"Navegando a {URL}...")
-            await page.goto(URL, wait_until="domcontentloaded", timeout=60000)
+            # Espejo más rápido primero; si no responde se prueba el siguiente
+            for espejo in espejos.candidatos():
+                print(f"Navegando a {espejo}/...")
+                await limitador.esperar_async(espejo)
+                inicio = time.monotonic()
+                try:
+                    await page.goto(f"{espejo}/", wait_until="domcontentloaded", timeout=60000)
+                except PlaywrightError as e:
+                    espejos.registrar(espejo, False, error=type(e).__name__); limitador.registrar(espejo, False)
+                    print(f"  {espejo} no responde ({type(e).__name__}).")
+                    continue
+                espejos.registrar(espejo, True, time.monotonic() - inicio); limitador.registrar(espejo, True)
+                break
+            else:
+                raise RuntimeError("Ningún espejo respondió.")
             
             # Espera explícita para asegurar que los scripts de la página se ejecutan
             print("Página cargada. Esperando a que los datos de los partidos se carguen...")
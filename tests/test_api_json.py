@@ -0,0 +1,24 @@
+# tests/test_api_json.py
+"""Cache-Control de los estudios de la API según el estado del partido (modules/api_json)."""
+from modules import api_json
+
+AHORA = 1_800_000_000
+TERMINADO, SIN_RESULTADO = {"final_score_raw": "2-1"}, {"final_score_raw": "?-?"}
+
+def test_terminado():
+    assert api_json.max_age_estudio(TERMINADO, AHORA - 3600, AHORA) == api_json.MAX_AGE_TERMINADO
+    assert api_json.max_age_estudio(TERMINADO) == api_json.MAX_AGE_TERMINADO
+
+def test_en_juego_sin_cache():
+    for inicio in (AHORA, AHORA - 1, AHORA - 5400):
+        assert api_json.max_age_estudio(SIN_RESULTADO, inicio, AHORA) == api_json.MAX_AGE_EN_JUEGO
+    assert api_json.cache_control(api_json.MAX_AGE_EN_JUEGO) == "public, no-cache"
+
+def test_previo_no_pasa_del_comienzo():
+    assert api_json.max_age_estudio(SIN_RESULTADO, AHORA + 86400, AHORA) == api_json.MAX_AGE_PREVIO
+    assert api_json.max_age_estudio(SIN_RESULTADO, AHORA + 120, AHORA) == 120
+    assert api_json.max_age_estudio(SIN_RESULTADO, AHORA + 5, AHORA) == api_json.MAX_AGE_MINIMO
+    assert api_json.cache_control(120) == "public, max-age=120"
+
+def test_sin_hora_de_comienzo():
+    assert api_json.max_age_estudio(SIN_RESULTADO) == api_json.MAX_AGE_PREVIO
@@ -0,0 +1,72 @@
+# tests/test_carga_js.py
+"""
+Lectura de la página h2h desde sus scripts (modules/carga_js) frente al parseo del DOM de siempre
+(estudio_scraper), sobre las páginas guardadas en tests/paginas/: índice del historial, IDs y cuotas
+iniciales tienen que salir idénticos por los dos caminos.
+h2h_reconstruida.html reproduce la estructura de la página (filas trN_, timeData, data-o, earlyOdds,
+h_data/a_data/v_data con las posiciones de CAMPOS_FILA); cualquier página guardada del navegador que se
+deje en tests/paginas/ entra en las mismas comprobaciones.
+"""
+from pathlib import Path
+
+import pytest
+
+from modules import carga_js, regiones_html
+from modules.estudio_scraper import (extract_bet365_initial_odds_of, get_match_details_from_record_of, get_match_details_from_row_of,
+                                     get_team_league_info_from_js_of, get_team_league_info_from_script_of)
+from modules.indice_equipos import IndiceEquipos
+
+PAGINAS = sorted((Path(__file__).parent / "paginas").glob("*.html"))
+
+@pytest.fixture(params=PAGINAS, ids=[p.stem for p in PAGINAS])
+def pagina(request):
+    html = request.param.read_text(encoding="utf-8")
+    soup = regiones_html.soup_h2h(html)
+    yield html, soup
+    regiones_html.liberar(soup)
+
+def test_hay_paginas():
+    assert PAGINAS
+
+# --- PARIDAD CON EL DOM ---
+def test_historial_igual_que_el_dom(pagina):
+    html, soup = pagina
+    historial = carga_js.historial(html)
+    assert historial is not None
+    dom = IndiceEquipos.desde_soup(soup, get_match_details_from_row_of)
+    js = IndiceEquipos.desde_registros(historial, get_match_details_from_record_of)
+    assert js.filas == dom.filas
+    assert [len(historial[t]) for t in carga_js.VARIABLES_HISTORIAL] == [len(soup.select(f"#{t} tr[id^='tr{t[-1]}_']")) for t in carga_js.VARIABLES_HISTORIAL]
+
+def test_info_igual_que_el_script(pagina):
+    html, soup = pagina
+    assert get_team_league_info_from_js_of(html) == get_team_league_info_from_script_of(soup)
+
+def test_cuotas_iguales_que_el_dom(pagina):
+    html, soup = pagina
+    dom = extract_bet365_initial_odds_of(soup)
+    assert carga_js.cuotas_iniciales(html) == (dom["ah_linea_raw"], dom["goals_linea_raw"])
+
+# --- VALIDACIÓN ---
+def test_posiciones_desplazadas_vuelven_al_dom(pagina, monkeypatch):
+    html, _ = pagina
+    # league_id también es numérico: solo el cruce con _matchInfo delata el cambio
+    monkeypatch.setitem(carga_js.CAMPOS_FILA, "home_id", carga_js.CAMPOS_FILA["league_id"])
+    assert carga_js.historial(html) is None
+
+def test_sin_match_info_vuelve_al_dom(pagina):
+    html, _ = pagina
+    assert carga_js.historial(html.replace("_matchInfo", "_otraInfo")) is None
+
+def test_fila_de_otro_equipo_vuelve_al_dom():
+    html = PAGINAS[0].read_text(encoding="utf-8")
+    assert carga_js.info_partido(html)[1] not in ("7", "8")
+    # Una fila de a_data bien formada pero sin el visitante de _matchInfo
+    fila = "['2025-01-01',1,'X','#000',7,'A',8,'B','1','0','0-0','0','W','0','0',1,1],"
+    assert carga_js.historial(html.replace("var a_data = [", "var a_data = [" + fila, 1)) is None
+
+def test_linea_de_goles_no_valida_vuelve_al_dom():
+    html = PAGINAS[0].read_text(encoding="utf-8")
+    ah, goles = carga_js.cuotas_iniciales(html)
+    assert carga_js.cuotas_iniciales(html.replace(f"'{goles}']", "'-0.5']")) is None
+    assert carga_js.cuotas_iniciales(html.replace(f"'{goles}']", "'x']")) is None
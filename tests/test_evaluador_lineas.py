@@ -0,0 +1,83 @@
+# tests/test_evaluador_lineas.py
+"""
+Paridad del evaluador vectorizado (modules/evaluador_lineas) con check_handicap_cover /
+check_goal_line_cover de estudio_scraper, fila a fila, y el caso en que difieren a propósito.
+"""
+import itertools
+
+import numpy as np
+import pytest
+
+from modules.estudio_scraper import check_goal_line_cover, check_handicap_cover
+from modules.evaluador_lineas import (CUBIERTO, INDETERMINADO, NO_CUBIERTO, PUSH, _orientacion, evaluar_goles, evaluar_handicap,
+                                      parse_marcadores, precedentes_desde_estudio)
+
+CODIGOS = {True: CUBIERTO, False: NO_CUBIERTO, None: PUSH}
+LOCAL, VISITANTE, RIVAL = "Real Local", "Visitante FC", "Otro Club"
+LINEAS = np.round(np.arange(-3.0, 3.0001, 0.25), 2)
+MARCADORES = [f"{h}-{a}" for h, a in itertools.product(range(5), repeat=2)]
+
+def _favorito(linea):
+    # Mismo criterio que _iterar_datos_partido para fav_name
+    return VISITANTE if linea < 0 else (LOCAL if linea > 0 else "Ninguno")
+
+def _referencia(marcador, linea, home_prec, away_prec, local=LOCAL, visitante=VISITANTE):
+    etiqueta, cubierto = check_handicap_cover(marcador, linea, visitante if linea < 0 else (local if linea > 0 else "Ninguno"), home_prec, away_prec, local)
+    return INDETERMINADO if etiqueta == "indeterminado" else CODIGOS[cubierto]
+
+def _vectorizado(home_prec, away_prec):
+    goles_h, goles_a = parse_marcadores(MARCADORES)
+    orientacion = np.full(len(MARCADORES), _orientacion(home_prec, away_prec, LOCAL, VISITANTE))
+    return evaluar_handicap(goles_h, goles_a, orientacion, LINEAS)
+
+# Precedentes en los que juega el equipo al que apunta la línea: deben coincidir siempre
+@pytest.mark.parametrize("home_prec, away_prec, lineas", [
+    (LOCAL, VISITANTE, LINEAS),                 # H2H en el estadio del local
+    (VISITANTE, LOCAL, LINEAS),                 # H2H en el estadio del visitante
+    (LOCAL, RIVAL, LINEAS),                     # último partido del local en casa (coincide en todas)
+    (RIVAL, LOCAL, LINEAS[LINEAS >= 0]),        # comparativa con el local fuera
+    (RIVAL, VISITANTE, LINEAS[LINEAS < 0]),     # último partido del visitante fuera
+    (VISITANTE, RIVAL, LINEAS),                 # comparativa con el visitante en casa (coincide en todas)
+])
+def test_paridad_handicap(home_prec, away_prec, lineas):
+    matriz = _vectorizado(home_prec, away_prec)
+    for j, linea in enumerate(LINEAS):
+        if linea not in lineas: continue
+        for i, marcador in enumerate(MARCADORES):
+            assert matriz[i, j] == _referencia(marcador, float(linea), home_prec, away_prec), (home_prec, away_prec, marcador, linea)
+
+# Equipo al que apunta la línea ausente: el rival que ocupa su lado hace de él
+@pytest.mark.parametrize("home_prec, away_prec, lineas, sustituto", [
+    (RIVAL, VISITANTE, LINEAS[LINEAS >= 0], {"local": RIVAL}),     # último del visitante, línea del local
+    (RIVAL, LOCAL, LINEAS[LINEAS < 0], {"visitante": RIVAL}),      # comparativa del local fuera, línea del visitante
+])
+def test_diferencia_documentada(home_prec, away_prec, lineas, sustituto):
+    matriz = _vectorizado(home_prec, away_prec)
+    distintos = 0
+    for j, linea in enumerate(LINEAS):
+        if linea not in lineas: continue
+        for i, marcador in enumerate(MARCADORES):
+            assert matriz[i, j] == _referencia(marcador, float(linea), home_prec, away_prec, **sustituto), (home_prec, away_prec, marcador, linea)
+            distintos += matriz[i, j] != _referencia(marcador, float(linea), home_prec, away_prec)
+    assert distintos > 0
+
+def test_sin_equipos_principales_indeterminado():
+    assert (_vectorizado(RIVAL, "Tercero") == INDETERMINADO).all()
+
+def test_paridad_goles():
+    goles_h, goles_a = parse_marcadores(MARCADORES)
+    lineas = np.round(np.arange(0.5, 5.0001, 0.25), 2)
+    matriz = evaluar_goles(goles_h, goles_a, lineas)
+    for (i, marcador), (j, linea) in itertools.product(enumerate(MARCADORES), enumerate(lineas)):
+        etiqueta, superada = check_goal_line_cover(marcador, float(linea))
+        assert matriz[i, j] == CODIGOS[superada], (marcador, linea)
+
+def test_precedentes_desde_estudio():
+    all_data = {"last_home_match": {"details": {"score_raw": "2-1", "handicap_line_raw": "-0.5", "home_team": LOCAL, "away_team": RIVAL}},
+                "comp_V_vs_UL_H": {"details": {"score_raw": "0-0", "handicap_line_raw": "0", "home_team": VISITANTE, "away_team": RIVAL}},
+                "h2h_col3": {"details": {"goles_home": "1", "goles_away": "3", "handicap": "0.25", "h2h_home_team_name": RIVAL, "h2h_away_team_name": LOCAL}},
+                "h2h_stadium": {"details": {"res1_raw": "1-1", "ah1": "0.5"}}}
+    precedentes = precedentes_desde_estudio(all_data, LOCAL, VISITANTE)
+    assert precedentes["claves"] == ["last_home_match", "h2h_col3", "comp_V_vs_UL_H", "h2h_stadium"]
+    assert precedentes["orientacion"].tolist() == [1, -1, -1, 1]
+    assert precedentes["goles_h"].tolist() == [2, 1, 0, 1] and precedentes["goles_a"].tolist() == [1, 3, 0, 1]
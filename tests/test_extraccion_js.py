@@ -0,0 +1,53 @@
+# tests/test_extraccion_js.py
+"""
+FUNCION_H2H de modules/extraccion_js ejecutada en un navegador de verdad (Playwright/Chromium) sobre las
+páginas de tests/paginas/, comparada con el camino de siempre: regiones_html + parseo del DOM.
+Sin navegador instalado se salta; es la comprobación que hace falta antes de usar MASIVO_EXTRACCION=js.
+"""
+import json
+from pathlib import Path
+
+import pytest
+
+from modules import carga_js, extraccion_js, regiones_html
+from modules.estudio_scraper import (extract_bet365_initial_odds_of, extract_final_score_of, get_match_details_from_record_of,
+                                     get_match_details_from_row_of)
+from modules.indice_equipos import IndiceEquipos
+
+sync_api = pytest.importorskip("playwright.sync_api")
+PAGINAS = sorted((Path(__file__).parent / "paginas").glob("*.html"))
+
+@pytest.fixture(scope="module")
+def navegador():
+    with sync_api.sync_playwright() as p:
+        try: browser = p.chromium.launch()
+        except sync_api.Error as e: pytest.skip(f"sin navegador: {str(e).splitlines()[0]}")
+        yield browser
+        browser.close()
+
+@pytest.fixture(params=PAGINAS, ids=[p.stem for p in PAGINAS])
+def pagina(request, navegador):
+    html = request.param.read_text(encoding="utf-8")
+    page = navegador.new_page()
+    page.set_content(html)
+    datos = json.loads(page.evaluate(extraccion_js.FUNCION_H2H))
+    page.close()
+    soup = regiones_html.soup_h2h(html)
+    yield html, soup, datos
+    regiones_html.liberar(soup)
+
+def test_info_igual(pagina):
+    html, _, datos = pagina
+    assert extraccion_js.info_partido(datos) == carga_js.info_partido(html)
+
+def test_historial_igual_que_el_dom(pagina):
+    _, soup, datos = pagina
+    dom = IndiceEquipos.desde_soup(soup, get_match_details_from_row_of)
+    js = IndiceEquipos.desde_registros(extraccion_js.historial(datos), get_match_details_from_record_of)
+    assert js.filas == dom.filas
+
+def test_cuotas_y_marcador_iguales_que_el_dom(pagina):
+    _, soup, datos = pagina
+    dom = extract_bet365_initial_odds_of(soup)
+    assert extraccion_js.cuotas_iniciales(datos) == (dom["ah_linea_raw"], dom["goals_linea_raw"])
+    assert extraccion_js.marcador_final(datos) == extract_final_score_of(soup)
@@ -0,0 +1,119 @@
+# tests/test_lineas_ah.py
+"""
+Equivalencia del codec de modules/lineas_ah con las funciones originales parse_ah_to_number_of /
+format_ah_as_decimal_string_of (copiadas abajo tal como estaban en estudio_scraper.py).
+Única diferencia buscada: el codec acepta la coma decimal ("0,25"), que las originales no leían.
+"""
+import math
+import random
+
+import pytest
+
+from modules import lineas_ah
+from modules.lineas_ah import format_ah, parse_ah
+
+# --- FUNCIONES ORIGINALES (referencia congelada) ---
+def parse_ah_to_number_of(ah_line_str: str):
+    if not isinstance(ah_line_str, str): return None
+    s = ah_line_str.strip().replace(' ', '')
+    if not s or s in ['-', '?']: return None
+    original_starts_with_minus = ah_line_str.strip().startswith('-')
+    try:
+        if '/' in s:
+            parts = s.split('/')
+            if len(parts) != 2: return None
+            val1, val2 = float(parts[0]), float(parts[1])
+            if val1 < 0 and not parts[1].startswith('-') and val2 > 0: val2 = -abs(val2)
+            elif original_starts_with_minus and val1 == 0.0 and not parts[1].startswith('-') and val2 > 0: val2 = -abs(val2)
+            return (val1 + val2) / 2.0
+        return float(s)
+    except (ValueError, IndexError): return None
+
+def format_ah_as_decimal_string_of(ah_line_str: str):
+    numeric_value = parse_ah_to_number_of(ah_line_str)
+    if numeric_value is None: return ah_line_str.strip() if isinstance(ah_line_str, str) and ah_line_str.strip() in ['-','?'] else '-'
+    if numeric_value == 0.0: return "0"
+    sign = -1 if numeric_value < 0 else 1
+    abs_num = abs(numeric_value)
+    mod_val = abs_num % 1
+    if mod_val == 0.0: abs_rounded = abs_num
+    elif mod_val == 0.25: abs_rounded = math.floor(abs_num) + 0.25
+    elif mod_val == 0.5: abs_rounded = abs_num
+    elif mod_val == 0.75: abs_rounded = math.floor(abs_num) + 0.75
+    else:
+        if mod_val < 0.25: abs_rounded = math.floor(abs_num)
+        elif mod_val < 0.75: abs_rounded = math.floor(abs_num) + 0.5
+        else: abs_rounded = math.ceil(abs_num)
+    final_value = sign * abs_rounded
+    if final_value == 0.0: return "0"
+    if abs(final_value % 1) < 1e-9: return str(int(final_value))
+    if abs(final_value - (math.floor(final_value) + 0.5)) < 1e-9: return f"{final_value:.1f}"
+    return f"{final_value:.2f}"
+
+# --- ESPERADO: las originales, leyendo la coma como punto ---
+def _igual(a, b):
+    return (a is None and b is None) or (a is not None and b is not None and (a == b or (math.isnan(a) and math.isnan(b))))
+
+def _resultado(funcion, texto):
+    """Valor devuelto o tipo de excepción ("inf"/"nan" hacen fallar al formateo en ambos lados)."""
+    try: return funcion(texto)
+    except (ValueError, OverflowError) as e: return type(e)
+
+def _comprobar(texto):
+    referencia = texto.replace(',', '.') if isinstance(texto, str) else texto
+    numero, formato = parse_ah_to_number_of(referencia), _resultado(format_ah_as_decimal_string_of, referencia)
+    assert _igual(parse_ah(texto), numero), f"parse_ah({texto!r})"
+    assert _resultado(format_ah, texto) == formato, f"format_ah({texto!r})"
+
+# --- TABLA PRECALCULADA ---
+def test_tabla_completa():
+    assert len(lineas_ah._NUMEROS) >= lineas_ah._TAMANO_TABLA
+    # Todas las líneas de cuarto entre -LINEA_MAXIMA y LINEA_MAXIMA tienen al menos su grafía decimal
+    for i in range(int(-lineas_ah.LINEA_MAXIMA * 4), int(lineas_ah.LINEA_MAXIMA * 4) + 1):
+        assert f"{i / 4}" in lineas_ah._NUMEROS
+
+@pytest.mark.parametrize("texto", sorted(lineas_ah._construir_tablas()[0]))
+def test_claves_tabla(texto):
+    _comprobar(texto)
+
+def test_claves_tabla_sin_coma_iguales_a_originales():
+    # Sin coma, el codec es exactamente las funciones originales
+    for texto in lineas_ah._construir_tablas()[0]:
+        if ',' in texto: continue
+        assert _igual(parse_ah(texto), parse_ah_to_number_of(texto)), texto
+        assert format_ah(texto) == format_ah_as_decimal_string_of(texto), texto
+
+# --- COMA DECIMAL ---
+@pytest.mark.parametrize("texto, numero, formato", [
+    ("0,25", 0.25, "0.25"), ("-0,75", -0.75, "-0.75"), ("0/0,5", 0.25, "0.25"), ("-0,5/1", -0.75, "-0.75"),
+    ("2,5", 2.5, "2.5"), ("+1,0", 1.0, "1"), ("2,5/3", 2.75, "2.75"), ("-0/0,5", -0.25, "-0.25"),
+])
+def test_coma_decimal(texto, numero, formato):
+    # Las originales no leían la coma (devolvían None / '-'); el codec sí
+    assert parse_ah_to_number_of(texto) is None and format_ah_as_decimal_string_of(texto) == '-'
+    assert parse_ah(texto) == numero and format_ah(texto) == formato
+
+# --- CASOS FUERA DE LA TABLA ---
+@pytest.mark.parametrize("texto", [None, 0.5, 1, [], "", " ", "-", "?", " - ", " ? ", "N/A", "abc", "1/2/3", "/", "0/", "/0.5",
+                                   "0.1", "-0.1", "0.3", "0.6", "0.9", "-1.9", " 0 / 0.5 ", "12.5", "-15.25", "1e1", "inf", "nan",
+                                   "0/-0.5", "-0/-0.5", "-1/-1.5", "1/-1.5", "0.5/1", "--1", "+-1", "0,1", "1,2,3"])
+def test_casos_raros(texto):
+    _comprobar(texto)
+
+def test_aleatorios():
+    rng = random.Random(1234)
+    alfabeto = "0123456789.,-+/ ?"
+    for _ in range(20000):
+        _comprobar("".join(rng.choice(alfabeto) for _ in range(rng.randint(0, 8))))
+
+def test_aleatorios_lineas():
+    rng = random.Random(99)
+    for _ in range(5000):
+        a, b = rng.randint(-60, 60) / 4, rng.randint(-60, 60) / 4
+        for texto in (f"{a}", f"{a:g}", f"{a}/{b}", f"{a:g}/{b:g}", f"{a}".replace('.', ','), f"{a:g}/{b:g}".replace('.', ',')):
+            _comprobar(texto)
+
+def test_memoizacion_acotada():
+    for i in range(lineas_ah.MAX_MEMORIZADAS + 100): parse_ah(f"x{i}"); format_ah(f"y{i}")
+    assert len(lineas_ah._NUMEROS) <= lineas_ah._TAMANO_TABLA + lineas_ah.MAX_MEMORIZADAS
+    assert len(lineas_ah._FORMATOS) <= lineas_ah._TAMANO_TABLA + lineas_ah.MAX_MEMORIZADAS
@@ -0,0 +1,255 @@
+# web.py
+"""
+Servidor Flask del proyecto: portada con los próximos partidos (templates/index.html) y estudio
+de un partido (templates/estudio.html). El estudio se envía por streaming: primero el esqueleto
+de la página y después cada sección en cuanto el scraper la termina, en la misma respuesta HTTP.
+
+Uso: python web.py  (o  flask --app web run)
+"""
+import asyncio
+import json
+import os
+import queue
+import threading
+import time
+
+from flask import Flask, Response, render_template, request, stream_with_context, url_for
+from markupsafe import Markup, escape
+
+from modules import api_json, cache_estudios, cribado, en_vivo, perfilado
+from modules.cache_local import CacheLRU
+from modules.estudio_scraper import SECCIONES_ESTUDIO, iterar_datos_partido, obtener_datos_completos_partido
+from modules.lineas_ah import format_ah
+from modules.indice_partidos import IndicePartidos
+from modules.partidos_proximos import CACHE_PARTIDOS, get_main_page_matches_async, inicio_partido
+
+app = Flask(__name__)
+app.jinja_env.globals['format_ah'] = format_ah
+app.jinja_env.filters['hora'] = lambda ts: time.strftime('%d/%m %H:%M', time.gmtime(ts)) if ts else '-'
+
+TTL_PARTIDOS = 600
+
+# Bloques de secciones_estudio.html que se rellenan con cada sección de iterar_datos_partido
+PRECEDENTES = ("ultimo_local", "ultimo_visitante", "comparativa_local", "comparativa_visitante", "h2h_estadio", "h2h_general")
+BLOQUES_POR_SECCION = {
+    "cabecera": ("cabecera",),
+    "precedentes": PRECEDENTES,
+    "mercado": ("mercado",),
+    "clasificacion": ("clasificacion",),
+    "estadisticas": PRECEDENTES,   # los mismos bloques, ahora con las tablas de progresión
+    "col3": ("col3",),
+}
+
+# Estudios ya serializados para la API: match_id -> (cuerpo, etag, max_age, expira), acotados en número.
+# Los estudios en sí están en modules/cache_estudios, compartidos con los demás procesos
+ESTUDIOS_JSON = CacheLRU(int(os.environ.get("MASIVO_MAX_ESTUDIOS_JSON", "500")))
+threading.Thread(target=cache_estudios.precargar, name="precarga-estudios", daemon=True).start()
+
+# Entradas de all_data que usa cada bloque: la huella de esas entradas identifica su HTML
+DATOS_POR_BLOQUE = {
+    "cabecera": ("home_name", "away_name"),
+    "clasificacion": ("home_standings", "away_standings", "home_ou_stats", "away_ou_stats"),
+    "mercado": ("main_match_odds", "market_analysis_html", "movimiento_lineas"),
+    "ultimo_local": ("last_home_match",),
+    "ultimo_visitante": ("last_away_match",),
+    "col3": ("h2h_col3", "h2h_col3_raw"),
+    "comparativa_local": ("comp_L_vs_UV_A", "home_name"),
+    "comparativa_visitante": ("comp_V_vs_UL_H", "away_name"),
+    "h2h_estadio": ("h2h_stadium", "home_name", "away_name"),
+    "h2h_general": ("h2h_general",),
+}
+PLANTILLAS_BLOQUES = ("secciones_estudio.html", "stats_table.html")
+FRAGMENTOS = CacheLRU(int(os.environ.get("MASIVO_MAX_FRAGMENTOS", "2000")))
+
+def version_plantillas():
+    """Huella del código de las plantillas de los bloques: al editarlas, los fragmentos viejos dejan de usarse."""
+    return api_json.etag("".join(app.jinja_env.loader.get_source(app.jinja_env, n)[0] for n in PLANTILLAS_BLOQUES).encode("utf-8"))
+
+VERSION_PLANTILLAS = version_plantillas()
+
+def renderizar_bloque(nombre, data):
+    """HTML de un bloque de secciones_estudio.html, reutilizado mientras no cambien sus datos ni las plantillas."""
+    version = version_plantillas() if app.debug else VERSION_PLANTILLAS
+    clave = (nombre, version, api_json.etag(api_json.serializar({k: data.get(k) for k in DATOS_POR_BLOQUE[nombre]})))
+    return FRAGMENTOS.obtener_o_crear(clave, lambda: Markup(getattr(app.jinja_env.get_template('secciones_estudio.html').module, nombre)(data)))
+
+app.jinja_env.globals['renderizar_bloque'] = renderizar_bloque
+
+def partidos_proximos():
+    """Lista de la portada (caché de TTL_PARTIDOS) y su antigüedad en segundos."""
+    portada = CACHE_PARTIDOS.obtener("portada")
+    if portada is None:
+        portada = {"guardado": time.time(), "partidos": asyncio.run(get_main_page_matches_async())}
+        CACHE_PARTIDOS.guardar("portada", portada, ttl=TTL_PARTIDOS)
+    return portada["partidos"], time.time() - portada["guardado"]
+
+# Índice de la portada en memoria: (momento en que se guardó la portada, IndicePartidos)
+_indice_partidos = (None, None)
+
+def indice_partidos():
+    """IndicePartidos de la portada y su antigüedad; solo se reconstruye cuando hay una portada nueva."""
+    global _indice_partidos
+    guardado, indice = _indice_partidos
+    if indice is not None and time.time() - guardado < TTL_PARTIDOS: return indice, time.time() - guardado
+    matches, edad = partidos_proximos()
+    if (guardado := round(time.time() - edad, 3)) != _indice_partidos[0]: _indice_partidos = (guardado, IndicePartidos(matches))
+    return _indice_partidos[1], edad
+
+def _filtros_partidos(args):
+    """Filtros de IndicePartidos.filtrar desde la query: ah_min/ah_max, goles_min/goles_max, en_horas, liga, filter_handicap."""
+    filtros = {c: args.get(c, type=float) for c in ("ah_min", "ah_max", "goles_min", "goles_max")}
+    if (horas := args.get('en_horas', type=float)) is not None: filtros.update(desde=time.time(), hasta=time.time() + horas * 3600)
+    filtros.update(liga=args.get('liga') or None, con_handicap=args.get('filter_handicap', '').lower() == 'true')
+    return filtros
+
+@app.route('/')
+def index():
+    limit = max(1, request.args.get('limit', 20, type=int))
+    filtros = _filtros_partidos(request.args)
+    # El cribado usa los mismos filtros, sin la paginación de la lista
+    cribado_url = url_for('cribar_jornada', **{k: v for k, v in request.args.items() if k not in ('limit', 'cursor')})
+    try:
+        indice, _ = indice_partidos()
+    except Exception as e:
+        return render_template('index.html', matches=[], total_matches_found=0, current_limit=limit, filter_handicap=filtros['con_handicap'], ligas=[], siguiente_url=None, cribado_url=cribado_url, error=str(e))
+    posiciones = indice.filtrar(**filtros)
+    matches, siguiente = indice.pagina(posiciones, limit, request.args.get('cursor'))
+    siguiente_url = url_for('index', **{**request.args.to_dict(), 'cursor': siguiente}) if siguiente else None
+    return render_template('index.html', matches=matches, total_matches_found=len(posiciones), current_limit=limit, filter_handicap=filtros['con_handicap'],
+                           ligas=indice.ligas, siguiente_url=siguiente_url, cribado_url=cribado_url, error=None)
+
+def _fragmento(nombre, data):
+    return f'<template id="t-{nombre}">{renderizar_bloque(nombre, data)}</template><script>rellenar("{nombre}")</script>\n'
+
+def _error(mensaje):
+    return f'<template id="t-error"><div class="alert alert-danger">{escape(mensaje)}</div></template><script>rellenar("error")</script>\n'
+
+@app.route('/estudio/<string:match_id>')
+def estudio(match_id):
+    # ?perfil=1: guarda un perfil (cProfile + muestreo) de este estudio en <MASIVO_DATA_DIR>/perfiles
+    perfil = request.args.get('perfil') == '1'
+    # ?modo=completo: la página entera de una vez (útil para guardarla o sin JavaScript)
+    if request.args.get('modo') == 'completo':
+        with perfilado.perfilar(f"estudio-{match_id}", activo=perfil):
+            data, _ = cache_estudios.obtener_o_calcular(match_id, obtener_datos_completos_partido, inicio_partido(match_id))
+        if "error" in data: return render_template('estudio.html', data={}, streaming=True).replace('</body>', _error(data["error"]) + '</body>'), 500
+        return render_template('estudio.html', data=data, streaming=False)
+
+    esqueleto = render_template('estudio.html', data={}, streaming=True)
+    inicio, cierre = esqueleto.rsplit('</body>', 1)
+
+    def generar():
+        yield inicio
+        with perfilado.perfilar(f"estudio-{match_id}", activo=perfil):
+            for seccion, data in cache_estudios.iterar_cacheado(match_id, iterar_datos_partido, SECCIONES_ESTUDIO, inicio_partido(match_id)):
+                if seccion == "error": yield _error(data["error"])
+                for nombre in BLOQUES_POR_SECCION.get(seccion, ()): yield _fragmento(nombre, data)
+        yield '</body>' + cierre
+
+    return Response(stream_with_context(generar()), mimetype='text/html', headers={'X-Accel-Buffering': 'no', 'Cache-Control': 'no-cache'})
+
+# --- CRIBADO DE LA JORNADA ---
+LIMITE_CRIBADO = 150
+
+def _fila_cribado(fila):
+    # "</" no puede aparecer dentro del <script>
+    datos = api_json.serializar(fila).decode("utf-8").replace("</", "<\\/")
+    return f'<script>agregarFila({datos})</script>\n'
+
+@app.route('/cribado')
+def cribar_jornada():
+    """Tabla de cribado de los partidos filtrados (mismos filtros que /, hasta ?limit=150); las filas llegan según terminan."""
+    limit = max(1, request.args.get('limit', LIMITE_CRIBADO, type=int))
+    try:
+        indice, _ = indice_partidos()
+        posiciones = indice.filtrar(**_filtros_partidos(request.args))
+        matches, error = indice.pagina(posiciones, limit)[0], None
+    except Exception as e:
+        posiciones, matches, error = [], [], str(e)
+    esqueleto = render_template('cribado.html', total=len(matches), total_filtrados=len(posiciones), error=error)
+    inicio, cierre = esqueleto.rsplit('</body>', 1)
+
+    def generar():
+        yield inicio
+        for fila in cribado.cribar(matches): yield _fila_cribado(fila)
+        yield '</body>' + cierre
+
+    return Response(stream_with_context(generar()), mimetype='text/html', headers={'X-Accel-Buffering': 'no', 'Cache-Control': 'no-cache'})
+
+# --- API JSON (v1) ---
+def _respuesta_json(cuerpo, etiqueta, max_age, estado=200):
+    """Respuesta con ETag y Cache-Control; make_conditional contesta 304 si coincide If-None-Match."""
+    respuesta = app.response_class(cuerpo, status=estado, mimetype='application/json')
+    respuesta.set_etag(etiqueta)
+    respuesta.headers['Cache-Control'] = api_json.cache_control(max_age)
+    return respuesta.make_conditional(request)
+
+def _estudio_json(match_id):
+    """Estudio serializado; mientras no caduque, un sondeo repetido no vuelve a scrapear."""
+    guardado = ESTUDIOS_JSON.obtener(match_id)
+    if guardado and guardado[3] > time.time(): return guardado
+    inicio = inicio_partido(match_id)
+    data, expira = cache_estudios.obtener_o_calcular(match_id, obtener_datos_completos_partido, inicio)
+    if "error" in data: return None, data["error"]
+    cuerpo, max_age = api_json.cuerpo_estudio(data), api_json.max_age_estudio(data, inicio)
+    # Un estudio de la caché compartida puede caducar antes que el max_age por defecto
+    if expira is not None and max_age: max_age = max(api_json.MAX_AGE_MINIMO, int(min(max_age, expira - time.time())))
+    # En juego (max_age 0) el cliente revalida siempre; el cuerpo serializado se reutiliza MAX_AGE_MINIMO
+    guardado = (cuerpo, api_json.etag(cuerpo), max_age, time.time() + (max_age or api_json.MAX_AGE_MINIMO))
+    ESTUDIOS_JSON.guardar(match_id, guardado)
+    return guardado
+
+@app.route('/api/v1/estudio/<string:match_id>')
+def api_estudio(match_id):
+    guardado = _estudio_json(match_id)
+    if guardado[0] is None:
+        return app.response_class(api_json.serializar({"version": api_json.VERSION_API, "error": guardado[1]}), status=502, mimetype='application/json')
+    cuerpo, etiqueta, max_age, expira = guardado
+    return _respuesta_json(cuerpo, etiqueta, max_age and max(api_json.MAX_AGE_MINIMO, int(min(max_age, expira - time.time()))))
+
+@app.route('/api/v1/partidos')
+def api_partidos():
+    """
+    Próximos partidos filtrados y paginados: ?limit=20&cursor=...&ah_min=-1&ah_max=-0.25&en_horas=2&liga=...
+    La respuesta trae "siguiente" con el cursor de la página siguiente (o null en la última).
+    """
+    # Sin limit, todos; con él, al menos uno
+    limit = request.args.get('limit', type=int)
+    if limit is not None: limit = max(1, limit)
+    try:
+        indice, edad = indice_partidos()
+    except Exception as e:
+        return app.response_class(api_json.serializar({"version": api_json.VERSION_API, "error": str(e)}), status=502, mimetype='application/json')
+    posiciones = indice.filtrar(**_filtros_partidos(request.args))
+    matches, siguiente = indice.pagina(posiciones, limit or len(posiciones), request.args.get('cursor'))
+    cuerpo = api_json.cuerpo_partidos(matches, len(posiciones), siguiente)
+    return _respuesta_json(cuerpo, api_json.etag(cuerpo), api_json.max_age_partidos(matches, edad))
+
+# --- DIRECTO (Server-Sent Events) ---
+LATIDO_SEGUNDOS = 20
+
+@app.route('/api/v1/en-vivo/<string:match_id>')
+def api_en_vivo(match_id):
+    """
+    Flujo SSE del partido: una foto completa al empezar y después solo los cambios de marcador,
+    minuto y estadísticas. Todos los clientes del mismo partido comparten el sondeo de en_vivo.
+    """
+    if not match_id.isdigit(): return app.response_class(api_json.serializar({"version": api_json.VERSION_API, "error": "ID de partido no válido."}), status=400, mimetype='application/json')
+    cola = en_vivo.suscribir(match_id)
+
+    def generar():
+        try:
+            while True:
+                try: mensaje = cola.get(timeout=LATIDO_SEGUNDOS)
+                except queue.Empty:
+                    yield ": latido\n\n"   # mantiene viva la conexión y detecta clientes desconectados
+                    continue
+                yield f"event: {mensaje['tipo']}\ndata: {json.dumps(mensaje, ensure_ascii=False)}\n\n"
+                if mensaje['tipo'] == "fin": return
+        finally:
+            en_vivo.cancelar(match_id, cola)
+
+    return Response(generar(), mimetype='text/event-stream', headers={'X-Accel-Buffering': 'no', 'Cache-Control': 'no-cache'})
+
+if __name__ == '__main__':
+    app.run(host='0.0.0.0', port=int(os.environ.get('PORT', 5000)), threaded=True)